@@ -0,0 +1,173 @@
+"""
+Генератор синтетического каталога фильмов для замеров производительности ETL.
+"""
+
+import random
+import datetime
+from uuid import UUID, uuid4
+from typing import Dict, Generator, List, Tuple
+
+from psycopg2.sql import SQL, Identifier
+from psycopg2.extras import execute_values
+from psycopg2.extensions import connection as postgres_connection
+
+
+GENRES = (
+    'Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Documentary', 'Drama',
+    'Family', 'Fantasy', 'History', 'Horror', 'Music', 'Musical', 'Mystery', 'News', 'Reality-TV',
+    'Romance', 'Sci-Fi', 'Short', 'Sport', 'Talk-Show', 'Thriller', 'War', 'Western', 'Game-Show',
+)
+FIRST_NAMES = (
+    'Alan', 'Anna', 'Boris', 'Carrie', 'Daniel', 'Diane', 'Emma', 'Frank', 'George', 'Grace', 'Harrison',
+    'Helen', 'Ivan', 'Julia', 'Kevin', 'Laura', 'Mark', 'Natalie', 'Olga', 'Peter', 'Rachel', 'Sam',
+    'Tom', 'Uma', 'Victor', 'Wendy',
+)
+LAST_NAMES = (
+    'Anderson', 'Baker', 'Carter', 'Davis', 'Evans', 'Fisher', 'Garcia', 'Hall', 'Ivanov', 'Jones',
+    'King', 'Lewis', 'Miller', 'Nelson', 'Owen', 'Parker', 'Quinn', 'Roberts', 'Smith', 'Taylor',
+    'Usher', 'Vance', 'Walker', 'Young', 'Zimmer',
+)
+# сколько персон каждой роли бывает у фильма
+ROLE_FAN_OUT = {
+    'director': (1, 2),
+    'actor': (3, 15),
+    'writer': (1, 3),
+}
+GENRE_FAN_OUT = (1, 3)
+CATALOGUE_START = datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class Catalogue:
+    """
+    Детерминированный каталог фильмов заданного размера.
+    Персоны выбираются со смещением к началу списка, поэтому, как и в реальном каталоге,
+    немногие известные актёры снимаются в тысячах фильмов, а большинство — в одном-двух.
+    Каталог генерируется блоками и целиком в памяти не хранится.
+    """
+
+    def __init__(self, films: int, seed: int = 0, persons: int | None = None):
+        """
+        Инициализация переменных
+        :param films: количество фильмов
+        :param seed: зерно генератора случайных чисел
+        :param persons: количество персон, по умолчанию половина количества фильмов
+        """
+        self.films = films
+        self.seed = seed
+        self.persons = persons or max(films // 2, 100)
+        genres_random = random.Random(seed)
+        self.genres = [(str(UUID(int=genres_random.getrandbits(128))), name) for name in GENRES]
+        self._person_namespace = random.Random(seed + 1).getrandbits(127)
+
+    def get_person(self, index: int) -> Tuple[str, str]:
+        """
+        Персона по номеру, вычисляется без хранения списка персон.
+        :param index: номер персоны
+        :return: идентификатор и имя
+        """
+        first_name = FIRST_NAMES[index % len(FIRST_NAMES)]
+        last_name = LAST_NAMES[index // len(FIRST_NAMES) % len(LAST_NAMES)]
+        return str(UUID(int=self._person_namespace + index)), f'{first_name} {last_name} {index}'
+
+    def _choose_person(self, film_random: random.Random) -> int:
+        """
+        :param film_random: генератор случайных чисел фильма
+        :return: номер персоны, чаще из начала списка
+        """
+        return int(self.persons * film_random.random() ** 3)
+
+    def get_film(self, number: int) -> Dict:
+        """
+        Фильм по номеру в том же виде, в котором его возвращает запрос обогащения.
+        :param number: номер фильма
+        :return: строка запроса обогащения
+        """
+        film_random = random.Random(self.seed * 1_000_003 + number)
+        persons, seen = [], set()
+        for role, (low, high) in ROLE_FAN_OUT.items():
+            for _ in range(film_random.randint(low, high)):
+                index = self._choose_person(film_random)
+                if (role, index) in seen:
+                    continue
+                seen.add((role, index))
+                person_id, name = self.get_person(index)
+                persons.append({'role': role, 'id': person_id, 'name': name})
+        genres = film_random.sample(self.genres, film_random.randint(*GENRE_FAN_OUT))
+        created_at = CATALOGUE_START + datetime.timedelta(minutes=number)
+        return {
+            'id': str(UUID(int=film_random.getrandbits(128))),
+            'title': f'Film {number}',
+            'description': ' '.join(film_random.choices(LAST_NAMES, k=film_random.randint(10, 60))),
+            'rating': round(film_random.uniform(1, 10), 1),
+            'type': film_random.choice(('movie', 'movie', 'movie', 'tv_show')),
+            'creation_date': (CATALOGUE_START - datetime.timedelta(days=film_random.randint(0, 36500))).date(),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'persons': persons,
+            'genre': sorted(name for _, name in genres),
+        }
+
+    def iter_blocks(self, block_size: int) -> Generator[List[Dict], None, None]:
+        """
+        Фильмы каталога блоками.
+        :param block_size: размер блока
+        :return: блоки строк запроса обогащения
+        """
+        for start in range(0, self.films, block_size):
+            yield [self.get_film(number) for number in range(start, min(start + block_size, self.films))]
+
+    def populate(self, connection: postgres_connection, block_size: int) -> None:
+        """
+        Запись каталога в таблицы схемы content локального PostgreSQL.
+        :param connection: соединение с БД, в которой уже применены миграции
+        :param block_size: количество фильмов в одной вставке
+        :return:
+        """
+        now = CATALOGUE_START
+        genre_ids = {name: genre_id for genre_id, name in self.genres}
+        self._insert(connection, 'genre', ('id', 'name', 'description', 'created_at', 'updated_at'), [
+            (genre_id, name, '', now, now) for genre_id, name in self.genres
+        ])
+        for start in range(0, self.persons, block_size):
+            self._insert(connection, 'person', ('id', 'full_name', 'created_at', 'updated_at'), [
+                (*self.get_person(index), now, now) for index in range(start, min(start + block_size, self.persons))
+            ])
+        for films in self.iter_blocks(block_size):
+            self._insert(
+                connection,
+                'film_work',
+                (
+                    'id', 'title', 'description', 'rating', 'type', 'creation_date', 'file_path',
+                    'created_at', 'updated_at',
+                ),
+                [(
+                    film['id'], film['title'], film['description'], film['rating'], film['type'],
+                    film['creation_date'], '', film['created_at'], film['updated_at'],
+                ) for film in films],
+            )
+            self._insert(connection, 'genre_film_work', ('id', 'film_work_id', 'genre_id', 'created_at'), [
+                (str(uuid4()), film['id'], genre_ids[name], now) for film in films for name in film['genre']
+            ])
+            self._insert(connection, 'person_film_work', ('id', 'film_work_id', 'person_id', 'role', 'created_at'), [
+                (str(uuid4()), film['id'], person['id'], person['role'], now)
+                for film in films for person in film['persons']
+            ])
+
+    @staticmethod
+    def _insert(connection: postgres_connection, table_name: str, fields: Tuple[str, ...], rows: List[tuple]) -> None:
+        """
+        Вставка строк в таблицу одним запросом.
+        :param connection: соединение с БД
+        :param table_name: имя таблицы в схеме content
+        :param fields: имена полей
+        :param rows: строки
+        :return:
+        """
+        query = SQL('INSERT INTO {table} ({fields}) VALUES %s ON CONFLICT DO NOTHING;').format(
+            table=Identifier('content', table_name),
+            fields=SQL(', ').join(map(Identifier, fields)),
+        )
+        with connection.cursor() as curs:
+            execute_values(curs, query, rows, page_size=len(rows) or 1)
+        if not connection.autocommit:
+            connection.commit()
@@ -0,0 +1,78 @@
+"""
+Транспорт ElasticSearch в памяти процесса для замеров без кластера.
+"""
+
+import gzip
+import json
+import random
+
+from elasticsearch import Elasticsearch
+from elastic_transport import ApiResponseMeta, BaseNode, HttpHeaders
+# класс ответа узла не экспортируется пакетом, но нужен собственному узлу транспорта
+from elastic_transport._node._base import NodeApiResponse
+
+
+class FakeElasticNode(BaseNode):
+    """
+    Узел, который разбирает bulk-запросы и подтверждает каждый документ, не сохраняя его.
+    Клиент сериализует запросы как обычно, поэтому замер включает всю работу ETL,
+    кроме сети и самого ElasticSearch. Доля отклоненных с кодом 429 документов задаётся reject_rate.
+    """
+
+    reject_rate = 0.0
+    requests = 0
+    documents = 0
+    bytes_sent = 0
+
+    def perform_request(self, method, target, body=None, headers=None, **kwargs):
+        """
+        Ответ на запрос клиента.
+        :return: ответ узла
+        """
+        response = {}
+        if target.split('?')[0].endswith('/_bulk'):
+            type(self).requests += 1
+            # настоящий узел сжимает тело сам, поэтому сжатие тоже входит в замер
+            type(self).bytes_sent += len(gzip.compress(body) if self._http_compress else body)
+            response = self._bulk_response(body)
+        meta = ApiResponseMeta(
+            status=200,
+            http_version='1.1',
+            headers=HttpHeaders({'x-elastic-product': 'Elasticsearch', 'content-type': 'application/json'}),
+            duration=0.0,
+            node=self.config,
+        )
+        return NodeApiResponse(meta, json.dumps(response).encode())
+
+    def _bulk_response(self, body: bytes) -> dict:
+        """
+        :param body: тело bulk-запроса
+        :return: результат по каждому документу
+        """
+        items = []
+        for action_line in body.splitlines()[0::2]:
+            operation, action = next(iter(json.loads(action_line).items()))
+            status = 429 if self.reject_rate and random.random() < self.reject_rate else 201
+            item = {'_id': action.get('_id'), 'status': status}
+            if status != 201:
+                item['error'] = {'type': 'es_rejected_execution_exception'}
+            else:
+                type(self).documents += 1
+            items.append({operation: item})
+        return {'took': 0, 'errors': any(next(iter(item.values()))['status'] != 201 for item in items), 'items': items}
+
+    @classmethod
+    def reset(cls) -> None:
+        """
+        Сброс счетчиков перед замером.
+        :return:
+        """
+        cls.requests = cls.documents = cls.bytes_sent = 0
+
+
+def get_fake_elastic_conn(http_compress: bool = False) -> Elasticsearch:
+    """
+    :param http_compress: сжимать тело запросов, как при ES_HTTP_COMPRESS
+    :return: клиент ElasticSearch с узлом в памяти процесса
+    """
+    return Elasticsearch('http://benchmark:9200', node_class=FakeElasticNode, http_compress=http_compress)
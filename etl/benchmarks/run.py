@@ -0,0 +1,188 @@
+"""
+Замер производительности стадий ETL на синтетическом каталоге.
+
+Запуск из каталога etl с переменными окружения ETL:
+    python -m benchmarks.run --films 100000
+    python -m benchmarks.run --films 10000 --save-baseline
+    python -m benchmarks.run --films 10000 --postgres --populate
+"""
+
+import sys
+import json
+import logging
+import argparse
+import platform
+import resource
+from pathlib import Path
+from time import perf_counter
+from collections import defaultdict
+from typing import Dict, List
+
+from elastic.saver import ElasticSearchSaver
+from elastic.data_formatter import format_rows
+from postgres.loader import MovieLoader
+from postgres.collector import ChangeCollector
+from state_storage.state import State, MemoryStorage
+
+from utils.logger import logger
+from utils.connections import get_postgres_conn
+from benchmarks.catalogue import Catalogue
+from benchmarks.fake_elastic import FakeElasticNode, get_fake_elastic_conn
+
+
+BASELINES_FILE = Path(__file__).with_name('baselines.json')
+CATALOGUE_SIZES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+STAGES = ('transform_model', 'transform_fast', 'save')
+
+
+def check_serialization(rows: List[Dict]) -> None:
+    """
+    Проверка, что быстрая сборка документов дает те же байты, что и модель pydantic.
+    :param rows: строки запроса обогащения
+    :return:
+    """
+    for model, document in zip(format_rows(rows, fast=False), format_rows(rows, fast=True)):
+        if model.json() != document.json():
+            raise AssertionError(f'Fast serialization differs from FilmWorkModel for film {document.id}')
+
+
+def run_stages(catalogue: Catalogue, block_size: int, stages: List[str], http_compress: bool) -> Dict[str, float]:
+    """
+    Прогон стадий преобразования и записи по блокам каталога.
+    Блоки генерируются по одному, поэтому пиковая память не зависит от размера каталога.
+    :param catalogue: синтетический каталог
+    :param block_size: размер блока строк
+    :param stages: стадии для замера
+    :param http_compress: сжимать тело bulk-запросов
+    :return: время каждой стадии в секундах
+    """
+    timings = defaultdict(float)
+    saver = ElasticSearchSaver(get_fake_elastic_conn(http_compress))
+    FakeElasticNode.reset()
+    checked = False
+    for rows in catalogue.iter_blocks(block_size):
+        if not checked:
+            check_serialization(rows)
+            checked = True
+        if 'transform_model' in stages:
+            started = perf_counter()
+            format_rows(rows, fast=False)
+            timings['transform_model'] += perf_counter() - started
+        if 'transform_fast' in stages or 'save' in stages:
+            started = perf_counter()
+            documents = format_rows(rows, fast=True)
+            timings['transform_fast'] += perf_counter() - started
+        if 'save' in stages:
+            started = perf_counter()
+            for document in documents:
+                saver.add(document)
+            timings['save'] += perf_counter() - started
+    if 'save' in stages:
+        started = perf_counter()
+        saver.save()
+        timings['save'] += perf_counter() - started
+    return {stage: timings[stage] for stage in stages}
+
+
+def run_extract(catalogue: Catalogue, block_size: int, populate: bool) -> float:
+    """
+    Замер полного чтения каталога из локального PostgreSQL: сканирование фильмов и запрос обогащения.
+    :param catalogue: синтетический каталог
+    :param block_size: размер блока для заполнения БД
+    :param populate: записать каталог в БД перед замером
+    :return: время чтения в секундах
+    """
+    connection = get_postgres_conn()
+    try:
+        if populate:
+            started = perf_counter()
+            catalogue.populate(connection, block_size)
+            print(f'Populated PostgreSQL with {catalogue.films} films in {perf_counter() - started:.1f} s')
+        loader = MovieLoader(connection, State(MemoryStorage()))
+        started, rows = perf_counter(), 0
+        for change_set in ChangeCollector([loader]).collect():
+            for ids in change_set.iter_blocks(int(loader.data_block_size)):
+                rows += sum(len(data) for data in loader.get_movies_info(ids))
+        elapsed = perf_counter() - started
+        print(f'Extracted {rows} films from PostgreSQL')
+        return elapsed
+    finally:
+        connection.close()
+
+
+def compare_with_baseline(result: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    :param result: результат текущего замера
+    :param baseline: сохраненный результат
+    :param tolerance: допустимое снижение скорости, доля
+    :return: описания стадий, которые стали медленнее допустимого
+    """
+    regressions = []
+    for stage, stats in result['stages'].items():
+        expected = baseline.get('stages', {}).get(stage, {}).get('rows_per_second')
+        if expected and stats['rows_per_second'] < expected * (1 - tolerance):
+            regressions.append(f'{stage}: {stats["rows_per_second"]:.0f} rows/s, baseline {expected:.0f} rows/s')
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark ETL stages on a synthetic catalogue.')
+    parser.add_argument('--films', default='10k', help=f'catalogue size: {", ".join(CATALOGUE_SIZES)} or a number')
+    parser.add_argument('--block-size', type=int, default=100, help='rows per Postgres block')
+    parser.add_argument('--stages', default=','.join(STAGES), help='comma separated stages to measure')
+    parser.add_argument('--seed', type=int, default=0, help='catalogue random seed')
+    parser.add_argument('--http-compress', action='store_true', help='gzip bulk request bodies')
+    parser.add_argument('--postgres', action='store_true', help='also measure extraction from a local PostgreSQL')
+    parser.add_argument('--populate', action='store_true', help='write the catalogue to PostgreSQL before extracting')
+    parser.add_argument('--baseline', type=Path, default=BASELINES_FILE, help='baseline results file')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown against the baseline')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+    films = CATALOGUE_SIZES.get(args.films.lower()) or int(args.films)
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f'unknown stages: {", ".join(sorted(unknown))}')
+    catalogue = Catalogue(films, seed=args.seed)
+
+    timings = run_stages(catalogue, args.block_size, stages, args.http_compress)
+    if args.postgres:
+        timings['extract'] = run_extract(catalogue, args.block_size, args.populate)
+    result = {
+        'films': films,
+        'block_size': args.block_size,
+        'es_data_block_size': int(ElasticSearchSaver.data_block_size),
+        'python': platform.python_version(),
+        # ru_maxrss в Linux измеряется в килобайтах
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'bulk_requests': FakeElasticNode.requests,
+        'bulk_bytes': FakeElasticNode.bytes_sent,
+        'stages': {
+            stage: {'seconds': round(seconds, 3), 'rows_per_second': round(films / seconds, 1) if seconds else 0.0}
+            for stage, seconds in timings.items()
+        },
+    }
+    print(f'{films} films, block size {args.block_size}, peak RSS {result["peak_rss_mb"]} MB')
+    for stage, stats in result['stages'].items():
+        print(f'  {stage:<16} {stats["seconds"]:>10.3f} s {stats["rows_per_second"]:>12.0f} rows/s')
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    key = str(films)
+    if args.save_baseline:
+        baselines[key] = result
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + '\n')
+        print(f'Saved baseline for {films} films to {args.baseline}')
+        return 0
+    if key not in baselines:
+        print(f'No baseline for {films} films in {args.baseline}')
+        return 0
+    regressions = compare_with_baseline(result, baselines[key], args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
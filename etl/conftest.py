@@ -0,0 +1,15 @@
+"""
+Общие настройки тестов ETL.
+"""
+
+import os
+from pathlib import Path
+
+ENV_EXAMPLE_FILE = Path(__file__).resolve().parent.parent / '.env.example'
+
+# конфигурация pydantic читается из окружения при импорте модулей,
+# поэтому недостающие переменные берутся из примера до сбора тестов
+for line in ENV_EXAMPLE_FILE.read_text().splitlines():
+    name, separator, value = line.partition('=')
+    if separator and not name.startswith('#'):
+        os.environ.setdefault(name.strip(), value.strip().strip("'"))
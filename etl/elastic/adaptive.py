@@ -0,0 +1,102 @@
+"""
+Подстройка размера bulk-запросов и количества потоков под нагрузку на ElasticSearch.
+"""
+
+from math import ceil
+
+from utils.logger import logger
+from utils.configuration import ExtraConfig
+from utils.metrics import BULK_CHUNK_SIZE, BULK_THREADS
+
+
+class AdaptiveBulkController:
+    """
+    Регулятор по принципу AIMD: пока кластер отвечает быстро, размер запроса растёт на постоянный шаг,
+    а когда упирается в ограничения, потоков и документов в запросе становится меньше в разы.
+    Отклоненные документы (429) уменьшают и размер запроса, и количество потоков вдвое,
+    задержка выше целевой или слишком большое тело запроса — только размер запроса.
+    Размер растёт, пока задержка меньше половины целевой, а на максимальном размере добавляется поток.
+    """
+
+    extra_config = ExtraConfig()
+    min_chunk_size: int = extra_config.ES_ADAPTIVE_MIN_CHUNK_SIZE
+    max_chunk_size: int = extra_config.ES_ADAPTIVE_MAX_CHUNK_SIZE
+    chunk_size_step: int = extra_config.ES_ADAPTIVE_CHUNK_SIZE_STEP
+    min_threads: int = extra_config.ES_ADAPTIVE_MIN_THREADS
+    max_threads: int = extra_config.ES_ADAPTIVE_MAX_THREADS
+    target_latency: float = extra_config.ES_ADAPTIVE_TARGET_LATENCY
+    max_bytes: int = extra_config.ES_BULK_MAX_BYTES
+    decrease_factor: float = 0.5
+    slow_decrease_factor: float = 0.75
+
+    def __init__(self, chunk_size: int | None = None, threads: int | None = None):
+        """
+        Инициализация переменных
+        :param chunk_size: начальное количество документов в запросе, по умолчанию ES_BULK_CHUNK_SIZE
+        :param threads: начальное количество потоков, по умолчанию ES_BULK_THREADS
+        """
+        chunk_size = chunk_size or self.extra_config.ES_BULK_CHUNK_SIZE
+        threads = threads or self.extra_config.ES_BULK_THREADS
+        self.chunk_size = self._clamp(chunk_size, self.min_chunk_size, self.max_chunk_size)
+        self.threads = self._clamp(threads, self.min_threads, self.max_threads)
+        BULK_CHUNK_SIZE.set(self.chunk_size)
+        BULK_THREADS.set(self.threads)
+
+    @staticmethod
+    def _clamp(value: float, low: int, high: int) -> int:
+        """
+        :return: значение в пределах [low, high]
+        """
+        return int(max(low, min(high, value)))
+
+    @property
+    def flush_size(self) -> int:
+        """
+        :return: количество документов, которое занимает все потоки одним запросом каждый
+        """
+        return self.chunk_size * self.threads
+
+    def record(self, documents: int, requests: int, seconds: float, payload_bytes: int, rejected: int) -> None:
+        """
+        Учет результата отправки документов и пересчет параметров.
+        :param documents: количество отправленных документов
+        :param requests: количество bulk-запросов
+        :param seconds: время отправки всех запросов
+        :param payload_bytes: суммарный размер документов
+        :param rejected: количество документов, отклоненных из-за перегрузки кластера
+        :return:
+        """
+        if not documents or not requests:
+            return
+        # запросы выполняются волнами по threads штук, задержка одного запроса — время волны
+        latency = seconds / ceil(requests / self.threads)
+        request_bytes = payload_bytes / requests
+        chunk_size, threads = self.chunk_size, self.threads
+        if rejected:
+            chunk_size *= self.decrease_factor
+            threads = ceil(threads * self.decrease_factor)
+            reason = f'{rejected / documents:.1%} of documents rejected'
+        elif latency > self.target_latency:
+            chunk_size *= self.slow_decrease_factor
+            reason = f'latency {latency:.2f} s above target {self.target_latency} s'
+        elif request_bytes > self.max_bytes:
+            chunk_size *= self.max_bytes / request_bytes
+            reason = f'request size {request_bytes / 1024:.0f} KiB above {self.max_bytes / 1024:.0f} KiB'
+        elif latency < self.target_latency / 2 and requests >= self.threads:
+            if chunk_size >= self.max_chunk_size:
+                threads += 1
+            chunk_size += self.chunk_size_step
+            reason = f'latency {latency:.2f} s below target {self.target_latency} s'
+        else:
+            return
+        chunk_size = self._clamp(chunk_size, self.min_chunk_size, self.max_chunk_size)
+        threads = self._clamp(threads, self.min_threads, self.max_threads)
+        if (chunk_size, threads) == (self.chunk_size, self.threads):
+            return
+        logger.info(
+            f'Adaptive bulk: chunk size {self.chunk_size} -> {chunk_size}, '
+            f'threads {self.threads} -> {threads} ({reason})...'
+        )
+        self.chunk_size, self.threads = chunk_size, threads
+        BULK_CHUNK_SIZE.set(chunk_size)
+        BULK_THREADS.set(threads)
@@ -2,9 +2,47 @@
 Модель для форматирования данных из PostgreSQL в ElasticSearch.
 """
 
+import json
+import datetime
 from uuid import UUID
-from typing import List
 from pydantic import BaseModel
+from typing import Any, List, Iterable, Mapping, NamedTuple
+
+
+UPDATED_AT_KEY = ', "updated_at": '
+
+
+def encode_date(value: Any) -> str:
+    """
+    Сериализация дат в формате ISO 8601, как у pydantic.
+    :param value: дата или дата и время
+    :return: строка с датой
+    """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def get_content(source: str) -> str:
+    """
+    Содержимое документа без даты обновления, по нему считается отпечаток документа.
+    Сохранение фильма без изменений меняет только updated_at, такой документ не нужно переиндексировать.
+    Поле updated_at в документе последнее, а кавычки внутри строк экранированы,
+    поэтому отрезается именно это поле.
+    :param source: документ в формате JSON
+    :return: документ без поля updated_at
+    """
+    return source.rpartition(UPDATED_AT_KEY)[0] or source
+
+
+def get_genres(film_info: Mapping) -> List[str]:
+    """
+    Жанры фильма без пустых значений.
+    Запрос с LEFT JOIN для фильма без жанров возвращает [null], денормализованная таблица — пустой массив.
+    :param film_info: данные о кинопроизведении
+    :return: названия жанров
+    """
+    return [name for name in film_info.get('genre') or [] if name is not None]
 
 
 class Person(BaseModel):
@@ -20,6 +58,8 @@ class FilmWorkModel(BaseModel):
     id: UUID
     title: str
     description: str
+    creation_date: datetime.date | None
+    type: str
     genre: list[str]
     imdb_rating: float
     director: list[str]
@@ -27,6 +67,8 @@ class FilmWorkModel(BaseModel):
     writers: list[Person]
     actors_names: list[str]
     writers_names: list[str]
+    # последнее поле: get_content отрезает его от JSON документа
+    updated_at: datetime.datetime
 
     @classmethod
     def init_from_sql(cls, **film_info):
@@ -53,8 +95,11 @@ class FilmWorkModel(BaseModel):
         return cls(
             id=film_info.get('id'),
             title=film_info.get('title'),
-            genre=film_info.get('genre'),
+            genre=get_genres(film_info),
             description=film_info.get('description'),
+            creation_date=film_info.get('creation_date'),
+            type=film_info.get('type'),
+            updated_at=film_info.get('updated_at'),
             imdb_rating=film_info['rating'] if film_info.get('rating') else 0,
             actors=actors,
             writers=writers,
@@ -62,3 +107,65 @@ class FilmWorkModel(BaseModel):
             actors_names=[i.name for i in actors],
             writers_names=[i.name for i in writers],
         )
+
+
+class FilmWorkDocument(NamedTuple):
+    """Готовый к индексации документ, собранный без валидации pydantic."""
+
+    id: str
+    source: str
+
+    def json(self) -> str:
+        """
+        :return: документ в формате JSON
+        """
+        return self.source
+
+    @classmethod
+    def init_from_sql(cls, **film_info):
+        """
+        Сборка документа напрямую из строки PostgreSQL.
+        Данные из БД считаются проверенными, поэтому документ собирается из словарей
+        с тем же порядком полей и теми же значениями, что и FilmWorkModel, и сериализуется
+        json.dumps с настройками по умолчанию, как BaseModel.json().
+        :param film_info: данные о кинопроизведении
+        :return:
+        """
+        actors, writers, director = [], [], []
+        for person in film_info.get('persons') or []:
+            role = person.get('role')
+            if role == 'actor':
+                actors.append({'id': str(person.get('id')), 'name': person.get('name')})
+            elif role == 'writer':
+                writers.append({'id': str(person.get('id')), 'name': person.get('name')})
+            elif role == 'director':
+                director.append(person.get('name'))
+        film_id = str(film_info.get('id'))
+        source = {
+            'id': film_id,
+            'title': film_info.get('title'),
+            'description': film_info.get('description'),
+            'creation_date': film_info.get('creation_date'),
+            'type': film_info.get('type'),
+            'genre': get_genres(film_info),
+            'imdb_rating': float(film_info['rating']) if film_info.get('rating') else 0.0,
+            'director': director,
+            'actors': actors,
+            'writers': writers,
+            'actors_names': [actor['name'] for actor in actors],
+            'writers_names': [writer['name'] for writer in writers],
+            'updated_at': film_info.get('updated_at'),
+        }
+        return cls(id=film_id, source=json.dumps(source, default=encode_date))
+
+
+def format_rows(rows: Iterable[Mapping], fast: bool = False) -> List[FilmWorkModel | FilmWorkDocument]:
+    """
+    Форматирование блока строк PostgreSQL в документы ElasticSearch.
+    Функция уровня модуля, чтобы её можно было выполнять в пуле процессов.
+    :param rows: строки с данными о кинопроизведениях
+    :param fast: собирать документы без pydantic (ES_FAST_SERIALIZATION)
+    :return: документы для индексации
+    """
+    formatter = FilmWorkDocument if fast else FilmWorkModel
+    return [formatter.init_from_sql(**film) for film in rows]
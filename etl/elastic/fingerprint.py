@@ -0,0 +1,84 @@
+"""
+Отпечатки документов для пропуска записей, которые не меняют индекс.
+"""
+
+from hashlib import blake2b
+from typing import Iterable
+from collections import OrderedDict
+
+
+class FingerprintCache:
+    """
+    Кэш хэшей последних записанных документов по идентификатору фильма.
+    Размер ограничен, при переполнении вытесняются давно не записывавшиеся фильмы.
+    """
+
+    digest_size = 16
+
+    def __init__(self, max_size: int):
+        """
+        Инициализация переменных
+        :param max_size: максимальное количество фильмов в кэше
+        """
+        self.max_size = max_size
+        self._digests = OrderedDict()
+        self.checked = 0
+        self.skipped = 0
+
+    @classmethod
+    def digest(cls, source: str) -> bytes:
+        """
+        Стабильный хэш содержимого документа.
+        :param source: документ в формате JSON
+        :return: хэш документа
+        """
+        return blake2b(source.encode(), digest_size=cls.digest_size).digest()
+
+    def is_unchanged(self, document_id: str, digest: bytes) -> bool:
+        """
+        Проверка, совпадает ли документ с последним записанным.
+        :param document_id: идентификатор документа
+        :param digest: хэш документа
+        :return: True, если запись можно пропустить
+        """
+        self.checked += 1
+        if self._digests.get(document_id) != digest:
+            return False
+        self._digests.move_to_end(document_id)
+        self.skipped += 1
+        return True
+
+    def update(self, document_id: str, digest: bytes) -> None:
+        """
+        Запоминание хэша документа, подтвержденного ElasticSearch.
+        :param document_id: идентификатор документа
+        :param digest: хэш документа
+        :return:
+        """
+        self._digests[document_id] = digest
+        self._digests.move_to_end(document_id)
+        if len(self._digests) > self.max_size:
+            self._digests.popitem(last=False)
+
+    def discard(self, document_ids: Iterable[str]) -> None:
+        """
+        Сброс хэшей документов, например после их частичного обновления на стороне ElasticSearch.
+        :param document_ids: идентификаторы документов
+        :return:
+        """
+        for document_id in document_ids:
+            self._digests.pop(document_id, None)
+
+    def clear(self) -> None:
+        """
+        Сброс всех хэшей.
+        :return:
+        """
+        self._digests.clear()
+
+    @property
+    def skip_ratio(self) -> float:
+        """
+        :return: доля пропущенных документов за всё время работы
+        """
+        return self.skipped / self.checked if self.checked else 0.0
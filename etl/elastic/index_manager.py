@@ -0,0 +1,118 @@
+"""
+Управление версиями индекса ElasticSearch для переиндексации без простоя.
+"""
+
+import json
+import datetime
+from typing import List
+
+from elasticsearch import Elasticsearch, NotFoundError
+
+from .tasks import wait_for_task
+from utils.logger import logger
+from utils.configuration import ExtraConfig
+
+
+class IndexManager:
+    """
+    Версионированные индексы за алиасом ES_INDEX_NAME.
+    Поиск и инкрементальная загрузка всегда работают с алиасом, а новая версия индекса
+    наполняется отдельно и подключается к алиасу атомарной заменой.
+    """
+
+    extra_config = ExtraConfig()
+    alias: str = extra_config.ES_INDEX_NAME
+    index_file: str = extra_config.ES_INDEX_FILE
+    bulk_settings = {'refresh_interval': '-1', 'number_of_replicas': 0}
+    default_replicas = 1
+
+    def __init__(self, connection: Elasticsearch):
+        """
+        Инициализация переменных
+        :param connection: соединение с ElasticSearch
+        """
+        self.connection = connection
+        with open(self.index_file, 'r') as index_file:
+            self.index_body = json.load(index_file)
+
+    def get_live_indices(self) -> List[str]:
+        """
+        :return: индексы, на которые сейчас указывает алиас, или сам индекс, если алиаса ещё нет
+        """
+        if self.connection.indices.exists_alias(name=self.alias):
+            return list(self.connection.indices.get_alias(name=self.alias))
+        if self.connection.indices.exists(index=self.alias):
+            return [self.alias]
+        return []
+
+    def create_version(self) -> str:
+        """
+        Создание новой версии индекса с настройками для массовой загрузки.
+        :return: имя новой версии индекса
+        """
+        index_name = f'{self.alias}_{datetime.datetime.utcnow():%Y%m%d%H%M%S}'
+        settings = {**self.index_body.get('settings', {}), **self.bulk_settings}
+        self.connection.indices.create(
+            index=index_name,
+            settings=settings,
+            mappings=self.index_body.get('mappings', {}),
+        )
+        logger.info(f'Created index {index_name} for full reindex...')
+        return index_name
+
+    def finalize_version(self, index_name: str) -> None:
+        """
+        Возврат рабочих настроек индекса после массовой загрузки и слияние сегментов.
+        Слияние в один сегмент на большом индексе длится дольше ES_TIMEOUT, поэтому оно запускается
+        фоновой задачей и ожидается опросом.
+        :param index_name: имя версии индекса
+        :return:
+        """
+        replicas = self.default_replicas
+        live_indices = self.get_live_indices()
+        if live_indices:
+            live_settings = self.connection.indices.get_settings(index=live_indices[0])
+            replicas = int(live_settings[live_indices[0]]['settings']['index'].get('number_of_replicas', replicas))
+        self.connection.indices.put_settings(
+            index=index_name,
+            settings={
+                'refresh_interval': self.index_body.get('settings', {}).get('refresh_interval', '1s'),
+                'number_of_replicas': replicas,
+            },
+        )
+        self.connection.indices.refresh(index=index_name)
+        task = self.connection.indices.forcemerge(index=index_name, max_num_segments=1, wait_for_completion=False)
+        wait_for_task(self.connection, task['task'])
+        logger.info(f'Restored settings and force merged index {index_name}...')
+
+    def swap_alias(self, index_name: str) -> List[str]:
+        """
+        Атомарное переключение алиаса на новую версию индекса.
+        Если под именем алиаса пока существует обычный индекс, он удаляется в том же запросе.
+        :param index_name: имя версии индекса
+        :return: индексы, на которые алиас указывал раньше
+        """
+        previous = [index for index in self.get_live_indices() if index != index_name]
+        actions = []
+        for index in previous:
+            if index == self.alias:
+                actions.append({'remove_index': {'index': index}})
+            else:
+                actions.append({'remove': {'index': index, 'alias': self.alias}})
+        actions.append({'add': {'index': index_name, 'alias': self.alias}})
+        self.connection.indices.update_aliases(actions=actions)
+        logger.info(f'Alias {self.alias} now points to {index_name}...')
+        return previous
+
+    def delete_indices(self, indices: List[str]) -> None:
+        """
+        Удаление старых версий индекса.
+        :param indices: имена индексов
+        :return:
+        """
+        for index in indices:
+            try:
+                self.connection.indices.delete(index=index)
+            except NotFoundError:
+                continue
+            logger.info(f'Deleted index {index}...')
@@ -0,0 +1,154 @@
+"""
+Частичное обновление вложенных полей документов при переименовании персон и жанров.
+"""
+
+from typing import Dict
+
+from elasticsearch import Elasticsearch, helpers
+
+from .tasks import wait_for_task
+from .fingerprint import FingerprintCache
+from utils.logger import logger
+from utils.configuration import ExtraConfig
+
+
+RENAME_PERSONS_SCRIPT = '''
+    boolean changed = false;
+    for (def field : ['actors', 'writers']) {
+        def persons = ctx._source[field];
+        if (persons == null) {
+            continue;
+        }
+        List names = new ArrayList();
+        for (def person : persons) {
+            if (params.names.containsKey(person.id) && person.name != params.names[person.id]) {
+                person.name = params.names[person.id];
+                changed = true;
+            }
+            names.add(person.name);
+        }
+        ctx._source[field + '_names'] = names;
+    }
+    if (!changed) {
+        ctx.op = 'noop';
+    }
+'''
+
+RENAME_GENRES_SCRIPT = '''
+    boolean changed = false;
+    def genres = ctx._source.genre;
+    if (genres != null) {
+        for (int i = 0; i < genres.size(); i++) {
+            if (params.renames.containsKey(genres[i])) {
+                genres[i] = params.renames[genres[i]];
+                changed = true;
+            }
+        }
+    }
+    if (!changed) {
+        ctx.op = 'noop';
+    }
+'''
+
+
+class PartialUpdateError(Exception):
+    """Часть документов не обновлена из-за конфликта версий или ошибки, изменения нужно обработать повторно."""
+
+
+class NestedFieldUpdater:
+    """
+    Переименование персон и жанров одним запросом update_by_query на стороне ElasticSearch
+    вместо обогащения и переиндексации каждого связанного фильма.
+    """
+
+    index_name: str = ExtraConfig().ES_INDEX_NAME
+
+    def __init__(
+            self,
+            connection: Elasticsearch,
+            index_name: str | None = None,
+            fingerprints: FingerprintCache | None = None,
+    ):
+        """
+        Инициализация переменных
+        :param connection: соединение с ElasticSearch
+        :param index_name: индекс или алиас, по умолчанию ES_INDEX_NAME
+        :param fingerprints: кэш отпечатков записанных документов, который устаревает после обновления
+        """
+        self.connection = connection
+        self.fingerprints = fingerprints
+        if index_name is not None:
+            self.index_name = index_name
+
+    def rename_persons(self, names: Dict[str, str]) -> int:
+        """
+        Обновление имен актёров и сценаристов во вложенных полях и полях *_names.
+        Режиссёры хранятся в документе только по имени, поэтому их обновляет вызывающий код.
+        :param names: новые имена по идентификаторам персон
+        :return: количество измененных документов
+        """
+        if not names:
+            return 0
+        ids = list(names)
+        query = {'bool': {'should': [
+            {'nested': {'path': 'actors', 'query': {'terms': {'actors.id': ids}}}},
+            {'nested': {'path': 'writers', 'query': {'terms': {'writers.id': ids}}}},
+        ]}}
+        return self._update_by_query(query, RENAME_PERSONS_SCRIPT, {'names': names})
+
+    def rename_genres(self, renames: Dict[str, str]) -> int:
+        """
+        Замена названий жанров.
+        :param renames: новые названия по прежним названиям
+        :return: количество измененных документов
+        """
+        if not renames:
+            return 0
+        query = {'terms': {'genre': list(renames)}}
+        return self._update_by_query(query, RENAME_GENRES_SCRIPT, {'renames': renames})
+
+    def _update_by_query(self, query: dict, script: str, params: dict) -> int:
+        """
+        Выполнение скрипта для всех документов, подходящих под запрос.
+        Запрос выполняется фоновой задачей, которая может идти дольше ES_TIMEOUT.
+        Идентификаторы подходящих документов читаются заранее: после переименования прежние названия
+        уже не найти, а сбросить нужно отпечатки только этих документов.
+        Документы с конфликтом версий (их одновременно переиндексировали) или ошибкой остаются
+        со старым названием, поэтому в этом случае выбрасывается исключение: состояние загрузчика
+        не сохраняется, и изменения обрабатываются повторно.
+        :param query: запрос на документы
+        :param script: скрипт painless
+        :param params: параметры скрипта
+        :return: количество измененных документов
+        :raises PartialUpdateError: если часть документов не обновлена
+        """
+        affected_ids = []
+        if self.fingerprints is not None:
+            affected_ids = [
+                hit['_id'] for hit in helpers.scan(
+                    self.connection, index=self.index_name, query={'query': query, '_source': False},
+                )
+            ]
+        task = self.connection.update_by_query(
+            index=self.index_name,
+            query=query,
+            script={'source': script, 'lang': 'painless', 'params': params},
+            conflicts='proceed',
+            slices='auto',
+            wait_for_completion=False,
+        )
+        response = wait_for_task(self.connection, task['task'])
+        conflicts, failures = response.get('version_conflicts', 0), len(response.get('failures', []))
+        logger.info(
+            f'Partially updated {response["updated"]} documents '
+            f'({response["noops"]} unchanged, {conflicts} conflicts, {failures} failures)...'
+        )
+        if response['updated'] and self.fingerprints is not None:
+            # отпечатки измененных документов больше не совпадают с индексом
+            self.fingerprints.discard(affected_ids)
+        if conflicts or failures:
+            raise PartialUpdateError(
+                f'{conflicts} version conflicts and {failures} failures in update_by_query, '
+                f'{response["updated"]} documents updated'
+            )
+        return response['updated']
@@ -2,12 +2,20 @@
 Загрузка данных в Elastic Search.
 """
 
-from typing import Generator
+from math import ceil
+from time import sleep, perf_counter
 from elasticsearch import Elasticsearch, helpers
+from typing import Generator, Iterable, List, Mapping, Set
 
-from .data_formatter import FilmWorkModel
+from .fingerprint import FingerprintCache
+from .adaptive import AdaptiveBulkController
+from .data_formatter import FilmWorkModel, format_rows, get_content
 from utils.configuration import ExtraConfig
 from utils.logger import logger
+from utils.metrics import BULK_FAILURES, BULK_RETRIES, INDEXED_DOCUMENTS, STAGE_LATENCY
+
+
+RETRYABLE_STATUSES = (429, 502, 503, 504)
 
 
 class ElasticSearchSaver:
@@ -16,13 +24,42 @@ class ElasticSearchSaver:
     extra_config = ExtraConfig()
     data_block_size: int = extra_config.ES_DATA_BLOCK_SIZE
     index_name: str = extra_config.ES_INDEX_NAME
+    concurrent_bulk: bool = extra_config.ES_BULK_CONCURRENT
+    bulk_threads: int = extra_config.ES_BULK_THREADS
+    bulk_chunk_size: int = extra_config.ES_BULK_CHUNK_SIZE
+    bulk_max_bytes: int = extra_config.ES_BULK_MAX_BYTES
+    bulk_max_retries: int = extra_config.ES_BULK_MAX_RETRIES
+    adaptive_bulk: bool = extra_config.ES_ADAPTIVE_BULK
+    bulk_start_sleep_time: float = 0.5
+    bulk_border_sleep_time: float = 30
 
-    def __init__(self, elastic_connection: Elasticsearch):
+    def __init__(
+            self,
+            elastic_connection: Elasticsearch,
+            index_name: str | None = None,
+            fingerprints: FingerprintCache | None = None,
+            controller: AdaptiveBulkController | None = None,
+            fast_serialization: bool | None = None,
+    ):
         """
         Инициализация переменных
         :param elastic_connection: соединение с ElasticSearch
+        :param index_name: индекс или алиас для записи, по умолчанию ES_INDEX_NAME
+        :param fingerprints: кэш отпечатков для пропуска неизменившихся документов
+        :param controller: регулятор размера запросов, переживающий отдельные циклы загрузки;
+            без него при ES_ADAPTIVE_BULK создаётся собственный
+        :param fast_serialization: собирать документы без pydantic, по умолчанию ES_FAST_SERIALIZATION
         """
         self.connection = elastic_connection
+        if index_name is not None:
+            self.index_name = index_name
+        self.fingerprints = fingerprints
+        if controller is None and self.adaptive_bulk:
+            controller = AdaptiveBulkController()
+        self.controller = controller
+        if fast_serialization is None:
+            fast_serialization = ExtraConfig().ES_FAST_SERIALIZATION
+        self.fast_serialization = fast_serialization
         self.__documents = []
 
     def add(self, document: dict) -> None:
@@ -32,7 +69,8 @@ class ElasticSearchSaver:
         :return:
         """
         self.__documents.append(document)
-        if len(self.__documents) >= self.data_block_size:
+        block_size = self.controller.flush_size if self.controller is not None else self.data_block_size
+        if len(self.__documents) >= block_size:
             self.save()
 
     def save(self) -> None:
@@ -45,27 +83,136 @@ class ElasticSearchSaver:
             Подготовка документов к индексированию в ElasticSearch.
             :return:
             """
-            for document in self.__documents:
+            for document_id, source in documents:
                 action = {
                     '_index': self.index_name,
                     '_op_type': 'index',
-                    '_id': str(document.id),
-                    '_source': document.json(),
+                    '_id': document_id,
+                    '_source': source,
                 }
                 yield action
-        helpers.bulk(self.connection, __prepare_docs())
-        logger.info(f'Inserted {len(self.__documents)} rows...')
+        documents, digests = [], {}
+        for document in self.__documents:
+            document_id, source = str(document.id), document.json()
+            if self.fingerprints is not None:
+                digest = self.fingerprints.digest(get_content(source))
+                if self.fingerprints.is_unchanged(document_id, digest):
+                    continue
+                digests[document_id] = digest
+            documents.append((document_id, source))
+
+        rejected = set()
+        started = perf_counter()
+        if documents and (self.concurrent_bulk or self.controller is not None):
+            rejected = self._concurrent_bulk(list(__prepare_docs()))
+        elif documents:
+            try:
+                helpers.bulk(self.connection, __prepare_docs())
+            except helpers.BulkIndexError as error:
+                BULK_FAILURES.inc(len(error.errors))
+                raise
+        if documents:
+            STAGE_LATENCY.labels('es_bulk').observe(perf_counter() - started)
+            INDEXED_DOCUMENTS.inc(len(documents) - len(rejected))
+        for document_id, digest in digests.items():
+            if document_id not in rejected:
+                self.fingerprints.update(document_id, digest)
+
+        skipped = len(self.__documents) - len(documents)
+        if self.fingerprints is not None:
+            logger.info(
+                f'Inserted {len(documents)} rows, skipped {skipped} unchanged '
+                f'(skip ratio {self.fingerprints.skip_ratio:.1%})...'
+            )
+        else:
+            logger.info(f'Inserted {len(documents)} rows...')
         self.__documents = []
 
+    def _concurrent_bulk(self, actions: List[dict]) -> Set[str]:
+        """
+        Параллельная отправка документов несколькими запросами bulk.
+        Ошибка отдельного документа не отменяет запись остальных: документы с временными ошибками
+        (переполнение очереди, недоступность узла) отправляются повторно с увеличивающейся паузой,
+        документы с постоянными ошибками логируются и пропускаются.
+        Без регулятора документы делятся поровну между ES_BULK_THREADS потоками (не больше
+        ES_BULK_CHUNK_SIZE в запросе), иначе буфер ES_DATA_BLOCK_SIZE уходил бы одним запросом.
+        При ES_ADAPTIVE_BULK размер запросов и количество потоков берутся у регулятора,
+        который пересчитывает их по результату каждой попытки.
+        :param actions: действия для bulk-запроса
+        :return: идентификаторы документов, отклоненных с постоянной ошибкой
+        """
+        rejected = set()
+        sleep_time = self.bulk_start_sleep_time
+        for attempt in range(self.bulk_max_retries + 1):
+            if attempt:
+                logger.warning(f'Retrying {len(actions)} rejected documents in {sleep_time} s...')
+                sleep(sleep_time)
+                sleep_time = min(sleep_time * 2, self.bulk_border_sleep_time)
+            thread_count = self.bulk_threads
+            chunk_size = max(min(self.bulk_chunk_size, ceil(len(actions) / thread_count)), 1)
+            if self.controller is not None:
+                thread_count, chunk_size = self.controller.threads, self.controller.chunk_size
+            started = perf_counter()
+            results = helpers.parallel_bulk(
+                self.connection,
+                actions,
+                thread_count=thread_count,
+                chunk_size=chunk_size,
+                max_chunk_bytes=self.bulk_max_bytes,
+                raise_on_error=False,
+                raise_on_exception=False,
+            )
+            retry_actions, errors = [], []
+            for action, (ok, item) in zip(actions, results):
+                if ok:
+                    continue
+                info = next(iter(item.values()))
+                if info.get('status') in RETRYABLE_STATUSES:
+                    retry_actions.append(action)
+                else:
+                    errors.append(item)
+                    rejected.add(action['_id'])
+                    logger.error(f'Document {action["_id"]} was rejected: {info.get("error")}')
+            if self.controller is not None:
+                self.controller.record(
+                    documents=len(actions),
+                    requests=ceil(len(actions) / chunk_size),
+                    seconds=perf_counter() - started,
+                    payload_bytes=sum(len(action['_source']) for action in actions),
+                    rejected=len(retry_actions),
+                )
+            if errors:
+                BULK_FAILURES.inc(len(errors))
+                logger.error(f'Skipped {len(errors)} documents with non-retryable errors...')
+            if not retry_actions:
+                return rejected
+            if attempt < self.bulk_max_retries:
+                BULK_RETRIES.inc(len(retry_actions))
+            actions = retry_actions
+        BULK_FAILURES.inc(len(actions))
+        raise helpers.BulkIndexError(
+            f'{len(actions)} documents were not indexed after {self.bulk_max_retries} retries',
+            [{'index': {'_id': action['_id']}} for action in actions],
+        )
+
+    def transform(self, rows: Iterable[Mapping]) -> List[FilmWorkModel]:
+        """
+        Преобразование блока строк PostgreSQL в документы.
+        :param rows: строки из PostgreSQL
+        :return: документы для индексации
+        """
+        started = perf_counter()
+        documents = format_rows(rows, fast=self.fast_serialization)
+        STAGE_LATENCY.labels('transform').observe(perf_counter() - started)
+        return documents
+
     def load_from_psql(self, data: Generator[dict, None, None]) -> None:
         """
         Загрузка данных из PostgreSQL.
         :param data: данные из PostgreSQL
         :return:
         """
-        formatter = FilmWorkModel
         for row in data:
-            for film in row:
-                formatted_row = formatter.init_from_sql(**film)
-                self.add(formatted_row)
+            for document in self.transform(row):
+                self.add(document)
         self.save()
@@ -0,0 +1,40 @@
+"""
+Ожидание фоновых задач ElasticSearch.
+"""
+
+from time import sleep
+
+from elasticsearch import Elasticsearch
+
+from utils.logger import logger
+from utils.configuration import ExtraConfig
+
+
+POLL_INTERVAL = ExtraConfig().ES_TASK_POLL_INTERVAL
+
+
+class TaskFailedError(Exception):
+    """Фоновая задача ElasticSearch завершилась с ошибкой."""
+
+
+def wait_for_task(connection: Elasticsearch, task_id: str, poll_interval: float | None = None) -> dict:
+    """
+    Ожидание завершения задачи, запущенной с wait_for_completion=False.
+    Долгие операции (forcemerge, update_by_query) не держат HTTP-запрос открытым,
+    поэтому их длительность не ограничена ES_TIMEOUT: статус задачи опрашивается короткими запросами.
+    :param connection: соединение с ElasticSearch
+    :param task_id: идентификатор задачи
+    :param poll_interval: пауза между опросами в секундах, по умолчанию ES_TASK_POLL_INTERVAL
+    :return: результат задачи
+    """
+    if poll_interval is None:
+        poll_interval = POLL_INTERVAL
+    while True:
+        task = connection.tasks.get(task_id=task_id)
+        if task.get('completed'):
+            break
+        logger.debug(f'Waiting for task {task_id}...')
+        sleep(poll_interval)
+    if task.get('error'):
+        raise TaskFailedError(f'Task {task_id} failed: {task["error"]}')
+    return task.get('response', {})
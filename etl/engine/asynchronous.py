@@ -0,0 +1,390 @@
+"""
+Асинхронный импорт на asyncpg и AsyncElasticsearch: запросы загрузчиков и bulk-запросы выполняются одновременно.
+"""
+
+import asyncio
+import datetime
+from math import ceil
+from time import perf_counter
+from typing import AsyncGenerator, List, Tuple
+
+import asyncpg
+from psycopg2.sql import SQL
+from elasticsearch import AsyncElasticsearch, helpers
+
+from elastic.saver import ElasticSearchSaver
+from elastic.data_formatter import format_rows, get_content
+from elastic.fingerprint import FingerprintCache
+from postgres.loader import NIL_UUID, Checkpoint, Loader, MovieLoader, GenreLoader, PersonLoader
+
+from utils.logger import logger
+from state_storage.state import State
+from utils.backoff import async_backoff
+from utils.configuration import ExtraConfig
+from utils.connections import ASYNC_CONNECTION_ERRORS, get_async_postgres_pool, get_async_elastic_conn
+from utils.metrics import BULK_FAILURES, INDEXED_DOCUMENTS, LOADER_MOVIES, LOADER_ROWS, STAGE_LATENCY
+
+
+def as_aware(value: datetime.datetime) -> datetime.datetime:
+    """
+    Дата из состояния для запроса asyncpg.
+    asyncpg переводит дату без часового пояса через локальное время, что невозможно для MIN_DATE_TIME.
+    :param value: дата из хранилища состояний
+    :return: дата с часовым поясом, даты без него считаются датами в UTC
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+# запрос обогащения тот же, что у синхронных загрузчиков, только с параметром в формате asyncpg
+MOVIES_INFO_ASYNC_QUERY = Loader.movies_info_query.format(condition=SQL('fw.id = ANY($1::uuid[])')).as_string(None)
+
+
+class AsyncLoader:
+    """
+    Асинхронный загрузчик изменений одной таблицы.
+    Ключ и формат состояния совпадают с синхронным загрузчиком, поэтому движки можно переключать
+    без потери позиции. Измененные объекты читаются постранично по (updated_at, id),
+    связанные с ними фильмы — постранично по (объект, фильм), как у синхронного загрузчика.
+    """
+
+    loader: type[Loader] = None
+    data_block_size = Loader.data_block_size
+    fan_out_block_size = Loader.fan_out_block_size
+    scheme = Loader.scheme
+
+    def __init__(self, pool: asyncpg.Pool, state: State):
+        """
+        Инициализация переменных
+        :param pool: пул соединений asyncpg
+        :param state: хранилище состояний
+        """
+        self.pool = pool
+        self.state = state
+
+    @property
+    def state_key(self) -> str:
+        """
+        :return: Ключ состояния синхронного загрузчика той же таблицы.
+        """
+        return self.loader.__qualname__
+
+    @property
+    def table_name(self) -> str:
+        """
+        :return: Таблица синхронного загрузчика.
+        """
+        return self.loader.table_name
+
+    async def fetch(self, query: str, *args) -> List[asyncpg.Record]:
+        """
+        Выполнение запроса на свободном соединении пула.
+        :param query: запрос
+        :param args: параметры запроса
+        :return: строки результата
+        """
+        started = perf_counter()
+        rows = await self.pool.fetch(query, *args)
+        STAGE_LATENCY.labels('postgres_fetch').observe(perf_counter() - started)
+        return rows
+
+    async def get_changes(self) -> AsyncGenerator[Tuple[List[str], Checkpoint], None]:
+        """
+        Получение изменений без сохранения состояния.
+        Как и у синхронного загрузчика, фильмы блока объектов отдаются страницами вместе с позицией
+        внутри блока, а прерванный блок после перезапуска дочитывается в прежних границах
+        с последней сохраненной связи.
+        :return: пары (идентификаторы фильмов, позиция для сохранения состояния после их индексации)
+        """
+        checkpoint = Checkpoint.from_state(self.state.get_state(self.state_key))
+        logger.info(f'{self.state_key} latest checkpoint: {checkpoint.updated_at}, {checkpoint.id}')
+        done = Checkpoint(as_aware(checkpoint.updated_at), checkpoint.id)
+        resume, until = checkpoint.fan_out, checkpoint.until
+        passes = [(done[:2], None, resume)]
+        if resume is not None and until is not None:
+            until = (as_aware(until[0]), until[1])
+            passes = [(done[:2], until, resume), (until, None, None)]
+        for after, bound, resume in passes:
+            async for rows in self._iter_updated_instances(after, bound):
+                ids = [row['id'] for row in rows]
+                end = (rows[-1]['updated_at'], str(rows[-1]['id']))
+                LOADER_ROWS.labels(self.state_key).inc(len(ids))
+                if self.loader.link_table is None:
+                    LOADER_MOVIES.labels(self.state_key).inc(len(ids))
+                    done = Checkpoint(*end)
+                    yield [str(_id) for _id in ids], done
+                    continue
+                async for movies_ids, position in self.iter_fan_out(ids, resume or (NIL_UUID, NIL_UUID)):
+                    LOADER_MOVIES.labels(self.state_key).inc(len(movies_ids))
+                    yield movies_ids, Checkpoint(done.updated_at, done.id, position, end)
+                # позиция относится только к первому блоку после неё
+                resume = None
+                done = Checkpoint(*end)
+                yield [], done
+
+    async def _iter_updated_instances(
+            self,
+            after: Tuple[datetime.datetime, str],
+            until: Tuple[datetime.datetime, str] | None = None,
+    ) -> AsyncGenerator[List[asyncpg.Record], None]:
+        """
+        Блоки измененных объектов таблицы в порядке (updated_at, id).
+        :param after: пара (updated_at, id), после которой читать
+        :param until: пара (updated_at, id), на которой остановиться включительно
+        :return: блоки строк (id, updated_at)
+        """
+        bound, bound_values = 'TRUE', ()
+        if until is not None:
+            bound, bound_values = '(updated_at, id) <= ($3, $4::uuid)', tuple(until)
+        query = f'''
+            SELECT id, updated_at
+            FROM {self.scheme}.{self.table_name}
+            WHERE (updated_at, id) > ($1, $2::uuid) AND {bound}
+            ORDER BY updated_at, id
+            LIMIT ${3 + len(bound_values)};
+        '''
+        block_size = int(self.data_block_size)
+        while rows := await self.fetch(query, *after, *bound_values, block_size):
+            yield rows
+            if len(rows) < block_size:
+                return
+            after = (rows[-1]['updated_at'], rows[-1]['id'])
+
+    async def iter_fan_out(
+            self,
+            instance_ids: list,
+            after: Tuple[str, str] = (NIL_UUID, NIL_UUID),
+    ) -> AsyncGenerator[Tuple[List[str], Tuple[str, str]], None]:
+        """
+        Идентификаторы фильмов, связанных с объектами, блоками по fan_out_block_size связей.
+        Запрос тот же, что у синхронного загрузчика (Loader._iter_fan_out).
+        :param instance_ids: идентификаторы объектов таблицы
+        :param after: связь (объект, фильм), после которой продолжить
+        :return: пары (идентификаторы фильмов, последняя прочитанная связь)
+        """
+        column = self.loader.link_column
+        query = f'''
+            SELECT DISTINCT {column}, film_work_id
+            FROM {self.scheme}.{self.loader.link_table}
+            WHERE {column} = ANY($1::uuid[]) AND ({column}, film_work_id) > ($2::uuid, $3::uuid)
+            ORDER BY {column}, film_work_id
+            LIMIT $4;
+        '''
+        block_size = int(self.fan_out_block_size)
+        while True:
+            links = [(str(row[0]), str(row[1])) for row in await self.fetch(query, instance_ids, *after, block_size)]
+            if links:
+                yield list(dict.fromkeys(film_id for _, film_id in links)), links[-1]
+            if len(links) < block_size:
+                return
+            after = links[-1]
+
+    def save_state(self, checkpoint: Checkpoint) -> None:
+        """
+        Сохранить последнее состояние в хранилище.
+        :param checkpoint: Дата обновления и идентификатор последнего обработанного объекта
+        :return:
+        """
+        self.state.set_state(self.state_key, checkpoint.to_state())
+
+
+class AsyncMovieLoader(AsyncLoader):
+    """Асинхронная загрузка при изменении фильмов."""
+
+    loader = MovieLoader
+
+
+class AsyncGenreLoader(AsyncLoader):
+    """Асинхронная загрузка при изменении жанров."""
+
+    loader = GenreLoader
+
+
+class AsyncPersonLoader(AsyncLoader):
+    """Асинхронная загрузка при изменении персон."""
+
+    loader = PersonLoader
+
+
+ASYNC_DATA_LOADERS = (
+    AsyncMovieLoader,
+    AsyncGenreLoader,
+    AsyncPersonLoader,
+)
+
+
+class AsyncEngine:
+    """
+    Импорт фильмов в одном потоке на asyncio.
+    Загрузчики работают одновременно, каждый сохраняет свою позицию только после индексации
+    всех фильмов блока. Блоки фильмов обогащаются и отправляются в ElasticSearch параллельно,
+    количество одновременных блоков ограничено ETL_ASYNC_CONCURRENCY.
+    """
+
+    extra_config = ExtraConfig()
+    concurrency: int = extra_config.ETL_ASYNC_CONCURRENCY
+    index_name: str = ElasticSearchSaver.index_name
+    bulk_chunk_size: int = ElasticSearchSaver.bulk_chunk_size
+    bulk_max_bytes: int = ElasticSearchSaver.bulk_max_bytes
+    bulk_max_retries: int = ElasticSearchSaver.bulk_max_retries
+    bulk_start_sleep_time: float = ElasticSearchSaver.bulk_start_sleep_time
+    bulk_border_sleep_time: float = ElasticSearchSaver.bulk_border_sleep_time
+
+    def __init__(
+            self,
+            pool: asyncpg.Pool,
+            elastic: AsyncElasticsearch,
+            state: State,
+            fingerprints: FingerprintCache | None = None,
+    ):
+        """
+        Инициализация переменных
+        :param pool: пул соединений asyncpg
+        :param elastic: асинхронное соединение с ElasticSearch
+        :param state: хранилище состояний
+        :param fingerprints: кэш отпечатков для пропуска неизменившихся документов
+        """
+        self.pool = pool
+        self.elastic = elastic
+        self.state = state
+        self.fingerprints = fingerprints
+        self.fast_serialization = ExtraConfig().ES_FAST_SERIALIZATION
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def run(self) -> None:
+        """
+        Один цикл импорта всеми загрузчиками.
+        :return:
+        """
+        loaders = [data_loader(self.pool, self.state) for data_loader in ASYNC_DATA_LOADERS]
+        logger.info(f'Importing data from {", ".join(loader.table_name for loader in loaders)} (async)...')
+        await asyncio.gather(*(self._run_loader(loader) for loader in loaders))
+        logger.info('Successfully imported data...')
+
+    async def _run_loader(self, loader: AsyncLoader) -> None:
+        """
+        Индексация изменений одного загрузчика.
+        :param loader: загрузчик
+        :return:
+        """
+        async for movies_ids, checkpoint in loader.get_changes():
+            if movies_ids:
+                await self.index_movies(sorted(set(movies_ids)))
+            loader.save_state(checkpoint)
+
+    async def index_movies(self, movies_ids: List[str]) -> None:
+        """
+        Обогащение и индексация фильмов параллельными блоками.
+        Блоки разбирают не больше concurrency обработчиков, а не отдельная задача на каждый блок;
+        общий семафор ограничивает одновременные блоки всех загрузчиков.
+        :param movies_ids: идентификаторы фильмов
+        :return:
+        """
+        block_size = int(AsyncLoader.data_block_size)
+        starts = iter(range(0, len(movies_ids), block_size))
+
+        async def __worker() -> None:
+            """
+            Обработка очередных блоков, пока они не закончатся.
+            :return:
+            """
+            for start in starts:
+                await self._index_block(movies_ids[start:start + block_size])
+
+        workers = min(self.concurrency, ceil(len(movies_ids) / block_size))
+        await asyncio.gather(*(__worker() for _ in range(workers)))
+
+    async def _index_block(self, movies_ids: List[str]) -> None:
+        """
+        Обогащение и индексация одного блока фильмов.
+        :param movies_ids: идентификаторы фильмов
+        :return:
+        """
+        async with self.semaphore:
+            started = perf_counter()
+            rows = await self.pool.fetch(MOVIES_INFO_ASYNC_QUERY, movies_ids)
+            STAGE_LATENCY.labels('postgres_fetch').observe(perf_counter() - started)
+            started = perf_counter()
+            documents = format_rows([dict(row) for row in rows], fast=self.fast_serialization)
+            STAGE_LATENCY.labels('transform').observe(perf_counter() - started)
+            await self._bulk(documents)
+
+    async def _bulk(self, documents: list) -> None:
+        """
+        Отправка документов в ElasticSearch.
+        Документы, отклоненные из-за перегрузки кластера, отправляются повторно с увеличивающейся паузой.
+        :param documents: документы для индексации
+        :return:
+        """
+        actions, digests = [], {}
+        for document in documents:
+            document_id, source = str(document.id), document.json()
+            if self.fingerprints is not None:
+                digest = self.fingerprints.digest(get_content(source))
+                if self.fingerprints.is_unchanged(document_id, digest):
+                    continue
+                digests[document_id] = digest
+            actions.append({'_index': self.index_name, '_op_type': 'index', '_id': document_id, '_source': source})
+        if not actions:
+            return
+        started = perf_counter()
+        try:
+            await helpers.async_bulk(
+                self.elastic,
+                actions,
+                chunk_size=self.bulk_chunk_size,
+                max_chunk_bytes=self.bulk_max_bytes,
+                max_retries=self.bulk_max_retries,
+                initial_backoff=self.bulk_start_sleep_time,
+                max_backoff=self.bulk_border_sleep_time,
+            )
+        except helpers.BulkIndexError as error:
+            BULK_FAILURES.inc(len(error.errors))
+            raise
+        STAGE_LATENCY.labels('es_bulk').observe(perf_counter() - started)
+        INDEXED_DOCUMENTS.inc(len(actions))
+        for document_id, digest in digests.items():
+            self.fingerprints.update(document_id, digest)
+        logger.info(f'Inserted {len(actions)} rows...')
+
+
+@async_backoff(ASYNC_CONNECTION_ERRORS)
+async def load_data_async(
+        pool: asyncpg.Pool,
+        elastic: AsyncElasticsearch,
+        state: State,
+        fingerprints: FingerprintCache | None = None,
+) -> None:
+    """
+    Цикл импорта с повтором после потери соединения.
+    Пул asyncpg и клиент ElasticSearch сами открывают новые соединения вместо потерянных.
+    :param pool: пул соединений asyncpg
+    :param elastic: асинхронное соединение с ElasticSearch
+    :param state: хранилище состояний
+    :param fingerprints: кэш отпечатков для пропуска неизменившихся документов
+    :return:
+    """
+    await AsyncEngine(pool, elastic, state, fingerprints).run()
+    state.flush()
+
+
+async def serve(state: State, interval: float, fingerprints: FingerprintCache | None = None) -> None:
+    """
+    Импорт по расписанию на долгоживущих асинхронных соединениях.
+    :param state: хранилище состояний
+    :param interval: пауза между циклами в секундах
+    :param fingerprints: кэш отпечатков для пропуска неизменившихся документов
+    :return:
+    """
+    # соединений больше, чем одновременных блоков, чтобы загрузчики могли читать изменения во время обогащения
+    pool = await get_async_postgres_pool(AsyncEngine.concurrency + len(ASYNC_DATA_LOADERS))
+    elastic = await get_async_elastic_conn()
+    try:
+        while True:
+            await load_data_async(pool, elastic, state, fingerprints)
+            await asyncio.sleep(interval)
+    finally:
+        await elastic.close()
+        await pool.close()
+        logger.info('Closed async PostgreSQL and ElasticSearch connections...')
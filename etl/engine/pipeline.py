@@ -0,0 +1,185 @@
+"""
+Конвейерный импорт: чтение из PostgreSQL, преобразование и запись в ElasticSearch выполняются одновременно.
+"""
+
+from functools import partial
+from time import perf_counter
+from threading import Event, Thread
+from queue import Queue, Empty, Full
+from typing import Any, Callable, List, Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from postgres.loader import Loader
+from elastic.saver import ElasticSearchSaver
+from elastic.data_formatter import format_rows
+from postgres.collector import ChangeCollector, ChangeSet
+from utils.logger import logger
+from utils.metrics import STAGE_LATENCY
+from utils.configuration import ExtraConfig
+
+
+STOP = object()
+
+
+class PipelineEngine:
+    """
+    Импорт фильмов в три стадии, связанные ограниченными очередями.
+    Стадия извлечения читает блоки из PostgreSQL, стадия преобразования строит документы,
+    стадия загрузки отправляет их в ElasticSearch. Заполненная очередь блокирует предыдущую стадию,
+    поэтому в памяти одновременно находится не больше queue_size блоков на стадию.
+    Состояние загрузчиков сохраняется стадией загрузки только после того,
+    как ElasticSearch принял все документы набора изменений.
+    """
+
+    extra_config = ExtraConfig()
+    queue_size: int = extra_config.ETL_PIPELINE_QUEUE_SIZE
+    transform_processes: int = extra_config.ETL_PIPELINE_TRANSFORM_PROCESSES
+    poll_timeout: float = 0.5
+
+    def __init__(self, loaders: List[Loader], saver: ElasticSearchSaver):
+        """
+        Инициализация переменных
+        :param loaders: загрузчики изменений
+        :param saver: загрузчик в ElasticSearch
+        """
+        self.loaders = loaders
+        self.saver = saver
+        self.enricher = loaders[0]
+        self.transform_queue = Queue(maxsize=self.queue_size)
+        self.load_queue = Queue(maxsize=self.queue_size)
+        self.stopped = Event()
+        self.errors = []
+
+    def run(self) -> None:
+        """
+        Запуск конвейера и ожидание его завершения.
+        :return:
+        """
+        executor = ProcessPoolExecutor(self.transform_processes) if self.transform_processes else None
+        stages = (
+            Thread(target=self._run_stage, args=(self._extract,), name='etl-extract', daemon=True),
+            Thread(target=self._run_stage, args=(self._transform, executor), name='etl-transform', daemon=True),
+            Thread(target=self._run_stage, args=(self._load,), name='etl-load', daemon=True),
+        )
+        try:
+            for stage in stages:
+                stage.start()
+            for stage in stages:
+                stage.join()
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        if self.errors:
+            raise self.errors[0]
+
+    def _run_stage(self, stage: Callable, *args) -> None:
+        """
+        Выполнение стадии с остановкой всего конвейера при ошибке.
+        :param stage: функция стадии
+        :param args: аргументы стадии
+        :return:
+        """
+        try:
+            stage(*args)
+        except Exception as error:
+            logger.error(f'Pipeline stage {stage.__name__} failed: {error}')
+            self.errors.append(error)
+            self.stopped.set()
+
+    def _put(self, queue: Queue, item: Any) -> bool:
+        """
+        Добавление элемента в очередь с ожиданием свободного места.
+        :param queue: очередь следующей стадии
+        :param item: элемент
+        :return: False, если конвейер остановлен
+        """
+        while not self.stopped.is_set():
+            try:
+                queue.put(item, timeout=self.poll_timeout)
+                return True
+            except Full:
+                continue
+        return False
+
+    def _iter_queue(self, queue: Queue):
+        """
+        Чтение элементов очереди до признака окончания или остановки конвейера.
+        :param queue: очередь текущей стадии
+        :return: элементы очереди
+        """
+        while not self.stopped.is_set():
+            try:
+                item = queue.get(timeout=self.poll_timeout)
+            except Empty:
+                continue
+            if item is STOP:
+                return
+            yield item
+
+    def _extract(self) -> None:
+        """
+        Стадия извлечения: блоки фильмов из PostgreSQL.
+        Последний элемент набора изменений несёт сам набор, чтобы стадия загрузки могла сохранить состояние.
+        :return:
+        """
+        block_size = int(self.enricher.data_block_size)
+        for change_set in ChangeCollector(self.loaders).collect():
+            for ids in change_set.iter_blocks(block_size):
+                for rows in self.enricher.get_movies_info(ids):
+                    if not self._put(self.transform_queue, ([dict(row) for row in rows], None)):
+                        return
+            if not self._put(self.transform_queue, ([], change_set)):
+                return
+        self._put(self.transform_queue, STOP)
+
+    def _transform(self, executor: Optional[ProcessPoolExecutor]) -> None:
+        """
+        Стадия преобразования: строки PostgreSQL в документы ElasticSearch.
+        В пул процессов передаются задачи, а в очередь загрузки — их результаты в исходном порядке.
+        :param executor: пул процессов или None для преобразования в потоке стадии
+        :return:
+        """
+        for rows, change_set in self._iter_queue(self.transform_queue):
+            if executor is not None:
+                documents = executor.submit(format_rows, rows, self.saver.fast_serialization)
+                # метрики дочерних процессов не видны, поэтому время замеряется вместе с ожиданием в пуле
+                documents.add_done_callback(partial(self._observe_transform, perf_counter()))
+            else:
+                documents = self.saver.transform(rows)
+            if not self._put(self.load_queue, (documents, change_set)):
+                return
+        self._put(self.load_queue, STOP)
+
+    @staticmethod
+    def _observe_transform(started: float, future: Future) -> None:
+        """
+        Замер времени преобразования блока в пуле процессов.
+        :param started: время отправки задачи в пул
+        :param future: завершенная задача
+        :return:
+        """
+        if not future.cancelled() and future.exception() is None:
+            STAGE_LATENCY.labels('transform').observe(perf_counter() - started)
+
+    def _load(self) -> None:
+        """
+        Стадия загрузки: отправка документов в ElasticSearch и сохранение состояний.
+        :return:
+        """
+        for documents, change_set in self._iter_queue(self.load_queue):
+            if isinstance(documents, Future):
+                documents = documents.result()
+            for document in documents:
+                self.saver.add(document)
+            if change_set is not None:
+                self._commit(change_set)
+
+    def _commit(self, change_set: ChangeSet) -> None:
+        """
+        Сохранение состояний после подтверждения записи набора изменений.
+        :param change_set: набор изменений
+        :return:
+        """
+        self.saver.save()
+        change_set.commit()
+        logger.info(f'Imported change set of {len(change_set.movies_ids)} movies...')
@@ -2,43 +2,166 @@
 Импорт фильмов из PostgreSQL в ElasticSearch.
 """
 
-from time import sleep
+import asyncio
+from typing import List
+from itertools import chain
+from time import sleep, monotonic
 from elasticsearch import Elasticsearch
 
+from engine.pipeline import PipelineEngine
+from engine.asynchronous import serve
 from elastic.saver import ElasticSearchSaver
-from postgres.loader import MovieLoader, GenreLoader, PersonLoader
+from elastic.adaptive import AdaptiveBulkController
+from elastic.partial import NestedFieldUpdater
+from elastic.fingerprint import FingerprintCache
+from postgres.listener import ChangeListener
+from postgres.loader import Loader, MovieLoader, GenreLoader, PersonLoader
+from postgres.collector import ChangeCollector, ChangeSet
 from psycopg2.extensions import connection as postgres_connection
 
 from utils.logger import logger
 from state_storage.state import State
 from utils.configuration import ExtraConfig
-from utils.connections import prepare_connections
+from utils.metrics import start_metrics_server
+from utils.connections import ConnectionManager, get_state_storage
+
+
+PSQL_DATA_LOADERS = (
+    MovieLoader,
+    GenreLoader,
+    PersonLoader,
+)
+# кэш отпечатков живёт всё время работы демона, чтобы пропускать повторную запись одинаковых документов
+FINGERPRINT_CACHE_SIZE = ExtraConfig().ES_FINGERPRINT_CACHE_SIZE
+FINGERPRINTS = FingerprintCache(FINGERPRINT_CACHE_SIZE) if FINGERPRINT_CACHE_SIZE else None
+# регулятор тоже общий для всех циклов, иначе каждый цикл начинал бы подбор размера запроса заново
+BULK_CONTROLLER = AdaptiveBulkController() if ExtraConfig().ES_ADAPTIVE_BULK else None
+
+
+def make_loaders(pg_conn: postgres_connection, el_conn: Elasticsearch, state: State) -> List[Loader]:
+    """
+    Создание загрузчиков изменений.
+    При ES_PARTIAL_UPDATES переименования персон и жанров обновляются в индексе частично.
+    :param pg_conn: соединение с PostgreSQL
+    :param el_conn: соединение с ElasticSearch
+    :param state: хранилище состояний
+    :return: загрузчики
+    """
+    renamer = None
+    if ExtraConfig().ES_PARTIAL_UPDATES:
+        renamer = NestedFieldUpdater(el_conn, fingerprints=FINGERPRINTS)
+    return [data_loader(pg_conn, state, renamer) for data_loader in PSQL_DATA_LOADERS]
+
+
+def index_change_set(enricher: Loader, saver: ElasticSearchSaver, change_set: ChangeSet) -> None:
+    """
+    Обогащение и индексация фильмов набора с последующим сохранением состояний загрузчиков.
+    :param enricher: загрузчик, выполняющий запрос обогащения
+    :param saver: загрузчик в ElasticSearch
+    :param change_set: набор изменений
+    :return:
+    """
+    blocks = change_set.iter_blocks(int(enricher.data_block_size))
+    saver.load_from_psql(chain.from_iterable(enricher.get_movies_info(ids) for ids in blocks))
+    change_set.commit()
+    logger.info(f'Imported change set of {len(change_set.movies_ids)} movies...')
 
 
 def load_data(pg_conn: postgres_connection, el_conn: Elasticsearch, state: State) -> None:
     """
     Импорт фильмов из PostgreSQL в ElasticSearch.
+    Изменения всех загрузчиков собираются в общие наборы, поэтому каждый фильм
+    за цикл обогащается и индексируется один раз.
     :param pg_conn: соединение с PostgreSQL
     :param el_conn: соединение с ElasticSearch
     :param state: хранилище состояний
     :return:
     """
-    psql_data_loaders = (
-        MovieLoader,
-        GenreLoader,
-        PersonLoader,
-    )
+    loaders = make_loaders(pg_conn, el_conn, state)
+    saver = ElasticSearchSaver(el_conn, fingerprints=FINGERPRINTS, controller=BULK_CONTROLLER)
+    enricher = loaders[0]
+    logger.info(f'Importing data from {", ".join(loader.table_name for loader in loaders)}...')
+    if ExtraConfig().ETL_PIPELINE:
+        PipelineEngine(loaders, saver).run()
+        logger.info('Successfully imported data...')
+        return
+    for change_set in ChangeCollector(loaders).collect():
+        index_change_set(enricher, saver, change_set)
+    logger.info('Successfully imported data...')
+
+
+def listen_data(pg_conn: postgres_connection, el_conn: Elasticsearch, state: State, duration: float) -> None:
+    """
+    Импорт фильмов по уведомлениям PostgreSQL.
+    Подписка оформляется до сканирования таблиц, поэтому изменения, сделанные во время
+    сканирования, не теряются. Сканирование по дате обновления страхует от уведомлений,
+    пропущенных, пока ETL не работал.
+    :param pg_conn: соединение с PostgreSQL
+    :param el_conn: соединение с ElasticSearch
+    :param state: хранилище состояний
+    :param duration: время ожидания уведомлений до следующего сканирования в секундах
+    :return:
+    """
+    loaders = make_loaders(pg_conn, el_conn, state)
+    saver = ElasticSearchSaver(el_conn, fingerprints=FINGERPRINTS, controller=BULK_CONTROLLER)
+    listener = ChangeListener(pg_conn, loaders)
+    listener.listen()
+    load_data(pg_conn, el_conn, state)
+    deadline = monotonic() + duration
+    while (remaining := deadline - monotonic()) > 0:
+        changes = listener.wait(remaining)
+        if changes:
+            index_change_set(loaders[0], saver, listener.get_change_set(changes))
+
+
+def install_notify_triggers(pg_conn: postgres_connection, el_conn: Elasticsearch, state: State) -> None:
+    """
+    Установка триггеров уведомлений один раз при запуске режима ETL_LISTEN.
+    :param pg_conn: соединение с PostgreSQL
+    :param el_conn: соединение с ElasticSearch
+    :param state: хранилище состояний
+    :return:
+    """
+    ChangeListener.install_triggers(pg_conn)
+
 
-    for data_loader in psql_data_loaders:
-        loader = data_loader(pg_conn, state)
-        saver = ElasticSearchSaver(el_conn)
-        logger.info(f'Importing data from {loader.table_name}...')
-        saver.load_from_psql(loader.get_data())
-        logger.info(f'Successfully imported data from {loader.table_name}...')
+def serve_async() -> None:
+    """
+    Запуск асинхронного движка (ETL_ENGINE=async).
+    Режим уведомлений и частичные обновления поддерживает только синхронный движок.
+    :return:
+    """
+    extra_config = ExtraConfig()
+    state = get_state_storage()
+    start_metrics_server(
+        extra_config.METRICS_PORT,
+        extra_config.METRICS_ADDRESS,
+        state,
+        [data_loader.__qualname__ for data_loader in PSQL_DATA_LOADERS],
+    )
+    try:
+        asyncio.run(serve(state, extra_config.ES_TIMEOUT, FINGERPRINTS))
+    finally:
+        state.flush()
 
 
 if __name__ == '__main__':
-    while True:
-        with prepare_connections() as connections:
-            load_data(*connections)
-        sleep(ExtraConfig().ES_TIMEOUT)
+    extra_config = ExtraConfig()
+    if extra_config.ETL_ENGINE == 'async':
+        serve_async()
+    else:
+        with ConnectionManager() as manager:
+            start_metrics_server(
+                extra_config.METRICS_PORT,
+                extra_config.METRICS_ADDRESS,
+                manager.state,
+                [data_loader.__qualname__ for data_loader in PSQL_DATA_LOADERS],
+            )
+            if extra_config.ETL_LISTEN:
+                manager.run(install_notify_triggers)
+            while True:
+                if extra_config.ETL_LISTEN:
+                    manager.run(listen_data, duration=extra_config.ETL_SAFETY_SCAN_INTERVAL)
+                    continue
+                manager.run(load_data)
+                sleep(extra_config.ES_TIMEOUT)
@@ -0,0 +1,74 @@
+"""
+Сбор изменений из всех загрузчиков в единый набор фильмов.
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Generator, Iterable, Set, Tuple
+
+from .loader import Loader, Checkpoint
+from utils.configuration import ExtraConfig
+
+
+@dataclass
+class ChangeSet:
+    """Дедуплицированный набор измененных фильмов и состояния загрузчиков, которые он покрывает."""
+
+    movies_ids: Set[str] = field(default_factory=set)
+    checkpoints: Dict[Loader, Checkpoint] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return bool(self.movies_ids or self.checkpoints)
+
+    def iter_blocks(self, size: int) -> Generator[Tuple[str, ...], None, None]:
+        """
+        Разбиение набора фильмов на блоки для обогащения.
+        :param size: размер блока
+        :return: блоки идентификаторов фильмов
+        """
+        movies_ids = sorted(self.movies_ids)
+        for start in range(0, len(movies_ids), size):
+            yield tuple(movies_ids[start:start + size])
+
+    def commit(self) -> None:
+        """
+        Сохранение состояний загрузчиков после индексации фильмов набора.
+        :return:
+        """
+        for loader, checkpoint in self.checkpoints.items():
+            loader.save_state(checkpoint)
+
+
+class ChangeCollector:
+    """
+    Объединение идентификаторов фильмов из нескольких загрузчиков.
+    Фильм, затронутый сразу через несколько таблиц, попадает в набор один раз.
+    Размер набора ограничен, чтобы первый запуск не держал в памяти весь каталог.
+    """
+
+    change_set_size = ExtraConfig().ETL_CHANGE_SET_SIZE
+
+    def __init__(self, loaders: Iterable[Loader]):
+        """
+        Инициализация переменных
+        :param loaders: загрузчики изменений
+        """
+        self.loaders = tuple(loaders)
+
+    def collect(self) -> Generator[ChangeSet, None, None]:
+        """
+        Сбор наборов измененных фильмов.
+        Состояние загрузчика попадает в набор только вместе с последним блоком его фильмов,
+        поэтому после commit набора все фильмы до сохраненной позиции уже проиндексированы.
+        :return: наборы изменений
+        """
+        change_set = ChangeSet()
+        for loader in self.loaders:
+            for movies_ids, checkpoint in loader.get_changes():
+                change_set.movies_ids.update(movies_ids)
+                if checkpoint is not None:
+                    change_set.checkpoints[loader] = checkpoint
+                if len(change_set.movies_ids) >= self.change_set_size:
+                    yield change_set
+                    change_set = ChangeSet()
+        if change_set:
+            yield change_set
@@ -0,0 +1,108 @@
+"""
+Получение уведомлений об изменениях из PostgreSQL (LISTEN/NOTIFY).
+"""
+
+import json
+import select
+from pathlib import Path
+from time import monotonic
+from collections import defaultdict
+from typing import Dict, Iterable, Set
+
+from psycopg2.sql import SQL, Identifier, Literal
+from psycopg2.extensions import connection as postgres_connection
+
+from .loader import Loader
+from .collector import ChangeSet
+from utils.logger import logger
+from utils.configuration import ExtraConfig
+
+
+NOTIFY_TRIGGERS_FILE = Path(__file__).with_name('notify.sql')
+LINK_TABLES = ('genre_film_work', 'person_film_work')
+
+
+class ChangeListener:
+    """
+    Ожидание уведомлений от триггеров на таблицах схемы content.
+    Соединение должно работать в режиме autocommit, чтобы уведомления приходили сразу.
+    """
+
+    extra_config = ExtraConfig()
+    channel: str = extra_config.ETL_NOTIFY_CHANNEL
+    debounce: float = extra_config.ETL_NOTIFY_DEBOUNCE
+
+    def __init__(self, connection: postgres_connection, loaders: Iterable[Loader]):
+        """
+        Инициализация переменных
+        :param connection: соединение с БД
+        :param loaders: загрузчики, по таблицам которых определяются связанные фильмы
+        """
+        self.connection = connection
+        self.loaders = {loader.table_name: loader for loader in loaders}
+
+    @classmethod
+    def install_triggers(cls, connection: postgres_connection) -> None:
+        """
+        Установка триггеров уведомлений.
+        CREATE OR REPLACE берёт блокировки на таблицах схемы content, поэтому триггеры
+        ставятся один раз при запуске ETL, а не при каждой подписке.
+        :param connection: соединение с БД
+        :return:
+        """
+        with open(NOTIFY_TRIGGERS_FILE, 'r') as triggers_file:
+            triggers = SQL(triggers_file.read()).format(channel=Literal(cls.channel))
+        with connection.cursor() as curs:
+            curs.execute(triggers)
+        logger.info(f'Installed notify triggers for channel {cls.channel}...')
+
+    def listen(self) -> None:
+        """
+        Подписка на канал уведомлений.
+        :return:
+        """
+        with self.connection.cursor() as curs:
+            curs.execute(SQL('LISTEN {channel};').format(channel=Identifier(self.channel)))
+        logger.info(f'Listening for changes on channel {self.channel}...')
+
+    def wait(self, timeout: float) -> Dict[str, Set[str]]:
+        """
+        Ожидание уведомлений.
+        После первого уведомления в течение debounce секунд собираются следующие,
+        чтобы массовое изменение обработалось одним набором.
+        :param timeout: максимальное время ожидания в секундах
+        :return: идентификаторы измененных записей по таблицам
+        """
+        changes = defaultdict(set)
+        deadline = monotonic() + timeout
+        while True:
+            # уведомления могли прийти во время выполнения других запросов в этом соединении
+            while self.connection.notifies:
+                notify = self.connection.notifies.pop(0)
+                payload = json.loads(notify.payload)
+                changes[payload['table']].add(payload['id'])
+            if changes:
+                deadline = min(deadline, monotonic() + self.debounce)
+            remaining = deadline - monotonic()
+            if remaining <= 0 or select.select([self.connection], [], [], remaining) == ([], [], []):
+                break
+            self.connection.poll()
+        return changes
+
+    def get_change_set(self, changes: Dict[str, Set[str]]) -> ChangeSet:
+        """
+        Получение набора фильмов, затронутых изменениями.
+        :param changes: идентификаторы измененных записей по таблицам
+        :return: набор изменений без состояний загрузчиков
+        """
+        change_set = ChangeSet()
+        for table_name, ids in changes.items():
+            if table_name in LINK_TABLES:
+                change_set.movies_ids.update(ids)
+                continue
+            loader = self.loaders.get(table_name)
+            if loader is None:
+                continue
+            for movies_ids in loader.get_movies_ids(tuple(ids)):
+                change_set.movies_ids.update(movies_ids)
+        return change_set
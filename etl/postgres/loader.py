@@ -3,54 +3,226 @@
 """
 
 import datetime
-from uuid import UUID
-from abc import ABC, abstractmethod
+from uuid import UUID, uuid4
+from itertools import islice
+from time import perf_counter
+from abc import ABC
 from functools import cached_property
-from typing import Tuple, Generator, List
+from typing import Dict, Tuple, Generator, List, NamedTuple, Protocol
 
-from psycopg2.sql import SQL, Identifier
+from psycopg2.sql import SQL, Literal, Identifier
 from psycopg2 import Error as PostgresError
-from psycopg2.extensions import connection as postgres_connection
+from psycopg2.errors import InvalidSqlStatementName
+from psycopg2.extensions import connection as postgres_connection, cursor as postgres_cursor
 
 from utils.logger import logger
 from state_storage.state import State
+from utils.metrics import LOADER_ROWS, LOADER_MOVIES, STAGE_LATENCY
 from utils.configuration import ExtraConfig
 
 
 MIN_DATE_TIME = datetime.datetime.combine(datetime.datetime.min, datetime.time.min)
+NIL_UUID = '00000000-0000-0000-0000-000000000000'
+MOVIES_INFO_STATEMENT = 'movies_info'
+MOVIES_INFO_QUERY = SQL('''
+    SELECT
+        fw.id
+        , fw.title
+        , COALESCE(fw.description, '') as description
+        , fw.rating
+        , fw.type
+        , fw.creation_date
+        , fw.created_at
+        , fw.updated_at
+        , COALESCE (
+           json_agg(
+               DISTINCT jsonb_build_object(
+                   'role', pfw.role,
+                   'id', p.id,
+                   'name', p.full_name
+               )
+           )
+           , '[]'
+        ) as persons
+        , json_agg(DISTINCT g.name) as genre
+    FROM content.film_work fw
+    LEFT JOIN content.person_film_work pfw ON pfw.film_work_id = fw.id
+    LEFT JOIN content.person p ON p.id = pfw.person_id
+    LEFT JOIN content.genre_film_work gfw ON gfw.film_work_id = fw.id
+    LEFT JOIN content.genre g ON g.id = gfw.genre_id
+    WHERE {condition}
+    GROUP BY fw.id
+    ORDER BY fw.updated_at
+''')
+# те же колонки из денормализованной таблицы, которую ведут триггеры movies_admin (команда refresh_read_model)
+MOVIES_INFO_READ_MODEL_QUERY = SQL('''
+    SELECT
+        fw.id
+        , fw.title
+        , COALESCE(fw.description, '') as description
+        , fw.rating
+        , fw.type
+        , fw.creation_date
+        , fw.created_at
+        , fw.updated_at
+        , fw.persons
+        , fw.genres as genre
+    FROM content.film_work_read_model fw
+    WHERE {condition}
+    ORDER BY fw.updated_at
+''')
+
+
+class Checkpoint(NamedTuple):
+    """
+    Позиция загрузчика: дата обновления и идентификатор последнего обработанного объекта.
+    fan_out — позиция внутри связанных фильмов следующего блока объектов: идентификатор объекта
+    и идентификатор последнего проиндексированного фильма в порядке (объект, фильм).
+    until — дата обновления и идентификатор последнего объекта этого блока, чтобы после перезапуска
+    блок был прочитан в тех же границах.
+    """
+
+    updated_at: datetime.datetime
+    id: str
+    fan_out: Tuple[str, str] | None = None
+    until: Tuple[datetime.datetime, str] | None = None
+
+    @classmethod
+    def from_state(cls, value) -> 'Checkpoint':
+        """
+        Восстановление позиции из хранилища состояний.
+        Строка с одной датой (прежний формат состояния) читается как позиция перед всеми объектами с этой датой.
+        :param value: значение из хранилища состояний
+        :return: позиция загрузчика
+        """
+        fan_out, until = None, None
+        if isinstance(value, dict):
+            if value.get('fan_out'):
+                fan_out = (value['fan_out']['id'], value['fan_out']['film_work_id'])
+                if value['fan_out'].get('until_updated_at'):
+                    until = (value['fan_out']['until_updated_at'], value['fan_out']['until_id'])
+            value, object_id = value.get('updated_at'), value.get('id') or NIL_UUID
+        else:
+            object_id = NIL_UUID
+        try:
+            if until is not None:
+                until = (datetime.datetime.fromisoformat(until[0]), str(until[1]))
+            return cls(datetime.datetime.fromisoformat(value), str(object_id), fan_out, until)
+        except (ValueError, TypeError):
+            return cls(MIN_DATE_TIME, NIL_UUID)
+
+    def to_state(self) -> dict:
+        """
+        :return: значение для хранилища состояний
+        """
+        state = {'updated_at': str(self.updated_at), 'id': str(self.id)}
+        if self.fan_out is not None:
+            state['fan_out'] = {'id': self.fan_out[0], 'film_work_id': self.fan_out[1]}
+            if self.until is not None:
+                state['fan_out'].update(until_updated_at=str(self.until[0]), until_id=str(self.until[1]))
+        return state
+
+
+class Renamer(Protocol):
+    """
+    Частичное обновление документов при переименовании персон и жанров.
+    Реализация для ElasticSearch (elastic.partial.NestedFieldUpdater) подключается в main.py.
+    """
+
+    def rename_persons(self, names: Dict[str, str]) -> int:
+        ...
+
+    def rename_genres(self, renames: Dict[str, str]) -> int:
+        ...
 
 
 class Loader(ABC):
     """Абстрактный класс для загрузчиков."""
 
     data_block_size = ExtraConfig().PSQL_DATA_BLOCK_SIZE
+    streaming = ExtraConfig().PSQL_STREAMING
+    itersize = ExtraConfig().PSQL_ITERSIZE
+    prepared_statements = ExtraConfig().PSQL_PREPARED_STATEMENTS
+    movies_info_query = MOVIES_INFO_READ_MODEL_QUERY if ExtraConfig().PSQL_READ_MODEL else MOVIES_INFO_QUERY
+    _prepared_backends = set()
+    fan_out_block_size = ExtraConfig().ETL_FAN_OUT_BLOCK_SIZE
     scheme = 'content'
     table_name = None
+    name_column = None
+    link_table = None
+    link_column = None
 
-    def __init__(self, connection: postgres_connection, state: State):
+    def __init__(self, connection: postgres_connection, state: State, renamer: Renamer | None = None):
         """
         Инициализация переменных
         :param connection: соединение с БД
         :param state: хранилище состояний
+        :param renamer: частичное обновление документов при переименовании, без него фильмы переиндексируются целиком
         :return:
         """
         self.state = state
         self.connection = connection
+        self.renamer = renamer
+
+    def _get_cursor(self, server_side: bool = False) -> postgres_cursor:
+        """
+        Создание курсора для выполнения запроса.
+        Именованный (серверный) курсор отдаёт строки порциями по itersize,
+        поэтому результат запроса целиком не попадает в память клиента.
+        В режиме autocommit именованный курсор можно использовать только с WITH HOLD.
+        :param server_side: использовать ли именованный курсор
+        :return: курсор
+        """
+        if not server_side:
+            return self.connection.cursor()
+        curs = self.connection.cursor(
+            name=f'{self.table_name}_{uuid4().hex}',
+            withhold=self.connection.autocommit,
+        )
+        curs.itersize = int(self.itersize)
+        return curs
 
-    def _execute_sql(self, query: SQL, values: tuple | list):
+    def _fetch_block(self, curs: postgres_cursor) -> list:
+        """
+        Получение очередного блока строк из курсора.
+        :param curs: курсор с выполненным запросом
+        :return: блок строк размером не больше data_block_size
+        """
+        if curs.name is None:
+            return curs.fetchmany(size=int(self.data_block_size))
+        return list(islice(curs, int(self.data_block_size)))
+
+    def _execute_sql(self, query: SQL, values: tuple | list, server_side: bool = False):
         """
         Выполнение запроса в БД.
         :param query: шаблон запроса
         :param values: переменные для запроса
+        :param server_side: читать результат через серверный курсор
         :return: результат запроса
         """
-        with self.connection.cursor() as curs:
+        with self._get_cursor(server_side) as curs:
+            started = perf_counter()
             try:
                 curs.execute(query, values)
             except PostgresError as error:
                 logger.error(error)
-            while data := curs.fetchmany(size=int(self.data_block_size)):
-                yield data
+                if self.connection.closed:
+                    # соединение потеряно, переподключением занимается вызывающий код
+                    raise
+            yield from self._iter_blocks(curs, started)
+
+    def _iter_blocks(self, curs: postgres_cursor, started: float):
+        """
+        Получение блоков строк из курсора с замером времени чтения каждого блока.
+        Время обработки блока вызывающим кодом в замер не входит.
+        :param curs: курсор с выполненным запросом
+        :param started: время начала выполнения запроса
+        :return: блоки строк
+        """
+        while data := self._fetch_block(curs):
+            STAGE_LATENCY.labels('postgres_fetch').observe(perf_counter() - started)
+            yield data
+            started = perf_counter()
 
     def get_data(self):
         """
@@ -59,73 +231,222 @@ class Loader(ABC):
         """
         for row_data in self.get_updated_movies_ids():
             ids = tuple(ids[0] for ids in row_data)
-            query = SQL('''
-                SELECT
-                    fw.id
-                    , fw.title
-                    , COALESCE(fw.description, '') as description
-                    , fw.rating
-                    , fw.type
-                    , fw.created_at
-                    , fw.updated_at
-                    , COALESCE (
-                       json_agg(
-                           DISTINCT jsonb_build_object(
-                               'role', pfw.role,
-                               'id', p.id,
-                               'name', p.full_name
-                           )
-                       )
-                       , '[]'
-                    ) as persons
-                    , json_agg(DISTINCT g.name) as genre
-                FROM content.film_work fw
-                LEFT JOIN content.person_film_work pfw ON pfw.film_work_id = fw.id
-                LEFT JOIN content.person p ON p.id = pfw.person_id
-                LEFT JOIN content.genre_film_work gfw ON gfw.film_work_id = fw.id
-                LEFT JOIN content.genre g ON g.id = gfw.genre_id
-                WHERE fw.id IN %s
-                GROUP BY fw.id
-                ORDER BY fw.updated_at;
-            ''')
-            rows = self._execute_sql(query, (ids,))
-            yield from rows
+            yield from self.get_movies_info(ids)
+
+    def get_movies_info(self, ids: Tuple[str, ...]):
+        """
+        Получение полной информации о фильмах по их идентификаторам.
+        :param ids: идентификаторы фильмов
+        :return: полная информация о фильмах
+        """
+        started = perf_counter()
+        if self.prepared_statements:
+            data = list(self._execute_prepared(ids))
+        else:
+            query = self.movies_info_query.format(condition=SQL('fw.id IN %s'))
+            data = list(self._execute_sql(query, (ids,)))
+        logger.debug(
+            f'Enriched {len(ids)} movies in {(perf_counter() - started) * 1000:.1f} ms '
+            f'(prepared statement: {self.prepared_statements})...'
+        )
+        yield from data
+
+    def _execute_prepared(self, ids: Tuple[str, ...]):
+        """
+        Выполнение запроса обогащения через подготовленный на сервере запрос.
+        Запрос подготавливается один раз на соединение, поэтому PostgreSQL не разбирает
+        и не планирует его заново для каждого блока.
+        :param ids: идентификаторы фильмов
+        :return: полная информация о фильмах
+        """
+        execute_query = SQL('EXECUTE {name} (%s::uuid[]);').format(name=Identifier(MOVIES_INFO_STATEMENT))
+        with self._get_cursor() as curs:
+            if self.connection.info.backend_pid not in self._prepared_backends:
+                self._prepare_movies_info(curs)
+            started = perf_counter()
+            try:
+                curs.execute(execute_query, (list(ids),))
+            except InvalidSqlStatementName:
+                # новое соединение получило pid старого, запрос нужно подготовить заново
+                self._prepare_movies_info(curs)
+                curs.execute(execute_query, (list(ids),))
+            yield from self._iter_blocks(curs, started)
+
+    def _prepare_movies_info(self, curs: postgres_cursor) -> None:
+        """
+        Подготовка запроса обогащения в текущем соединении.
+        :param curs: курсор соединения
+        :return:
+        """
+        curs.execute(SQL('SELECT 1 FROM pg_prepared_statements WHERE name = %s;'), (MOVIES_INFO_STATEMENT,))
+        if not curs.fetchone():
+            curs.execute(
+                SQL('PREPARE {name} (uuid[]) AS ').format(name=Identifier(MOVIES_INFO_STATEMENT))
+                + self.movies_info_query.format(condition=SQL('fw.id = ANY($1)'))
+            )
+        self._prepared_backends.add(self.connection.info.backend_pid)
 
     def get_updated_movies_ids(self):
         """
         Получение списка идентификаторов измененных фильмов и сохранение состояния.
         :return: идентификаторы фильмов, у которых обновились данные
         """
-        for data in self._get_updated_instance_ids():
-            ids = tuple(row[0] for row in data)
-            yield from self._get_updated_movies_ids(ids)
-            self.save_state(data[-1][1])
+        for movies_ids, checkpoint in self.get_changes():
+            if movies_ids:
+                yield [[_id] for _id in movies_ids]
+            if checkpoint is not None:
+                self.save_state(checkpoint)
+
+    def get_movies_ids(self, instance_ids: Tuple[str, ...]) -> Generator[List[str], None, None]:
+        """
+        Получение идентификаторов фильмов, связанных с переданными объектами таблицы.
+        :param instance_ids: идентификаторы объектов таблицы, принадлежащей данному классу
+        :return: блоки идентификаторов фильмов
+        """
+        if self.link_table is None:
+            yield list(instance_ids)
+            return
+        fan_out_ids = tuple(str(instance_id) for instance_id in self._get_fan_out_ids(instance_ids))
+        if fan_out_ids:
+            for movies_ids, _ in self._iter_fan_out(fan_out_ids):
+                yield movies_ids
+
+    def get_changes(self) -> Generator[Tuple[List[str], Checkpoint | None], None, None]:
+        """
+        Получение изменений без сохранения состояния.
+        Для каждого блока измененных объектов таблицы отдаются идентификаторы связанных фильмов,
+        последний элемент блока содержит позицию, до которой можно сдвинуть состояние загрузчика.
+        Фильмы, связанные с объектами блока, читаются общими запросами по fan_out_block_size связей
+        и отдаются вместе с позицией внутри них, поэтому объект с сотнями тысяч фильмов не требует памяти
+        под все фильмы сразу, а после перезапуска блок продолжает индексироваться с последней сохраненной связи.
+        :return: пары (идентификаторы фильмов, позиция для сохранения состояния или None)
+        """
+        checkpoint = self.checkpoint
+        done = Checkpoint(checkpoint.updated_at, checkpoint.id)
+        resume, until = checkpoint.fan_out, checkpoint.until
+        passes = [(self._get_updated_instance_ids(), resume)]
+        if resume is not None and until is not None:
+            # прерванный блок дочитывается в прежних границах и только он продолжается с сохраненной связи:
+            # объекты, обновленные за время простоя (включая последний объект блока), ушли в конец выборки
+            passes = [
+                (self._get_updated_instance_ids(until=until), resume),
+                (self._get_updated_instance_ids(after=until), None),
+            ]
+        for blocks, resume in passes:
+            for data in blocks:
+                ids = tuple(row[0] for row in data)
+                end = (data[-1][1], str(data[-1][0]))
+                LOADER_ROWS.labels(self.state_key).inc(len(ids))
+                if self.link_table is None:
+                    LOADER_MOVIES.labels(self.state_key).inc(len(ids))
+                    yield list(ids), None
+                    yield [], Checkpoint(*end)
+                    continue
+                fan_out_ids = tuple(str(instance_id) for instance_id in self._get_fan_out_ids(ids))
+                if fan_out_ids:
+                    for movies_ids, position in self._iter_fan_out(fan_out_ids, resume or (NIL_UUID, NIL_UUID)):
+                        LOADER_MOVIES.labels(self.state_key).inc(len(movies_ids))
+                        yield movies_ids, Checkpoint(done.updated_at, done.id, position, end)
+                # позиция относится только к первому блоку после неё
+                resume = None
+                done = Checkpoint(*end)
+                yield [], done
+
+    def _get_fan_out_ids(self, instance_ids: Tuple[str, ...]) -> Tuple[str, ...]:
+        """
+        Выбор объектов, связанные фильмы которых нужно переиндексировать.
+        :param instance_ids: идентификаторы измененных объектов таблицы
+        :return: идентификаторы объектов
+        """
+        return instance_ids
+
+    def _get_fan_out_condition(self) -> SQL:
+        """
+        Дополнительное условие на связи объекта с фильмами.
+        :return: условие
+        """
+        return SQL('TRUE')
+
+    def _iter_fan_out(
+            self,
+            instance_ids: Tuple[str, ...],
+            after: Tuple[str, str] = (NIL_UUID, NIL_UUID),
+    ) -> Generator[Tuple[List[str], Tuple[str, str]], None, None]:
+        """
+        Идентификаторы фильмов, связанных с объектами, блоками по fan_out_block_size связей.
+        Один запрос читает связи всех объектов блока сразу, в порядке (объект, фильм) после последней
+        связи предыдущего запроса по индексу (объект, фильм), поэтому отдельные запросы на объект
+        нужны только тогда, когда фильмов у него больше fan_out_block_size.
+        Фильм, связанный с несколькими объектами, отдаётся в блоке один раз.
+        :param instance_ids: идентификаторы объектов таблицы
+        :param after: связь (объект, фильм), после которой продолжить
+        :return: пары (идентификаторы фильмов, последняя прочитанная связь)
+        """
+        query = SQL('''
+            SELECT DISTINCT {column}, film_work_id
+            FROM {table}
+            WHERE {column} = ANY(%s::uuid[]) AND ({column}, film_work_id) > (%s::uuid, %s::uuid) AND {condition}
+            ORDER BY {column}, film_work_id
+            LIMIT %s;
+        ''').format(
+            table=Identifier(self.scheme, self.link_table),
+            column=Identifier(self.link_column),
+            condition=self._get_fan_out_condition(),
+        )
+        block_size = int(self.fan_out_block_size)
+        while True:
+            links = [
+                (str(row[0]), str(row[1]))
+                for data in self._execute_sql(query, (list(instance_ids), *after, block_size)) for row in data
+            ]
+            if links:
+                yield list(dict.fromkeys(film_id for _, film_id in links)), links[-1]
+            if len(links) < block_size:
+                return
+            after = links[-1]
 
-    def save_state(self, date: datetime.date) -> None:
+    def save_state(self, checkpoint: Checkpoint) -> None:
         """
         Сохранить последнее состояние в хранилище.
-        :param date: Дата обновления данных
+        :param checkpoint: Дата обновления и идентификатор последнего обработанного объекта
         :return:
         """
-        self.state.set_state(type(self).__qualname__, str(date))
+        self.state.set_state(self.state_key, checkpoint.to_state())
 
     @cached_property
-    def modified_date(self) -> datetime.datetime:
+    def checkpoint(self) -> Checkpoint:
         """
-        :return: Дата последнего обновления данных в хранилище состояний.
+        :return: Позиция последнего обработанного объекта в хранилище состояний.
         """
-        object_name = type(self).__qualname__
-        latest_date = self.state.get_state(object_name)
-        try:
-            latest_date = datetime.datetime.fromisoformat(latest_date)
-        except (ValueError, TypeError):
-            latest_date = MIN_DATE_TIME
-        logger.info(f'{object_name} latest date: {latest_date}')
-        return latest_date
+        checkpoint = Checkpoint.from_state(self.state.get_state(self.state_key))
+        logger.info(f'{self.state_key} latest checkpoint: {checkpoint.updated_at}, {checkpoint.id}')
+        return checkpoint
+
+    @property
+    def state_key(self) -> str:
+        """
+        :return: Ключ состояния загрузчика в хранилище.
+        """
+        return type(self).__qualname__
 
-    def _get_updated_instance_ids(self) -> Generator[List[Tuple[UUID, datetime.datetime]], None, None]:
+    def _get_instances_condition(self) -> Tuple[SQL, tuple]:
+        """
+        Дополнительное условие на объекты таблицы класса.
+        :return: условие и переменные для него
+        """
+        return SQL('TRUE'), ()
+
+    def _get_updated_instance_ids(
+            self,
+            after: Tuple[datetime.datetime, str] | None = None,
+            until: Tuple[datetime.datetime, str] | None = None,
+    ) -> Generator[List[Tuple[UUID, datetime.datetime]], None, None]:
         """
         Получение списка идентификатор измененных объектов таблицы класса.
+        Выборка продолжается строго после сохраненной пары (updated_at, id), поэтому
+        последний обработанный блок и группа записей с одинаковой датой не читаются повторно.
+        :param after: пара (updated_at, id), после которой читать, по умолчанию сохраненная позиция
+        :param until: пара (updated_at, id), на которой остановиться включительно
         :return: идентификаторы обновленных сущностей таблицы, принадлежащей данному классу
         """
         query = SQL('''
@@ -133,19 +454,30 @@ class Loader(ABC):
                 id
                 , updated_at
             FROM {table}
-            WHERE updated_at >= %s
+            WHERE (updated_at, id) > (%s, %s::uuid) AND {bound} AND {condition}
             ORDER BY updated_at, id;
-        ''').format(table=Identifier(self.scheme, self.table_name))
+        ''')
+        condition, values = self._get_instances_condition()
+        bound, bound_values = SQL('TRUE'), ()
+        if until is not None:
+            bound, bound_values = SQL('(updated_at, id) <= (%s, %s::uuid)'), tuple(until)
         # использование format как в примерах в документации https://www.psycopg.org/docs/sql.html#module-usage
-        yield from self._execute_sql(query, (self.modified_date, ))
+        query = query.format(table=Identifier(self.scheme, self.table_name), bound=bound, condition=condition)
+        if after is None:
+            after = self.checkpoint[:2]
+        yield from self._execute_sql(query, (*after, *bound_values, *values), server_side=self.streaming)
 
-    @abstractmethod
-    def _get_updated_movies_ids(self, instance_ids):
+    def get_names(self, instance_ids: Tuple[str, ...]) -> Dict[str, str]:
         """
-        Получение списка идентификаторов измененных фильмов.
-        :param instance_ids: идентификаторы обновленных сущностей таблицы, принадлежащей данному классу
-        :return: идентификаторы фильмов, у которых обновились данные
+        Получение текущих названий объектов таблицы класса.
+        :param instance_ids: идентификаторы объектов таблицы
+        :return: названия по идентификаторам
         """
+        query = SQL('SELECT id, {name} FROM {table} WHERE id IN %s;').format(
+            name=Identifier(self.name_column),
+            table=Identifier(self.scheme, self.table_name),
+        )
+        return {str(row[0]): row[1] for data in self._execute_sql(query, (instance_ids,)) for row in data}
 
 
 class MovieLoader(Loader):
@@ -153,52 +485,107 @@ class MovieLoader(Loader):
 
     table_name = 'film_work'
 
-    def _get_updated_movies_ids(self, instance_ids):
-        """
-        Получение списка идентификаторов измененных фильмов.
-        :param instance_ids: идентификаторы обновленных сущностей таблицы, принадлежащей данному классу
-        :return: идентификаторы фильмов, у которых обновились данные
-        """
-        yield [[_id] for _id in instance_ids]
-
 
 class GenreLoader(Loader):
     """Класс для загрузки при измененнии жанров."""
 
     table_name = 'genre'
+    name_column = 'name'
+    link_table = 'genre_film_work'
+    link_column = 'genre_id'
 
-    def _get_updated_movies_ids(self, instance_ids):
+    def __init__(self, connection: postgres_connection, state: State, renamer: Renamer | None = None):
         """
-        Получение списка идентификаторов измененных фильмов.
-        :param instance_ids: идентификаторы обновленных сущностей таблицы, принадлежащей данному классу
-        :return: идентификаторы фильмов, у которых обновились данные
+        Инициализация переменных
+        :param connection: соединение с БД
+        :param state: хранилище состояний
+        :param renamer: частичное обновление документов при переименовании, без него фильмы переиндексируются целиком
+        :return:
         """
-        query = SQL('''
-            SELECT fw.id
-            FROM content.film_work fw
-            LEFT JOIN content.genre_film_work gfw ON gfw.film_work_id = fw.id
-            WHERE gfw.genre_id IN %s
-            ORDER BY fw.updated_at;
-        ''')
-        yield from self._execute_sql(query, (instance_ids,))
+        super().__init__(connection, state, renamer)
+        self._pending_names = {}
+        self._checkpoint_names = {}
+
+    @property
+    def names_key(self) -> str:
+        """
+        :return: Ключ проиндексированных названий жанров в хранилище.
+        """
+        return f'{self.state_key}.names'
+
+    def get_changes(self) -> Generator[Tuple[List[str], Checkpoint | None], None, None]:
+        """
+        Получение изменений без сохранения состояния.
+        Названия жанров блока привязываются к позиции его конца и сохраняются вместе с ней.
+        :return: пары (идентификаторы фильмов, позиция для сохранения состояния или None)
+        """
+        for movies_ids, checkpoint in super().get_changes():
+            if checkpoint is not None and checkpoint.fan_out is None and self._pending_names:
+                self._checkpoint_names[checkpoint] = self._pending_names
+                self._pending_names = {}
+            yield movies_ids, checkpoint
+
+    def save_state(self, checkpoint: Checkpoint) -> None:
+        """
+        Сохранить последнее состояние и названия жанров, проиндексированные до этой позиции.
+        :param checkpoint: Дата обновления и идентификатор последнего обработанного объекта
+        :return:
+        """
+        committed = [position for position in self._checkpoint_names if position[:2] <= checkpoint[:2]]
+        if committed:
+            names = self.state.get_state(self.names_key) or {}
+            for position in sorted(committed):
+                names.update(self._checkpoint_names.pop(position))
+            self.state.set_state(self.names_key, names)
+        super().save_state(checkpoint)
+
+    def _get_fan_out_ids(self, instance_ids: Tuple[str, ...]) -> Tuple[str, ...]:
+        """
+        Выбор жанров, фильмы которых нужно переиндексировать.
+        В документах жанр хранится только названием, поэтому при частичном обновлении
+        переименованный жанр заменяется в индексе по прежнему названию, а фильмы переиндексируются
+        только для жанров, прежнее название которых неизвестно.
+        :param instance_ids: идентификаторы измененных жанров
+        :return: идентификаторы жанров
+        """
+        if self.renamer is None:
+            return instance_ids
+        names = self.get_names(instance_ids)
+        indexed_names = self.state.get_state(self.names_key) or {}
+        renames = {
+            indexed_names[genre_id]: name for genre_id, name in names.items()
+            if genre_id in indexed_names and indexed_names[genre_id] != name
+        }
+        self.renamer.rename_genres(renames)
+        self._pending_names.update(names)
+        return tuple(genre_id for genre_id in names if genre_id not in indexed_names)
 
 
 class PersonLoader(Loader):
     """Класс для загрузки при измененнии жанров."""
 
     table_name = 'person'
+    name_column = 'full_name'
+    link_table = 'person_film_work'
+    link_column = 'person_id'
 
-    def _get_updated_movies_ids(self, instance_ids):
+    def _get_fan_out_ids(self, instance_ids: Tuple[str, ...]) -> Tuple[str, ...]:
         """
-        Получение списка идентификаторов измененных фильмов.
-        :param instance_ids: идентификаторы обновленных сущностей таблицы, принадлежащей данному классу
-        :return: идентификаторы фильмов, у которых обновились данные
+        Выбор персон, фильмы которых нужно переиндексировать.
+        При частичном обновлении имена актёров и сценаристов меняются в индексе одним запросом.
+        :param instance_ids: идентификаторы измененных персон
+        :return: идентификаторы персон
         """
-        query = SQL('''
-            SELECT fw.id
-            FROM content.film_work fw
-            LEFT JOIN content.person_film_work pfw ON pfw.film_work_id = fw.id
-            WHERE pfw.person_id IN %s
-            ORDER BY fw.updated_at;
-        ''')
-        yield from self._execute_sql(query, (instance_ids,))
+        if self.renamer is not None:
+            self.renamer.rename_persons(self.get_names(instance_ids))
+        return instance_ids
+
+    def _get_fan_out_condition(self) -> SQL:
+        """
+        При частичном обновлении переиндексируются только фильмы режиссёров,
+        которые хранятся в документе без идентификатора.
+        :return: условие на связи персоны с фильмами
+        """
+        if self.renamer is None:
+            return SQL('TRUE')
+        return SQL('role = {role}').format(role=Literal('director'))
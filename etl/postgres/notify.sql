@@ -0,0 +1,41 @@
+-- Уведомления ETL об изменениях в схеме content.
+-- Для таблиц сущностей передается идентификатор измененной записи,
+-- для таблиц связей — идентификатор фильма, у которого изменился состав.
+
+CREATE OR REPLACE FUNCTION content.notify_etl_changes() RETURNS trigger AS $$
+DECLARE
+    record_id uuid;
+BEGIN
+    IF TG_TABLE_NAME IN ('genre_film_work', 'person_film_work') THEN
+        IF TG_OP = 'DELETE' THEN
+            record_id := OLD.film_work_id;
+        ELSE
+            record_id := NEW.film_work_id;
+        END IF;
+    ELSE
+        record_id := NEW.id;
+    END IF;
+    PERFORM pg_notify(TG_ARGV[0], json_build_object('table', TG_TABLE_NAME, 'id', record_id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER film_work_notify_etl
+    AFTER INSERT OR UPDATE ON content.film_work
+    FOR EACH ROW EXECUTE FUNCTION content.notify_etl_changes({channel});
+
+CREATE OR REPLACE TRIGGER genre_notify_etl
+    AFTER UPDATE ON content.genre
+    FOR EACH ROW EXECUTE FUNCTION content.notify_etl_changes({channel});
+
+CREATE OR REPLACE TRIGGER person_notify_etl
+    AFTER UPDATE ON content.person
+    FOR EACH ROW EXECUTE FUNCTION content.notify_etl_changes({channel});
+
+CREATE OR REPLACE TRIGGER genre_film_work_notify_etl
+    AFTER INSERT OR UPDATE OR DELETE ON content.genre_film_work
+    FOR EACH ROW EXECUTE FUNCTION content.notify_etl_changes({channel});
+
+CREATE OR REPLACE TRIGGER person_film_work_notify_etl
+    AFTER INSERT OR UPDATE OR DELETE ON content.person_film_work
+    FOR EACH ROW EXECUTE FUNCTION content.notify_etl_changes({channel});
@@ -0,0 +1,79 @@
+"""
+Разбиение таблицы фильмов на диапазоны идентификаторов для параллельной загрузки.
+"""
+
+from uuid import UUID
+from typing import List, NamedTuple, Tuple
+
+from psycopg2.sql import SQL
+from psycopg2.extensions import connection as postgres_connection
+
+from .loader import MovieLoader
+from state_storage.state import State
+
+
+UUID_SPACE = 2 ** 128
+
+
+class IdRange(NamedTuple):
+    """Полуинтервал идентификаторов [start, end), end равен None у последнего диапазона."""
+
+    number: int
+    start: str
+    end: str | None
+
+
+def split_id_ranges(shards: int) -> List[IdRange]:
+    """
+    Разбиение пространства UUID на равные диапазоны.
+    Идентификаторы фильмов случайные, поэтому фильмы распределяются по диапазонам равномерно,
+    а условие по диапазону использует первичный ключ.
+    :param shards: количество диапазонов
+    :return: диапазоны идентификаторов
+    """
+    bounds = [str(UUID(int=UUID_SPACE * number // shards)) for number in range(shards)]
+    return [
+        IdRange(number, start, bounds[number + 1] if number + 1 < shards else None)
+        for number, start in enumerate(bounds)
+    ]
+
+
+class ShardMovieLoader(MovieLoader):
+    """Загрузчик фильмов из одного диапазона идентификаторов."""
+
+    def __init__(self, connection: postgres_connection, state: State, id_range: IdRange):
+        """
+        Инициализация переменных
+        :param connection: соединение с БД
+        :param state: хранилище состояний
+        :param id_range: диапазон идентификаторов фильмов
+        """
+        super().__init__(connection, state)
+        self.id_range = id_range
+
+    @property
+    def state_key(self) -> str:
+        """
+        :return: Ключ состояния диапазона в хранилище.
+        """
+        return f'{type(self).__qualname__}_{self.id_range.number}'
+
+    def _get_instances_condition(self) -> Tuple[SQL, tuple]:
+        """
+        Условие на попадание фильма в диапазон.
+        :return: условие и переменные для него
+        """
+        if self.id_range.end is None:
+            return SQL('id >= %s::uuid'), (self.id_range.start,)
+        return SQL('id >= %s::uuid AND id < %s::uuid'), (self.id_range.start, self.id_range.end)
+
+    def count(self) -> int:
+        """
+        :return: количество фильмов в диапазоне
+        """
+        condition, values = self._get_instances_condition()
+        with self.connection.cursor() as curs:
+            curs.execute(SQL('SELECT count(*) FROM content.film_work WHERE {condition};').format(
+                condition=condition,
+            ), values)
+            return curs.fetchone()[0]
@@ -0,0 +1,172 @@
+"""
+Полная переиндексация фильмов в новую версию индекса без простоя поиска.
+"""
+
+import os
+import argparse
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from main import PSQL_DATA_LOADERS, index_change_set
+from elastic.saver import ElasticSearchSaver
+from elastic.index_manager import IndexManager
+from postgres.collector import ChangeCollector
+from postgres.loader import Checkpoint, NIL_UUID
+from postgres.sharding import IdRange, ShardMovieLoader, split_id_ranges
+from state_storage.state import State, MemoryStorage, AtomicJsonFileStorage
+
+from utils.logger import logger
+from utils.connections import get_postgres_conn, get_elastic_conn
+
+
+def get_progress_state(progress_dir: str, index_name: str, id_range: IdRange) -> State:
+    """
+    Хранилище прогресса одного диапазона.
+    У каждого диапазона свой файл, поэтому процессы не перезаписывают прогресс друг друга.
+    :param progress_dir: каталог с файлами прогресса
+    :param index_name: имя наполняемой версии индекса
+    :param id_range: диапазон идентификаторов
+    :return: хранилище состояний диапазона
+    """
+    file_path = Path(progress_dir) / f'{index_name}.shard{id_range.number}.json'
+    return State(AtomicJsonFileStorage(str(file_path)))
+
+
+def load_shard(index_name: str, id_range: IdRange, shards: int, progress_dir: str) -> int:
+    """
+    Загрузка одного диапазона фильмов в отдельном процессе со своими соединениями.
+    Прогресс сохраняется после каждого набора изменений, поэтому упавший диапазон
+    продолжается с последней сохраненной позиции.
+    :param index_name: имя наполняемой версии индекса
+    :param id_range: диапазон идентификаторов
+    :param shards: общее количество диапазонов
+    :param progress_dir: каталог с файлами прогресса
+    :return: количество загруженных фильмов
+    """
+    state = get_progress_state(progress_dir, index_name, id_range)
+    shard_name = f'Shard {id_range.number + 1}/{shards}'
+    if state.get_state('done'):
+        logger.info(f'{shard_name} is already loaded, skipping...')
+        return 0
+
+    pg_conn = get_postgres_conn()
+    el_conn = get_elastic_conn(set_index=False)
+    try:
+        loader = ShardMovieLoader(pg_conn, state, id_range)
+        saver = ElasticSearchSaver(el_conn, index_name=index_name)
+        total = loader.count()
+        loaded = state.get_state('loaded') or 0
+        for change_set in ChangeCollector([loader]).collect():
+            index_change_set(loader, saver, change_set)
+            loaded += len(change_set.movies_ids)
+            state.set_state('loaded', loaded)
+            logger.info(f'{shard_name}: {loaded}/{total} movies ({loaded * 100 // max(total, 1)}%)...')
+        state.set_state('done', True)
+        logger.info(f'{shard_name} finished...')
+        return loaded
+    finally:
+        pg_conn.close()
+        el_conn.close()
+
+
+def catch_up(index_name: str, started_at) -> None:
+    """
+    Догрузка изменений, сделанных после начала переиндексации.
+    :param index_name: индекс или алиас для записи
+    :param started_at: время начала переиндексации по часам PostgreSQL
+    :return:
+    """
+    logger.info(f'Catching up with changes since {started_at}...')
+    checkpoint = Checkpoint(started_at, NIL_UUID).to_state()
+    catch_up_state = State(MemoryStorage({
+        data_loader.__qualname__: checkpoint for data_loader in PSQL_DATA_LOADERS
+    }))
+    pg_conn = get_postgres_conn()
+    el_conn = get_elastic_conn(set_index=False)
+    try:
+        loaders = [data_loader(pg_conn, catch_up_state) for data_loader in PSQL_DATA_LOADERS]
+        saver = ElasticSearchSaver(el_conn, index_name=index_name)
+        for change_set in ChangeCollector(loaders).collect():
+            index_change_set(loaders[0], saver, change_set)
+    finally:
+        pg_conn.close()
+        el_conn.close()
+
+
+def reindex(workers: int, shards: int, progress_dir: str, resume: str | None = None, delete_old: bool = False) -> None:
+    """
+    Полная переиндексация.
+    Новая версия индекса наполняется параллельно по диапазонам идентификаторов с настройками
+    для массовой загрузки, после чего получает рабочие настройки и подключается к алиасу.
+    Инкрементальный ETL всё это время пишет в алиас, поэтому изменения, сделанные после начала
+    переиндексации, догоняются отдельно.
+    :param workers: количество процессов
+    :param shards: количество диапазонов идентификаторов
+    :param progress_dir: каталог с файлами прогресса
+    :param resume: имя версии индекса, загрузку которой нужно продолжить
+    :param delete_old: удалить предыдущие версии индекса после переключения алиаса
+    :return:
+    """
+    os.makedirs(progress_dir, exist_ok=True)
+    el_conn = get_elastic_conn(set_index=False)
+    index_manager = IndexManager(el_conn)
+    run_state = State(AtomicJsonFileStorage(str(Path(progress_dir) / 'reindex.json')))
+    if resume and run_state.get_state(resume) is None:
+        logger.error(f'No reindex run found for index {resume} in {progress_dir}...')
+        el_conn.close()
+        return
+    if resume:
+        index_name, started_at = resume, Checkpoint.from_state(run_state.get_state(resume)).updated_at
+        shards = run_state.get_state(f'{resume}.shards') or shards
+    else:
+        pg_conn = get_postgres_conn()
+        with pg_conn.cursor() as curs:
+            curs.execute('SELECT now();')
+            started_at = curs.fetchone()[0]
+        pg_conn.close()
+        index_name = index_manager.create_version()
+        run_state.set_state(index_name, Checkpoint(started_at, NIL_UUID).to_state())
+        run_state.set_state(f'{index_name}.shards', shards)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(load_shard, index_name, id_range, shards, progress_dir): id_range
+            for id_range in split_id_ranges(shards)
+        }
+        for future in as_completed(futures):
+            id_range = futures[future]
+            try:
+                future.result()
+            except Exception as error:
+                logger.error(f'Shard {id_range.number + 1}/{shards} failed: {error}')
+                failed.append(id_range)
+    if failed:
+        logger.error(f'{len(failed)} shards failed, continue with: python reindex.py --resume {index_name}')
+        el_conn.close()
+        return
+
+    index_manager.finalize_version(index_name)
+    previous = index_manager.swap_alias(index_name)
+    catch_up(index_manager.alias, started_at)
+    if delete_old:
+        index_manager.delete_indices(previous)
+    el_conn.close()
+    logger.info(f'Full reindex into {index_name} finished...')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Full reindex of movies into a new index version.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--shards', type=int, help='number of film id ranges, defaults to the number of workers')
+    parser.add_argument('--progress-dir', default='reindex_progress', help='directory for per-shard progress files')
+    parser.add_argument('--resume', metavar='INDEX', help='continue loading a previously created index version')
+    parser.add_argument('--delete-old', action='store_true', help='delete previous index versions after the swap')
+    args = parser.parse_args()
+    reindex(
+        workers=args.workers,
+        shards=args.shards or args.workers,
+        progress_dir=args.progress_dir,
+        resume=args.resume,
+        delete_old=args.delete_old,
+    )
@@ -2,8 +2,10 @@
 Хранилища состояний.
 """
 
+import os
 import abc
 import json
+from time import monotonic
 from typing import Any, Dict
 
 
@@ -68,16 +70,101 @@ class JsonFileStorage(BaseStorage):
         return state
 
 
+class CorruptedStateError(Exception):
+    """Файл состояния существует, но не читается."""
+
+
+class AtomicJsonFileStorage(JsonFileStorage):
+    """
+    Хранилище в JSON файле с атомарной записью.
+    Состояние пишется во временный файл рядом с основным, сбрасывается на диск и
+    подменяет основной файл переименованием, поэтому падение во время записи
+    оставляет на диске предыдущую целую версию.
+    """
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        """
+        Сохранить состояние в хранилище.
+        :param state: состояние
+        :return:
+        """
+        if not self.file_path:
+            return
+        tmp_path = f'{self.file_path}.tmp'
+        with open(tmp_path, 'w') as state_file:
+            json.dump(state, state_file)
+            state_file.flush()
+            os.fsync(state_file.fileno())
+        os.replace(tmp_path, self.file_path)
+        dir_fd = os.open(os.path.dirname(os.path.abspath(self.file_path)), os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def retrieve_state(self) -> Dict[str, Any]:
+        """
+        Получить состояние из хранилища.
+        Нечитаемый файл не считается пустым состоянием, иначе загрузка начнётся с самого начала.
+        :return: состояние
+        """
+        if not self.file_path:
+            return {}
+        try:
+            with open(self.file_path, 'r') as state_file:
+                return json.load(state_file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as error:
+            raise CorruptedStateError(f'State file {self.file_path} is corrupted: {error}') from error
+
+
+class MemoryStorage(BaseStorage):
+    """Хранилище состояния в памяти процесса, для разовых запусков без сохранения прогресса."""
+
+    def __init__(self, state: Dict[str, Any] | None = None):
+        """
+        Инициализзация переменных
+        :param state: начальное состояние
+        """
+        self.state = dict(state or {})
+
+    def save_state(self, state: Dict[str, Any]) -> None:
+        """
+        Сохранить состояние в хранилище.
+        :param state: состояние
+        :return:
+        """
+        self.state = dict(state)
+
+    def retrieve_state(self) -> Dict[str, Any]:
+        """
+        Получить состояние из хранилища.
+        :return: состояние
+        """
+        return dict(self.state)
+
+
 class State:
-    """Класс для работы с состояниями."""
+    """
+    Класс для работы с состояниями.
+    Запись в хранилище может объединяться: состояние сбрасывается каждые flush_every изменений
+    или через flush_interval секунд после первого несохраненного изменения.
+    """
 
-    def __init__(self, storage: BaseStorage):
+    def __init__(self, storage: BaseStorage, flush_every: int = 1, flush_interval: float = 0):
         """
         Инициализзация переменных
         :param storage: тип хранилища
+        :param flush_every: количество изменений, после которого состояние сохраняется
+        :param flush_interval: максимальное время хранения несохраненных изменений в секундах
         """
         self.storage = storage
         self.state = storage.retrieve_state()
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._pending = 0
+        self._pending_since = None
 
     def set_state(self, key: str, value: Any) -> None:
         """
@@ -87,7 +174,22 @@ class State:
         :return:
         """
         self.state[key] = value
+        self._pending += 1
+        if self._pending_since is None:
+            self._pending_since = monotonic()
+        if self._pending >= self.flush_every or monotonic() - self._pending_since >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Сохранить несохраненные изменения в хранилище.
+        :return:
+        """
+        if not self._pending:
+            return
         self.storage.save_state(self.state)
+        self._pending = 0
+        self._pending_since = None
 
     def get_state(self, key: str) -> Any:
         """
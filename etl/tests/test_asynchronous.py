@@ -0,0 +1,102 @@
+"""
+Тесты асинхронного движка: постраничная выборка связанных фильмов и ограничение одновременных блоков.
+"""
+
+import asyncio
+import datetime
+
+from engine.asynchronous import AsyncEngine, AsyncPersonLoader
+from postgres.loader import Checkpoint, MIN_DATE_TIME, NIL_UUID
+from state_storage.state import State, MemoryStorage
+
+
+def moment(minute: int) -> datetime.datetime:
+    return datetime.datetime(2023, 5, 1, 12, minute, tzinfo=datetime.timezone.utc)
+
+
+def uuid(number: int) -> str:
+    return f'00000000-0000-0000-0000-{number:012d}'
+
+
+class FakePool:
+    """Пул asyncpg над таблицами в памяти: persons — {id: updated_at}, links — пары (персона, фильм)."""
+
+    def __init__(self, persons: dict, links: list):
+        self.persons = persons
+        self.links = links
+        self.fan_out_queries = 0
+
+    async def fetch(self, query: str, *args) -> list:
+        if 'film_work_id' in query:
+            instance_ids, after_id, after_film, limit = args
+            self.fan_out_queries += 1
+            links = sorted({
+                link for link in self.links if link[0] in instance_ids and link > (after_id, after_film)
+            })
+            return links[:limit]
+        after, until, limit = tuple(args[:2]), tuple(args[2:-1]) or None, args[-1]
+        rows = sorted(
+            (updated_at, person_id) for person_id, updated_at in self.persons.items()
+            if (updated_at, person_id) > after and (until is None or (updated_at, person_id) <= until)
+        )
+        return [{'id': person_id, 'updated_at': updated_at} for updated_at, person_id in rows[:limit]]
+
+
+def make_loader(state: State, persons: dict, links: list, block_size: int, fan_out_block_size: int):
+    loader = AsyncPersonLoader(FakePool(persons, links), state)
+    loader.data_block_size = block_size
+    loader.fan_out_block_size = fan_out_block_size
+    return loader
+
+
+async def collect(loader: AsyncPersonLoader) -> list:
+    return [change async for change in loader.get_changes()]
+
+
+def test_fan_out_pages_large_object():
+    links = [(uuid(1), uuid(100 + number)) for number in range(5)]
+    loader = make_loader(State(MemoryStorage()), {uuid(1): moment(1)}, links, block_size=10, fan_out_block_size=2)
+    changes = asyncio.run(collect(loader))
+    assert loader.pool.fan_out_queries == 3
+    assert [movies_ids for movies_ids, _ in changes[:-1]] == [
+        [uuid(100), uuid(101)], [uuid(102), uuid(103)], [uuid(104)],
+    ]
+    start = MIN_DATE_TIME.replace(tzinfo=datetime.timezone.utc)
+    assert changes[0][1] == Checkpoint(start, NIL_UUID, (uuid(1), uuid(101)), (moment(1), uuid(1)))
+    assert changes[-1] == ([], Checkpoint(moment(1), uuid(1)))
+
+
+def test_fan_out_resumes_inside_bounded_block():
+    state = State(MemoryStorage())
+    persons = {uuid(2): moment(1), uuid(3): moment(2), uuid(1): moment(3)}
+    links = [(uuid(2), uuid(201)), (uuid(2), uuid(202)), (uuid(3), uuid(301)), (uuid(1), uuid(101))]
+    loader = make_loader(state, persons, links, block_size=2, fan_out_block_size=2)
+    movies_ids, checkpoint = asyncio.run(collect(loader))[0]
+    assert movies_ids == [uuid(201), uuid(202)]
+    loader.save_state(checkpoint)
+
+    # за время простоя первая персона прерванного блока обновилась и переехала в конец выборки
+    persons[uuid(2)] = moment(4)
+    resumed = make_loader(state, persons, links, block_size=2, fan_out_block_size=2)
+    indexed = [film for movies_ids, _ in asyncio.run(collect(resumed)) for film in movies_ids]
+    assert indexed == [uuid(301), uuid(101), uuid(201), uuid(202)]
+
+
+def test_index_movies_caps_concurrent_blocks(monkeypatch):
+    monkeypatch.setattr(AsyncEngine, 'concurrency', 2)
+    engine = AsyncEngine(None, None, State(MemoryStorage()))
+    running, peak, indexed = 0, 0, []
+
+    async def index_block(movies_ids):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0)
+        indexed.extend(movies_ids)
+        running -= 1
+
+    monkeypatch.setattr(engine, '_index_block', index_block)
+    movies_ids = [uuid(number) for number in range(10 * AsyncPersonLoader.data_block_size + 1)]
+    asyncio.run(engine.index_movies(movies_ids))
+    assert peak == 2
+    assert sorted(indexed) == movies_ids
@@ -0,0 +1,53 @@
+"""
+Тесты объединения изменений из нескольких загрузчиков.
+"""
+
+import datetime
+
+from postgres.collector import ChangeCollector, ChangeSet
+from postgres.loader import Checkpoint
+
+
+class FakeLoader:
+    def __init__(self, changes: list):
+        self.changes = changes
+        self.saved = []
+
+    def get_changes(self):
+        yield from self.changes
+
+    def save_state(self, checkpoint: Checkpoint) -> None:
+        self.saved.append(checkpoint)
+
+
+def checkpoint(minute: int) -> Checkpoint:
+    return Checkpoint(datetime.datetime(2023, 5, 1, 12, minute), f'00000000-0000-0000-0000-{minute:012d}')
+
+
+def test_film_changed_through_several_tables_is_indexed_once():
+    movies = FakeLoader([(['a', 'b'], None), ([], checkpoint(1))])
+    genres = FakeLoader([(['b', 'c'], checkpoint(2)), ([], checkpoint(3))])
+    persons = FakeLoader([(['a', 'c', 'c'], None), ([], checkpoint(4))])
+    change_sets = list(ChangeCollector([movies, genres, persons]).collect())
+    assert len(change_sets) == 1
+    assert change_sets[0].movies_ids == {'a', 'b', 'c'}
+    # у каждого загрузчика в наборе остаётся последняя позиция
+    assert change_sets[0].checkpoints == {movies: checkpoint(1), genres: checkpoint(3), persons: checkpoint(4)}
+
+    change_sets[0].commit()
+    assert (movies.saved, genres.saved, persons.saved) == ([checkpoint(1)], [checkpoint(3)], [checkpoint(4)])
+
+
+def test_change_set_size_limits_memory(monkeypatch):
+    monkeypatch.setattr(ChangeCollector, 'change_set_size', 2)
+    loader = FakeLoader([(['a', 'b'], None), ([], checkpoint(1)), (['c'], None), ([], checkpoint(2))])
+    change_sets = list(ChangeCollector([loader]).collect())
+    assert [change_set.movies_ids for change_set in change_sets] == [{'a', 'b'}, {'c'}]
+    # позиция после первого блока не попадает в набор раньше его фильмов
+    assert [change_set.checkpoints for change_set in change_sets] == [{}, {loader: checkpoint(2)}]
+
+
+def test_iter_blocks_are_sorted_and_complete():
+    change_set = ChangeSet({'d', 'b', 'a', 'c', 'e'})
+    assert list(change_set.iter_blocks(2)) == [('a', 'b'), ('c', 'd'), ('e',)]
+    assert not ChangeSet()
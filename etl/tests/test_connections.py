@@ -0,0 +1,46 @@
+"""
+Тесты подготовки индекса ElasticSearch.
+"""
+
+import json
+
+from utils.configuration import ExtraConfig
+from utils.connections import set_elastic_index
+
+
+class FakeIndices:
+    def __init__(self, exists: bool):
+        self._exists = exists
+        self.created = None
+        self.mapping = None
+
+    def exists(self, index):
+        return self._exists
+
+    def create(self, index, ignore, body):
+        self.created = body
+
+    def put_mapping(self, index, **mapping):
+        self.mapping = mapping
+
+
+class FakeConnection:
+    def __init__(self, exists: bool):
+        self.indices = FakeIndices(exists)
+
+
+def test_existing_index_gets_new_fields():
+    with open(ExtraConfig().ES_INDEX_FILE, 'r') as index_file:
+        mappings = json.load(index_file)['mappings']
+    connection = FakeConnection(exists=True)
+    set_elastic_index(connection)
+    assert connection.indices.created is None
+    assert connection.indices.mapping == mappings
+    assert {'creation_date', 'type', 'updated_at'} <= set(connection.indices.mapping['properties'])
+
+
+def test_missing_index_is_created():
+    connection = FakeConnection(exists=False)
+    set_elastic_index(connection)
+    assert connection.indices.created is not None
+    assert connection.indices.mapping is None
@@ -0,0 +1,117 @@
+"""
+Тесты сборки документов: быстрый путь должен давать те же байты, что и модель pydantic.
+Эталон — вывод BaseModel.json() по умолчанию (разделители json.dumps, экранирование не-ASCII),
+документы в индексе не должны меняться от включения ES_FAST_SERIALIZATION.
+"""
+
+import json
+import datetime
+
+import pytest
+
+from elastic.saver import ElasticSearchSaver
+from elastic.data_formatter import FilmWorkDocument, FilmWorkModel, format_rows, get_content
+
+
+UPDATED_AT = datetime.datetime(2023, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+
+FILMS = {
+    'full': {
+        'id': '3d825f60-9fff-4dfe-b294-1a45fa1e115d',
+        'title': 'Star Wars: Episode IV',
+        'description': 'A long time ago "in a galaxy" far\\far away',
+        'rating': 8.6,
+        'type': 'movie',
+        'creation_date': datetime.date(1977, 5, 25),
+        'updated_at': UPDATED_AT,
+        'persons': [
+            {'role': 'actor', 'id': '26e83050-29ef-4163-a99d-b546cac208f8', 'name': 'Mark Hamill'},
+            {'role': 'writer', 'id': 'a5a8f573-3cee-4ccc-8a2b-91cb9f55250a', 'name': 'George Lucas'},
+            {'role': 'director', 'id': 'a5a8f573-3cee-4ccc-8a2b-91cb9f55250a', 'name': 'George Lucas'},
+        ],
+        'genre': ['Action', 'Sci-Fi'],
+    },
+    'no_persons_no_genres': {
+        'id': '0312ed51-8833-413f-bff5-0e139c11264a',
+        'title': 'Empty',
+        'description': '',
+        'rating': None,
+        'type': 'tv_show',
+        'creation_date': None,
+        'updated_at': UPDATED_AT,
+        # так запрос с LEFT JOIN возвращает фильм без персон и жанров
+        'persons': [{'role': None, 'id': None, 'name': None}],
+        'genre': [None],
+    },
+    'read_model_empty_arrays': {
+        'id': '0312ed51-8833-413f-bff5-0e139c11264a',
+        'title': 'Empty',
+        'description': '',
+        'rating': None,
+        'type': 'tv_show',
+        'creation_date': None,
+        'updated_at': UPDATED_AT,
+        'persons': [],
+        'genre': [],
+    },
+    'non_ascii': {
+        'id': 'b16d59f7-a386-460e-a4b9-6f2e5d7e1a11',
+        'title': 'Сталкер — «Зона» 🎬',
+        'description': 'Фильм Андрея Тарковского\nпо мотивам «Пикника на обочине»',
+        'rating': 8.1,
+        'type': 'movie',
+        'creation_date': datetime.date(1979, 5, 25),
+        'updated_at': UPDATED_AT,
+        'persons': [
+            {'role': 'actor', 'id': 'c1b4b6f0-4d3b-4a4f-9a53-9a2f1f1c6f01', 'name': 'Александр Кайдановский'},
+            {'role': 'director', 'id': 'c1b4b6f0-4d3b-4a4f-9a53-9a2f1f1c6f02', 'name': 'Андрей Тарковский'},
+            {'role': 'writer', 'id': 'c1b4b6f0-4d3b-4a4f-9a53-9a2f1f1c6f03', 'name': 'Аркадий Стругацкий'},
+        ],
+        'genre': ['Драма', 'Фантастика'],
+    },
+}
+
+GOLDEN_EMPTY = (
+    '{"id": "0312ed51-8833-413f-bff5-0e139c11264a", "title": "Empty", "description": "", '
+    '"creation_date": null, "type": "tv_show", "genre": [], "imdb_rating": 0.0, "director": [], '
+    '"actors": [], "writers": [], "actors_names": [], "writers_names": [], '
+    '"updated_at": "2023-05-01T12:30:15.123456+00:00"}'
+)
+
+
+@pytest.mark.parametrize('name', FILMS)
+def test_fast_document_matches_model(name):
+    film = FILMS[name]
+    assert FilmWorkDocument.init_from_sql(**film).json() == FilmWorkModel.init_from_sql(**film).json()
+
+
+@pytest.mark.parametrize('name', ['no_persons_no_genres', 'read_model_empty_arrays'])
+def test_empty_film_golden(name):
+    assert FilmWorkDocument.init_from_sql(**FILMS[name]).json() == GOLDEN_EMPTY
+    assert FilmWorkModel.init_from_sql(**FILMS[name]).json() == GOLDEN_EMPTY
+
+
+def test_non_ascii_is_escaped_like_model():
+    source = FilmWorkDocument.init_from_sql(**FILMS['non_ascii']).json()
+    assert '"director": ["\\u0410\\u043d\\u0434\\u0440\\u0435\\u0439 ' in source
+    assert json.loads(source)['title'] == 'Сталкер — «Зона» 🎬'
+
+
+def test_content_excludes_only_updated_at():
+    film = dict(FILMS['full'], description='ends with , "updated_at": "2000-01-01"')
+    for formatter in (FilmWorkDocument, FilmWorkModel):
+        source = formatter.init_from_sql(**film).json()
+        content = json.loads(get_content(source) + '}')
+        assert content == {key: value for key, value in json.loads(source).items() if key != 'updated_at'}
+
+
+def test_format_rows_path():
+    assert isinstance(format_rows([FILMS['full']], fast=True)[0], FilmWorkDocument)
+    assert isinstance(format_rows([FILMS['full']])[0], FilmWorkModel)
+
+
+def test_saver_reads_flag_on_construction(monkeypatch):
+    monkeypatch.setenv('ES_FAST_SERIALIZATION', 'True')
+    assert isinstance(ElasticSearchSaver(None).transform([FILMS['full']])[0], FilmWorkDocument)
+    monkeypatch.setenv('ES_FAST_SERIALIZATION', 'False')
+    assert isinstance(ElasticSearchSaver(None).transform([FILMS['full']])[0], FilmWorkModel)
@@ -0,0 +1,146 @@
+"""
+Тесты подписки на уведомления PostgreSQL.
+Тестам триггеров нужен PostgreSQL 14+ со схемой content (DB_* из окружения), иначе они пропускаются.
+Все изменения делаются в одной транзакции и откатываются.
+"""
+
+from uuid import uuid4
+
+import psycopg2
+import pytest
+from psycopg2.extensions import Notify
+
+from utils.configuration import PostgresDSL
+from postgres.listener import ChangeListener
+from postgres.loader import GenreLoader, PersonLoader
+from state_storage.state import State, MemoryStorage
+
+# уведомления доставляются только после фиксации транзакции, поэтому в откатываемой транзакции
+# pg_notify подменяется функцией, которая сохраняет их во временную таблицу
+CAPTURE_NOTIFIES_SQL = '''
+    CREATE TEMPORARY TABLE captured_notifies (channel text, payload text) ON COMMIT DROP;
+    CREATE SCHEMA etl_notify_test;
+    CREATE FUNCTION etl_notify_test.pg_notify(channel text, payload text) RETURNS void AS $$
+        INSERT INTO captured_notifies VALUES (channel, payload);
+    $$ LANGUAGE sql;
+    SET LOCAL search_path = etl_notify_test, pg_catalog, public;
+'''
+
+
+class FakeCursor:
+    def __init__(self, statements: list):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, statement, params=None):
+        self.statements.append(repr(statement))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+
+def test_listen_only_subscribes():
+    connection = FakeConnection()
+    listener = ChangeListener(connection, [])
+    listener.listen()
+    listener.listen()
+    assert len(connection.statements) == 2
+    assert all('LISTEN' in statement and 'TRIGGER' not in statement for statement in connection.statements)
+
+
+def test_install_triggers_runs_ddl_once():
+    connection = FakeConnection()
+    ChangeListener.install_triggers(connection)
+    assert len(connection.statements) == 1
+    assert 'CREATE OR REPLACE TRIGGER' in connection.statements[0]
+    assert 'LISTEN' not in connection.statements[0]
+
+
+@pytest.fixture
+def connection():
+    try:
+        connection = psycopg2.connect(**PostgresDSL().dict(), connect_timeout=3)
+    except psycopg2.OperationalError as error:
+        pytest.skip(f'PostgreSQL is unavailable: {error}')
+    try:
+        if connection.server_version < 140000:
+            pytest.skip('CREATE OR REPLACE TRIGGER needs PostgreSQL 14')
+        with connection.cursor() as curs:
+            curs.execute("SELECT to_regclass('content.film_work') IS NOT NULL;")
+            if not curs.fetchone()[0]:
+                pytest.skip('content schema is not created')
+            curs.execute(CAPTURE_NOTIFIES_SQL)
+        ChangeListener.install_triggers(connection)
+        yield connection
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def receive(connection, listener: ChangeListener) -> dict:
+    """Передача сохраненных уведомлений слушателю так, как их отдаёт psycopg2 после фиксации."""
+    with connection.cursor() as curs:
+        curs.execute('DELETE FROM captured_notifies RETURNING channel, payload;')
+        connection.notifies.extend(Notify(connection.info.backend_pid, *row) for row in curs.fetchall())
+    assert all(notify.channel == ChangeListener.channel for notify in connection.notifies)
+    return listener.wait(0)
+
+
+def test_notifications_carry_ids_for_change_set(connection):
+    state = State(MemoryStorage())
+    listener = ChangeListener(connection, [GenreLoader(connection, state), PersonLoader(connection, state)])
+    listener.listen()
+    film, other_film, genre, person = (str(uuid4()) for _ in range(4))
+    with connection.cursor() as curs:
+        curs.execute(
+            'INSERT INTO content.genre (id, name, created_at, updated_at) VALUES (%s, %s, now(), now());',
+            (genre, 'Action'),
+        )
+        curs.execute(
+            'INSERT INTO content.person (id, full_name, created_at, updated_at) VALUES (%s, %s, now(), now());',
+            (person, 'Mark Hamill'),
+        )
+        curs.execute(
+            'INSERT INTO content.film_work (id, title, type, created_at, updated_at) '
+            'VALUES (%s, %s, %s, now(), now()), (%s, %s, %s, now(), now());',
+            (film, 'Star Wars', 'movie', other_film, 'Empire', 'movie'),
+        )
+        curs.execute(
+            'INSERT INTO content.genre_film_work (id, film_work_id, genre_id, created_at) '
+            'VALUES (%s, %s, %s, now()), (%s, %s, %s, now());',
+            (str(uuid4()), film, genre, str(uuid4()), other_film, genre),
+        )
+        curs.execute(
+            'INSERT INTO content.person_film_work (id, film_work_id, person_id, role, created_at) '
+            'VALUES (%s, %s, %s, %s, now());',
+            (str(uuid4()), film, person, 'actor'),
+        )
+    # новые жанры и персоны без связей не уведомляют, связи уведомляют идентификатором фильма
+    assert receive(connection, listener) == {
+        'film_work': {film, other_film},
+        'genre_film_work': {film, other_film},
+        'person_film_work': {film},
+    }
+
+    with connection.cursor() as curs:
+        curs.execute('UPDATE content.genre SET name = %s WHERE id = %s;', ('Sci-Fi', genre))
+    changes = receive(connection, listener)
+    assert changes == {'genre': {genre}}
+    assert listener.get_change_set(changes).movies_ids == {film, other_film}
+
+    with connection.cursor() as curs:
+        curs.execute('UPDATE content.person SET full_name = %s WHERE id = %s;', ('Luke', person))
+        curs.execute('DELETE FROM content.genre_film_work WHERE film_work_id = %s;', (other_film,))
+    changes = receive(connection, listener)
+    assert changes == {'person': {person}, 'genre_film_work': {other_film}}
+    assert listener.get_change_set(changes).movies_ids == {film, other_film}
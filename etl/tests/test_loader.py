@@ -0,0 +1,168 @@
+"""
+Тесты выборки изменений загрузчиками PostgreSQL.
+"""
+
+import datetime
+
+from postgres.loader import Checkpoint, MovieLoader, PersonLoader, MIN_DATE_TIME, NIL_UUID
+from state_storage.state import State, MemoryStorage
+
+
+def moment(minute: int) -> datetime.datetime:
+    return datetime.datetime(2023, 5, 1, 12, minute)
+
+
+def uuid(number: int) -> str:
+    return f'00000000-0000-0000-0000-{number:012d}'
+
+
+class FakePersonLoader(PersonLoader):
+    """Загрузчик персон над таблицами в памяти: persons — {id: updated_at}, links — пары (персона, фильм)."""
+
+    def __init__(self, state: State, persons: dict, links: list, block_size: int, fan_out_block_size: int):
+        super().__init__(None, state)
+        self.persons = persons
+        self.links = links
+        self.data_block_size = block_size
+        self.fan_out_block_size = fan_out_block_size
+        self.fan_out_queries = 0
+
+    def _get_updated_instance_ids(self, after=None, until=None):
+        after = after or self.checkpoint[:2]
+        rows = sorted(
+            (updated_at, person_id) for person_id, updated_at in self.persons.items()
+            if (updated_at, person_id) > after and (until is None or (updated_at, person_id) <= until)
+        )
+        rows = [(person_id, updated_at) for updated_at, person_id in rows]
+        for start in range(0, len(rows), self.data_block_size):
+            yield rows[start:start + self.data_block_size]
+
+    def _execute_sql(self, query, values, server_side=False):
+        instance_ids, after_id, after_film, limit = values
+        self.fan_out_queries += 1
+        links = sorted({
+            link for link in self.links if link[0] in instance_ids and link > (after_id, after_film)
+        })
+        yield links[:limit]
+
+
+def make_loader(state=None, **kwargs) -> FakePersonLoader:
+    options = {
+        'persons': {uuid(1): moment(1), uuid(2): moment(2), uuid(3): moment(3)},
+        'links': [(uuid(1), uuid(101)), (uuid(1), uuid(102)), (uuid(2), uuid(102)), (uuid(3), uuid(103))],
+        'block_size': 10,
+        'fan_out_block_size': 100,
+    }
+    options.update(kwargs)
+    return FakePersonLoader(state or State(MemoryStorage()), **options)
+
+
+def test_fan_out_is_one_query_per_block():
+    loader = make_loader()
+    changes = list(loader.get_changes())
+    assert loader.fan_out_queries == 1
+    assert changes[0][0] == [uuid(101), uuid(102), uuid(103)]
+    assert changes[-1] == ([], Checkpoint(moment(3), uuid(3)))
+
+
+def test_fan_out_pages_large_object():
+    links = [(uuid(1), uuid(100 + number)) for number in range(5)]
+    loader = make_loader(persons={uuid(1): moment(1)}, links=links, fan_out_block_size=2)
+    changes = list(loader.get_changes())
+    assert loader.fan_out_queries == 3
+    assert [movies_ids for movies_ids, _ in changes[:-1]] == [
+        [uuid(100), uuid(101)], [uuid(102), uuid(103)], [uuid(104)],
+    ]
+    start = Checkpoint.from_state(None)
+    assert changes[0][1] == Checkpoint(
+        start.updated_at, start.id, (uuid(1), uuid(101)), (moment(1), uuid(1)),
+    )
+
+
+def test_fan_out_resumes_inside_bounded_block():
+    state = State(MemoryStorage())
+    # блок из двух персон прерван после первой страницы связей
+    persons = {uuid(2): moment(1), uuid(3): moment(2), uuid(1): moment(3)}
+    links = [(uuid(2), uuid(201)), (uuid(2), uuid(202)), (uuid(3), uuid(301)), (uuid(1), uuid(101))]
+    loader = make_loader(state, persons=persons, links=links, block_size=2, fan_out_block_size=2)
+    movies_ids, checkpoint = next(loader.get_changes())
+    assert movies_ids == [uuid(201), uuid(202)]
+    loader.save_state(checkpoint)
+    assert Checkpoint.from_state(state.get_state(loader.state_key)) == checkpoint
+
+    # за время простоя первая персона блока обновилась и переехала в конец выборки,
+    # персона с меньшим идентификатором не должна попасть в прерванный блок и потерять фильмы
+    persons[uuid(2)] = moment(4)
+    resumed = make_loader(state, persons=persons, links=links, block_size=2, fan_out_block_size=2)
+    indexed = [film for movies_ids, _ in resumed.get_changes() for film in movies_ids]
+    assert indexed == [uuid(301), uuid(101), uuid(201), uuid(202)]
+
+
+def test_fan_out_resume_ends_with_bounded_block():
+    state = State(MemoryStorage())
+    persons = {uuid(2): moment(1), uuid(3): moment(2), uuid(1): moment(3)}
+    links = [(uuid(2), uuid(201)), (uuid(2), uuid(202)), (uuid(3), uuid(301)), (uuid(1), uuid(101))]
+    loader = make_loader(state, persons=persons, links=links, block_size=2, fan_out_block_size=2)
+    loader.save_state(next(loader.get_changes())[1])
+
+    # за время простоя обновился последний объект прерванного блока: ограниченная выборка до него не доходит,
+    # но позиция внутри блока не должна переноситься на следующие блоки
+    persons[uuid(3)] = moment(4)
+    resumed = make_loader(state, persons=persons, links=links, block_size=2, fan_out_block_size=2)
+    indexed = [film for movies_ids, _ in resumed.get_changes() for film in movies_ids]
+    assert indexed == [uuid(101), uuid(301)]
+
+
+def test_listener_fan_out_is_batched():
+    loader = make_loader()
+    assert list(loader.get_movies_ids((uuid(1), uuid(2), uuid(3)))) == [[uuid(101), uuid(102), uuid(103)]]
+    assert loader.fan_out_queries == 1
+
+
+def test_checkpoint_state_without_block_bound():
+    checkpoint = Checkpoint(moment(1), uuid(1), (uuid(1), NIL_UUID))
+    assert Checkpoint.from_state(checkpoint.to_state()) == checkpoint
+
+
+class RecordingMovieLoader(MovieLoader):
+    """Загрузчик фильмов, который отвечает на запрос строками films после переданной позиции."""
+
+    def __init__(self, state: State, films: list):
+        super().__init__(None, state)
+        self.films = films
+        self.data_block_size = 2
+        self.queries = []
+
+    def _execute_sql(self, query, values, server_side=False):
+        self.queries.append((repr(query), values))
+        rows = sorted((updated_at, film_id) for film_id, updated_at in self.films if (updated_at, film_id) > values[:2])
+        rows = [(film_id, updated_at) for updated_at, film_id in rows]
+        for start in range(0, len(rows), self.data_block_size):
+            yield rows[start:start + self.data_block_size]
+
+
+def test_checkpoint_keyset_resumes_inside_group_of_equal_dates():
+    state = State(MemoryStorage())
+    # три фильма с одной датой обновления не помещаются в один блок
+    films = [(uuid(3), moment(1)), (uuid(1), moment(1)), (uuid(2), moment(1)), (uuid(4), moment(2))]
+    loader = RecordingMovieLoader(state, films)
+    changes = loader.get_changes()
+    assert next(changes) == ([uuid(1), uuid(2)], None)
+    movies_ids, checkpoint = next(changes)
+    assert checkpoint == Checkpoint(moment(1), uuid(2))
+    loader.save_state(checkpoint)
+
+    resumed = RecordingMovieLoader(state, films)
+    indexed = [film for movies_ids, _ in resumed.get_changes() for film in movies_ids]
+    assert indexed == [uuid(3), uuid(4)]
+    query, values = resumed.queries[0]
+    assert '(updated_at, id) > (%s, %s::uuid)' in query and 'ORDER BY updated_at, id' in query
+    assert values[:2] == (moment(1), uuid(2))
+
+
+def test_checkpoint_state_formats():
+    assert Checkpoint.from_state(None) == Checkpoint(MIN_DATE_TIME, NIL_UUID)
+    assert Checkpoint.from_state('garbage') == Checkpoint(MIN_DATE_TIME, NIL_UUID)
+    # прежний формат — только дата — продолжает перед всеми объектами с этой датой
+    assert Checkpoint.from_state(str(moment(1))) == Checkpoint(moment(1), NIL_UUID)
+    assert Checkpoint.from_state(Checkpoint(moment(1), uuid(2)).to_state()) == Checkpoint(moment(1), uuid(2))
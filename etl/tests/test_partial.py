@@ -0,0 +1,55 @@
+"""
+Тесты частичного обновления документов при переименовании.
+"""
+
+import pytest
+
+import elastic.partial as partial
+from elastic.partial import NestedFieldUpdater, PartialUpdateError
+from elastic.fingerprint import FingerprintCache
+
+
+class FakeTasks:
+    def __init__(self, response: dict):
+        self.response = response
+
+    def get(self, task_id: str) -> dict:
+        return {'completed': True, 'response': self.response}
+
+
+class FakeConnection:
+    def __init__(self, **response):
+        self.tasks = FakeTasks({'updated': 2, 'noops': 0, 'version_conflicts': 0, 'failures': [], **response})
+        self.update_options = None
+
+    def update_by_query(self, **options):
+        self.update_options = options
+        return {'task': 'node:1'}
+
+
+def test_rename_discards_only_affected_fingerprints(monkeypatch):
+    monkeypatch.setattr(partial.helpers, 'scan', lambda *args, **kwargs: iter([{'_id': 'a'}, {'_id': 'b'}]))
+    fingerprints = FingerprintCache(10)
+    for document_id in ('a', 'b', 'c'):
+        fingerprints.update(document_id, FingerprintCache.digest(document_id))
+    connection = FakeConnection()
+    updater = NestedFieldUpdater(connection, index_name='movies', fingerprints=fingerprints)
+
+    assert updater.rename_genres({'Sci-Fi': 'Science Fiction'}) == 2
+    assert connection.update_options['wait_for_completion'] is False
+    assert not fingerprints.is_unchanged('a', FingerprintCache.digest('a'))
+    assert not fingerprints.is_unchanged('b', FingerprintCache.digest('b'))
+    assert fingerprints.is_unchanged('c', FingerprintCache.digest('c'))
+
+
+def test_rename_with_conflicts_is_not_committed(monkeypatch):
+    monkeypatch.setattr(partial.helpers, 'scan', lambda *args, **kwargs: iter([{'_id': 'a'}, {'_id': 'b'}]))
+    fingerprints = FingerprintCache(10)
+    fingerprints.update('a', FingerprintCache.digest('a'))
+    updater = NestedFieldUpdater(
+        FakeConnection(updated=1, version_conflicts=1), index_name='movies', fingerprints=fingerprints,
+    )
+
+    with pytest.raises(PartialUpdateError):
+        updater.rename_persons({'person': 'New Name'})
+    assert not fingerprints.is_unchanged('a', FingerprintCache.digest('a'))
@@ -0,0 +1,134 @@
+"""
+Сверка денормализованной таблицы фильмов с запросами, которые она заменяет.
+Нужен PostgreSQL 14+ со схемой content (DB_* из окружения), иначе тесты пропускаются.
+Все изменения делаются в одной транзакции и откатываются.
+"""
+
+from uuid import uuid4
+from pathlib import Path
+
+import psycopg2
+import pytest
+from psycopg2.sql import SQL
+from psycopg2.extras import RealDictCursor
+
+from utils.configuration import PostgresDSL
+from elastic.data_formatter import FilmWorkDocument
+from postgres.loader import MOVIES_INFO_QUERY, MOVIES_INFO_READ_MODEL_QUERY
+
+READ_MODEL_SQL_FILE = (
+    Path(__file__).resolve().parents[2] / 'movies_admin' / 'movies' / 'sql' / 'film_work_read_model.sql'
+)
+# то же, что MoviesApiMixin.get_queryset в movies_admin собирает через ArrayAgg
+API_QUERY = SQL('''
+    SELECT
+        fw.id
+        , COALESCE(array_agg(DISTINCT g.name) FILTER (WHERE g.id IS NOT NULL), '{}') AS genres
+        , COALESCE(array_agg(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'actor'), '{}') AS actors
+        , COALESCE(array_agg(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'director'), '{}') AS directors
+        , COALESCE(array_agg(DISTINCT p.full_name) FILTER (WHERE pfw.role = 'writer'), '{}') AS writers
+    FROM content.film_work fw
+    LEFT JOIN content.genre_film_work gfw ON gfw.film_work_id = fw.id
+    LEFT JOIN content.genre g ON g.id = gfw.genre_id
+    LEFT JOIN content.person_film_work pfw ON pfw.film_work_id = fw.id
+    LEFT JOIN content.person p ON p.id = pfw.person_id
+    WHERE fw.id = ANY(%s::uuid[])
+    GROUP BY fw.id
+''')
+READ_MODEL_API_QUERY = SQL('''
+    SELECT id, genres, actors, directors, writers
+    FROM content.film_work_read_model
+    WHERE id = ANY(%s::uuid[])
+''')
+
+
+@pytest.fixture
+def curs():
+    try:
+        connection = psycopg2.connect(**PostgresDSL().dict(), connect_timeout=3)
+    except psycopg2.OperationalError as error:
+        pytest.skip(f'PostgreSQL is unavailable: {error}')
+    try:
+        if connection.server_version < 140000:
+            pytest.skip('CREATE OR REPLACE TRIGGER needs PostgreSQL 14')
+        with connection.cursor(cursor_factory=RealDictCursor) as cursor:
+            cursor.execute("SELECT to_regclass('content.film_work') IS NOT NULL AS exists;")
+            if not cursor.fetchone()['exists']:
+                pytest.skip('content schema is not created')
+            cursor.execute(READ_MODEL_SQL_FILE.read_text())
+            yield cursor
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def get_documents(curs, query: SQL, film_ids: list) -> dict:
+    curs.execute(query.format(condition=SQL('fw.id = ANY(%s::uuid[])')), (film_ids,))
+    return {str(row['id']): FilmWorkDocument.init_from_sql(**row).json() for row in curs.fetchall()}
+
+
+def get_rows(curs, query: SQL, film_ids: list) -> dict:
+    curs.execute(query, (film_ids,))
+    return {str(row.pop('id')): row for row in curs.fetchall()}
+
+
+def assert_read_model_matches(curs, film_ids: list) -> dict:
+    documents = get_documents(curs, MOVIES_INFO_QUERY, film_ids)
+    assert get_documents(curs, MOVIES_INFO_READ_MODEL_QUERY, film_ids) == documents
+    assert get_rows(curs, READ_MODEL_API_QUERY, film_ids) == get_rows(curs, API_QUERY, film_ids)
+    return get_rows(curs, READ_MODEL_API_QUERY, film_ids)
+
+
+def test_read_model_follows_changes(curs):
+    film, empty_film = str(uuid4()), str(uuid4())
+    action, drama = str(uuid4()), str(uuid4())
+    actor, director = str(uuid4()), str(uuid4())
+    films = [film, empty_film]
+    curs.execute(
+        'INSERT INTO content.genre (id, name, created_at, updated_at) '
+        'VALUES (%s, %s, now(), now()), (%s, %s, now(), now());',
+        (action, 'Action', drama, 'Драма'),
+    )
+    curs.execute(
+        'INSERT INTO content.person (id, full_name, created_at, updated_at) '
+        'VALUES (%s, %s, now(), now()), (%s, %s, now(), now());',
+        (actor, 'Mark Hamill', director, 'Андрей Тарковский'),
+    )
+    curs.execute(
+        'INSERT INTO content.film_work (id, title, description, rating, type, created_at, updated_at) '
+        'VALUES (%s, %s, NULL, 8.6, %s, now(), now()), (%s, %s, NULL, NULL, %s, now(), now());',
+        (film, 'Star Wars', 'movie', empty_film, 'Empty', 'tv_show'),
+    )
+    curs.execute(
+        'INSERT INTO content.genre_film_work (id, film_work_id, genre_id, created_at) '
+        'VALUES (%s, %s, %s, now()), (%s, %s, %s, now());',
+        (str(uuid4()), film, action, str(uuid4()), film, drama),
+    )
+    curs.execute(
+        'INSERT INTO content.person_film_work (id, film_work_id, person_id, role, created_at) '
+        'VALUES (%s, %s, %s, %s, now()), (%s, %s, %s, %s, now()), (%s, %s, %s, %s, now());',
+        (
+            str(uuid4()), film, actor, 'actor',
+            str(uuid4()), film, director, 'director',
+            str(uuid4()), film, director, 'writer',
+        ),
+    )
+    rows = assert_read_model_matches(curs, films)
+    assert rows[film]['genres'] == ['Action', 'Драма']
+    # фильм без жанров: [null] в MOVIES_INFO_QUERY и пустой массив в таблице дают один документ
+    assert rows[empty_film] == {'genres': [], 'actors': [], 'directors': [], 'writers': []}
+
+    curs.execute('DELETE FROM content.genre_film_work WHERE film_work_id = %s AND genre_id = %s;', (film, drama))
+    curs.execute('DELETE FROM content.person_film_work WHERE film_work_id = %s AND role = %s;', (film, 'actor'))
+    rows = assert_read_model_matches(curs, films)
+    assert rows[film]['genres'] == ['Action'] and rows[film]['actors'] == []
+
+    curs.execute('UPDATE content.person SET full_name = %s, updated_at = now() WHERE id = %s;', ('Tarkovsky', director))
+    rows = assert_read_model_matches(curs, films)
+    assert rows[film]['directors'] == ['Tarkovsky'] and rows[film]['writers'] == ['Tarkovsky']
+
+    curs.execute('DELETE FROM content.genre_film_work WHERE film_work_id = %s;', (film,))
+    curs.execute('DELETE FROM content.person_film_work WHERE film_work_id = %s;', (film,))
+    curs.execute('DELETE FROM content.film_work WHERE id = %s;', (film,))
+    rows = assert_read_model_matches(curs, films)
+    assert list(rows) == [empty_film]
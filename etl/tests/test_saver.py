@@ -0,0 +1,87 @@
+"""
+Тесты записи документов в ElasticSearch.
+"""
+
+import random
+import datetime
+
+from elastic.saver import ElasticSearchSaver
+from elastic.fingerprint import FingerprintCache
+from elastic.adaptive import AdaptiveBulkController
+from elastic.data_formatter import format_rows
+from benchmarks.catalogue import Catalogue
+from benchmarks.fake_elastic import FakeElasticNode, get_fake_elastic_conn
+
+
+def make_saver(monkeypatch, threads: int, chunk_size: int) -> ElasticSearchSaver:
+    monkeypatch.setattr(ElasticSearchSaver, 'concurrent_bulk', True)
+    monkeypatch.setattr(ElasticSearchSaver, 'adaptive_bulk', False)
+    monkeypatch.setattr(ElasticSearchSaver, 'bulk_threads', threads)
+    monkeypatch.setattr(ElasticSearchSaver, 'bulk_chunk_size', chunk_size)
+    monkeypatch.setattr(FakeElasticNode, 'reject_rate', 0.0)
+    FakeElasticNode.reset()
+    return ElasticSearchSaver(get_fake_elastic_conn())
+
+
+def save(saver: ElasticSearchSaver, films: int) -> None:
+    for document in format_rows(next(Catalogue(films).iter_blocks(films)), fast=True):
+        saver.add(document)
+    saver.save()
+
+
+def test_concurrent_bulk_splits_buffer_between_threads(monkeypatch):
+    saver = make_saver(monkeypatch, threads=4, chunk_size=500)
+    monkeypatch.setattr(saver, 'data_block_size', 100)
+    save(saver, 100)
+    assert FakeElasticNode.requests == 4
+    assert FakeElasticNode.documents == 100
+
+
+def test_concurrent_bulk_keeps_chunk_size_limit(monkeypatch):
+    saver = make_saver(monkeypatch, threads=2, chunk_size=10)
+    monkeypatch.setattr(saver, 'data_block_size', 100)
+    save(saver, 100)
+    assert FakeElasticNode.requests == 10
+    assert FakeElasticNode.documents == 100
+
+
+def test_concurrent_bulk_retries_rejected_documents(monkeypatch):
+    saver = make_saver(monkeypatch, threads=4, chunk_size=500)
+    monkeypatch.setattr(saver, 'bulk_start_sleep_time', 0)
+    monkeypatch.setattr(saver, 'bulk_max_retries', 20)
+    random.seed(0)
+    monkeypatch.setattr(FakeElasticNode, 'reject_rate', 0.3)
+    save(saver, 100)
+    assert FakeElasticNode.documents == 100
+
+
+def test_adaptive_controller_outlives_saver(monkeypatch):
+    make_saver(monkeypatch, threads=2, chunk_size=10)
+    monkeypatch.setattr(AdaptiveBulkController, 'min_chunk_size', 1)
+    monkeypatch.setattr(AdaptiveBulkController, 'chunk_size_step', 10)
+    monkeypatch.setattr(AdaptiveBulkController, 'target_latency', 60.0)
+    controller = AdaptiveBulkController(chunk_size=10, threads=2)
+    save(ElasticSearchSaver(get_fake_elastic_conn(), controller=controller), 100)
+    grown = controller.chunk_size
+    assert grown > 10
+    saver = ElasticSearchSaver(get_fake_elastic_conn(), controller=controller)
+    assert saver.controller is controller
+    save(saver, 100)
+    assert controller.chunk_size >= grown
+
+
+def test_resave_with_new_timestamp_only_is_skipped(monkeypatch):
+    make_saver(monkeypatch, threads=2, chunk_size=10)
+    saver = ElasticSearchSaver(get_fake_elastic_conn(), fingerprints=FingerprintCache(100))
+    rows = next(Catalogue(10).iter_blocks(10))
+    for fast in (True, False):
+        for document in format_rows(rows, fast=fast):
+            saver.add(document)
+        saver.save()
+        assert FakeElasticNode.documents == 10
+    touched = [dict(row, updated_at=row['updated_at'] + datetime.timedelta(hours=1)) for row in rows]
+    touched[0]['title'] = 'Renamed'
+    for document in format_rows(touched, fast=True):
+        saver.add(document)
+    saver.save()
+    assert FakeElasticNode.documents == 11
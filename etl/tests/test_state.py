@@ -0,0 +1,55 @@
+"""
+Тесты хранилищ состояния.
+"""
+
+import json
+
+import pytest
+
+from state_storage.state import AtomicJsonFileStorage, CorruptedStateError, JsonFileStorage, State
+
+
+def test_atomic_storage_round_trip(tmp_path):
+    path = tmp_path / 'state.json'
+    storage = AtomicJsonFileStorage(str(path))
+    storage.save_state({'MovieLoader': {'updated_at': '2023-05-01 12:30:00', 'id': 'a'}})
+    assert storage.retrieve_state() == {'MovieLoader': {'updated_at': '2023-05-01 12:30:00', 'id': 'a'}}
+    assert not (tmp_path / 'state.json.tmp').exists()
+
+
+def test_failed_write_keeps_previous_state(tmp_path, monkeypatch):
+    path = tmp_path / 'state.json'
+    storage = AtomicJsonFileStorage(str(path))
+    storage.save_state({'key': 1})
+
+    def broken_dump(value, state_file):
+        state_file.write('{"key": ')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(json, 'dump', broken_dump)
+    with pytest.raises(OSError):
+        storage.save_state({'key': 2})
+    monkeypatch.undo()
+    assert storage.retrieve_state() == {'key': 1}
+
+
+def test_corrupted_state_is_not_treated_as_empty(tmp_path):
+    path = tmp_path / 'state.json'
+    path.write_text('{"key": ')
+    with pytest.raises(CorruptedStateError):
+        AtomicJsonFileStorage(str(path)).retrieve_state()
+    # прежнее хранилище начинало загрузку с начала
+    assert JsonFileStorage(str(path)).retrieve_state() == {}
+
+
+def test_missing_state_is_empty(tmp_path):
+    assert AtomicJsonFileStorage(str(tmp_path / 'state.json')).retrieve_state() == {}
+
+
+def test_state_flushes_every_n_changes(tmp_path):
+    path = tmp_path / 'state.json'
+    state = State(AtomicJsonFileStorage(str(path)), flush_every=2, flush_interval=3600)
+    state.set_state('a', 1)
+    assert not path.exists()
+    state.set_state('b', 2)
+    assert json.loads(path.read_text()) == {'a': 1, 'b': 2}
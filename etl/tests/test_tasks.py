@@ -0,0 +1,70 @@
+"""
+Тесты ожидания фоновых задач ElasticSearch.
+"""
+
+import pytest
+
+from elastic.index_manager import IndexManager
+from elastic.tasks import TaskFailedError, wait_for_task
+
+
+class FakeTasks:
+    def __init__(self, statuses: list):
+        self.statuses = statuses
+        self.polls = 0
+
+    def get(self, task_id: str) -> dict:
+        status = self.statuses[min(self.polls, len(self.statuses) - 1)]
+        self.polls += 1
+        return status
+
+
+class FakeIndices:
+    def __init__(self):
+        self.forcemerge_options = None
+
+    def exists_alias(self, name):
+        return False
+
+    def exists(self, index):
+        return False
+
+    def put_settings(self, index, settings):
+        pass
+
+    def refresh(self, index):
+        pass
+
+    def forcemerge(self, **options):
+        self.forcemerge_options = options
+        return {'task': 'node:1'}
+
+
+class FakeConnection:
+    def __init__(self, statuses: list):
+        self.tasks = FakeTasks(statuses)
+        self.indices = FakeIndices()
+
+
+def test_wait_for_task_polls_until_completed():
+    connection = FakeConnection([
+        {'completed': False},
+        {'completed': False},
+        {'completed': True, 'response': {'updated': 3}},
+    ])
+    assert wait_for_task(connection, 'node:1', poll_interval=0) == {'updated': 3}
+    assert connection.tasks.polls == 3
+
+
+def test_wait_for_task_raises_task_error():
+    connection = FakeConnection([{'completed': True, 'error': {'type': 'illegal_argument_exception'}}])
+    with pytest.raises(TaskFailedError):
+        wait_for_task(connection, 'node:1', poll_interval=0)
+
+
+def test_forcemerge_runs_as_background_task(monkeypatch):
+    monkeypatch.setattr('elastic.tasks.POLL_INTERVAL', 0)
+    connection = FakeConnection([{'completed': False}, {'completed': True, 'response': {}}])
+    IndexManager(connection).finalize_version('movies_20230501000000')
+    assert connection.indices.forcemerge_options['wait_for_completion'] is False
+    assert connection.tasks.polls == 2
@@ -2,11 +2,13 @@
 Реализация отказоустойчивости сервиса.
 """
 
+import asyncio
 from time import sleep
 from functools import wraps
 from typing import Callable, Union
 
 from .logger import logger
+from .metrics import BACKOFF_SLEEPS, BACKOFF_SLEEP_SECONDS
 
 
 def backoff(
@@ -36,6 +38,43 @@ def backoff(
                     sleep_time = sleep_time * factor
                     if sleep_time > border_sleep_time:
                         sleep_time = border_sleep_time
+                    BACKOFF_SLEEPS.labels(func.__qualname__).inc()
+                    BACKOFF_SLEEP_SECONDS.labels(func.__qualname__).inc(sleep_time)
                     sleep(sleep_time)
         return inner
     return func_wrapper
+
+
+def async_backoff(
+        exceptions: tuple,
+        start_sleep_time: Union[int, float] = 0.1,
+        factor: Union[int, float] = 2,
+        border_sleep_time: Union[int, float] = 10
+) -> Callable:
+    """
+    Функция для повторного выполнения корутины, если возникла ошибка.
+    Пауза не блокирует цикл событий, поэтому остальные задачи продолжают работу.
+    :param exceptions: Исключения, которые обрабатываем
+    :param start_sleep_time: Начальное время ожидания
+    :param factor: Во сколько раз нужно увеличить время ожидания
+    :param border_sleep_time: Максимальное время ожидания
+    :return: Результат выполнения корутины
+    """
+
+    def func_wrapper(func: Callable) -> Callable:
+        @wraps(func)
+        async def inner(*args, **kwargs):
+            sleep_time = start_sleep_time
+            while True:
+                try:
+                    return await func(*args, **kwargs)
+                except exceptions as error:
+                    logger.error(error)
+                    sleep_time = sleep_time * factor
+                    if sleep_time > border_sleep_time:
+                        sleep_time = border_sleep_time
+                    BACKOFF_SLEEPS.labels(func.__qualname__).inc()
+                    BACKOFF_SLEEP_SECONDS.labels(func.__qualname__).inc(sleep_time)
+                    await asyncio.sleep(sleep_time)
+        return inner
+    return func_wrapper
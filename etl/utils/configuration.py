@@ -30,5 +30,41 @@ class ExtraConfig(BaseSettings):
     ES_INDEX_NAME: str = Field(..., env='ES_INDEX_NAME')
     ES_INDEX_FILE: str = Field(..., env='ES_INDEX_FILE')
     PSQL_DATA_BLOCK_SIZE: int = Field(100, env='DATA_BLOCK_SIZE')
+    PSQL_STREAMING: bool = Field(False, env='PSQL_STREAMING')
+    PSQL_ITERSIZE: int = Field(2000, env='PSQL_ITERSIZE')
+    PSQL_PREPARED_STATEMENTS: bool = Field(True, env='PSQL_PREPARED_STATEMENTS')
+    PSQL_READ_MODEL: bool = Field(False, env='FILM_WORK_READ_MODEL')
+    ETL_CHANGE_SET_SIZE: int = Field(10000, env='ETL_CHANGE_SET_SIZE')
+    ETL_FAN_OUT_BLOCK_SIZE: int = Field(1000, env='ETL_FAN_OUT_BLOCK_SIZE')
+    ETL_LISTEN: bool = Field(False, env='ETL_LISTEN')
+    ETL_NOTIFY_CHANNEL: str = Field('content_changes', env='ETL_NOTIFY_CHANNEL')
+    ETL_NOTIFY_DEBOUNCE: float = Field(0.05, env='ETL_NOTIFY_DEBOUNCE')
+    ETL_SAFETY_SCAN_INTERVAL: int = Field(300, env='ETL_SAFETY_SCAN_INTERVAL')
+    ETL_PIPELINE: bool = Field(False, env='ETL_PIPELINE')
+    ETL_PIPELINE_QUEUE_SIZE: int = Field(4, env='ETL_PIPELINE_QUEUE_SIZE')
+    ETL_PIPELINE_TRANSFORM_PROCESSES: int = Field(0, env='ETL_PIPELINE_TRANSFORM_PROCESSES')
+    ETL_ENGINE: str = Field('sync', env='ETL_ENGINE')
+    ETL_ASYNC_CONCURRENCY: int = Field(8, env='ETL_ASYNC_CONCURRENCY')
     ES_DATA_BLOCK_SIZE: int = Field(100., env='ES_DATA_BLOCK_SIZE')
+    ES_HTTP_COMPRESS: bool = Field(False, env='ES_HTTP_COMPRESS')
+    ES_FAST_SERIALIZATION: bool = Field(False, env='ES_FAST_SERIALIZATION')
+    ES_FINGERPRINT_CACHE_SIZE: int = Field(0, env='ES_FINGERPRINT_CACHE_SIZE')
+    ES_PARTIAL_UPDATES: bool = Field(False, env='ES_PARTIAL_UPDATES')
+    ES_TASK_POLL_INTERVAL: float = Field(5.0, env='ES_TASK_POLL_INTERVAL')
+    ES_BULK_CONCURRENT: bool = Field(False, env='ES_BULK_CONCURRENT')
+    ES_BULK_THREADS: int = Field(4, env='ES_BULK_THREADS')
+    ES_BULK_CHUNK_SIZE: int = Field(500, env='ES_BULK_CHUNK_SIZE')
+    ES_BULK_MAX_BYTES: int = Field(10 * 1024 * 1024, env='ES_BULK_MAX_BYTES')
+    ES_BULK_MAX_RETRIES: int = Field(5, env='ES_BULK_MAX_RETRIES')
+    ES_ADAPTIVE_BULK: bool = Field(False, env='ES_ADAPTIVE_BULK')
+    ES_ADAPTIVE_MIN_CHUNK_SIZE: int = Field(50, env='ES_ADAPTIVE_MIN_CHUNK_SIZE')
+    ES_ADAPTIVE_MAX_CHUNK_SIZE: int = Field(5000, env='ES_ADAPTIVE_MAX_CHUNK_SIZE')
+    ES_ADAPTIVE_CHUNK_SIZE_STEP: int = Field(100, env='ES_ADAPTIVE_CHUNK_SIZE_STEP')
+    ES_ADAPTIVE_MIN_THREADS: int = Field(1, env='ES_ADAPTIVE_MIN_THREADS')
+    ES_ADAPTIVE_MAX_THREADS: int = Field(8, env='ES_ADAPTIVE_MAX_THREADS')
+    ES_ADAPTIVE_TARGET_LATENCY: float = Field(1.0, env='ES_ADAPTIVE_TARGET_LATENCY')
     JSON_STATE_STORAGE_FILE: str = Field(..., env='JSON_STATE_STORAGE_FILE')
+    METRICS_PORT: int = Field(0, env='METRICS_PORT')
+    METRICS_ADDRESS: str = Field('127.0.0.1', env='METRICS_ADDRESS')
+    STATE_FLUSH_EVERY: int = Field(10, env='STATE_FLUSH_EVERY')
+    STATE_FLUSH_INTERVAL: float = Field(5, env='STATE_FLUSH_INTERVAL')
@@ -3,20 +3,33 @@
 """
 
 import json
-from typing import Tuple
+from typing import Callable, Tuple
 from http import HTTPStatus
 from contextlib import contextmanager
 
+import asyncpg
 import psycopg2
 from psycopg2.extras import DictCursor
 from elastic_transport import ConnectionTimeout
 from psycopg2.extensions import connection as postgres_connection
-from elasticsearch import Elasticsearch, ConnectionError
+from elasticsearch import AsyncElasticsearch, Elasticsearch, ConnectionError
+from psycopg2 import Error as PostgresError, InterfaceError, OperationalError
 
+from elastic.partial import PartialUpdateError
 from utils.logger import logger
-from utils.backoff import backoff
+from utils.backoff import backoff, async_backoff
 from utils.configuration import PostgresDSL, ElasticDSL, ExtraConfig
-from state_storage.state import State, JsonFileStorage
+from state_storage.state import State, AtomicJsonFileStorage
+
+
+CONNECTION_ERRORS = (OperationalError, InterfaceError, ConnectionError, ConnectionTimeout)
+ASYNC_CONNECTION_ERRORS = (
+    OSError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.InterfaceError,
+    ConnectionError,
+    ConnectionTimeout,
+)
 
 
 @backoff((psycopg2.OperationalError,))
@@ -33,21 +46,26 @@ def get_postgres_conn() -> postgres_connection:
 
 
 @backoff((ConnectionError, ConnectionTimeout))
-def get_elastic_conn() -> Elasticsearch:
+def get_elastic_conn(set_index: bool = True) -> Elasticsearch:
     """
     Установка соединения с ElasticSearch.
+    :param set_index: создать индекс, если его нет
     :return: соединение с ElasticSearch
     """
     hosts = [ElasticDSL().dict()]
     logger.info('Connecting to ElasticSearch...')
-    connection = Elasticsearch(retry_on_timeout=True, hosts=hosts)
-    set_elastic_index(connection)
+    connection = Elasticsearch(retry_on_timeout=True, hosts=hosts, http_compress=ExtraConfig().ES_HTTP_COMPRESS)
+    if set_index:
+        set_elastic_index(connection)
     return connection
 
 
 def set_elastic_index(connection: Elasticsearch) -> Elasticsearch:
     """
     Загрузка индекса в ElasticSearch.
+    В существующий индекс добавляются новые поля схемы: схема строгая (dynamic: strict),
+    и без них документы с новыми полями отклонялись бы до полной переиндексации.
+    Поля только добавляются, изменить тип существующего поля put_mapping не даст.
     :param connection: соединение с ElasticSearch
     :return:
     """
@@ -58,7 +76,57 @@ def set_elastic_index(connection: Elasticsearch) -> Elasticsearch:
         connection.indices.create(index=extra_config.ES_INDEX_NAME, ignore=HTTPStatus.BAD_REQUEST, body=mapping)
         logger.info('Creating Elastic index...')
     else:
-        logger.info('Elastic index already exists...')
+        connection.indices.put_mapping(index=extra_config.ES_INDEX_NAME, **mapping['mappings'])
+        logger.info('Elastic index already exists, mapping updated...')
+    return connection
+
+
+async def init_async_postgres_conn(connection: asyncpg.Connection) -> None:
+    """
+    Настройка нового соединения пула: json и jsonb разбираются в объекты Python, как в psycopg2.
+    :param connection: соединение asyncpg
+    :return:
+    """
+    for type_name in ('json', 'jsonb'):
+        await connection.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema='pg_catalog')
+
+
+@async_backoff((OSError, asyncpg.PostgresConnectionError))
+async def get_async_postgres_pool(max_size: int) -> asyncpg.Pool:
+    """
+    Создание пула асинхронных соединений с PostgreSql.
+    :param max_size: максимальное количество соединений
+    :return: пул соединений
+    """
+    dsl = PostgresDSL().dict()
+    dsl['database'] = dsl.pop('dbname')
+    logger.info('Connecting to Postgres (asyncpg)...')
+    return await asyncpg.create_pool(**dsl, min_size=1, max_size=max_size, init=init_async_postgres_conn)
+
+
+@async_backoff((ConnectionError, ConnectionTimeout))
+async def get_async_elastic_conn(set_index: bool = True) -> AsyncElasticsearch:
+    """
+    Установка асинхронного соединения с ElasticSearch.
+    :param set_index: создать индекс, если его нет
+    :return: соединение с ElasticSearch
+    """
+    hosts = [ElasticDSL().dict()]
+    logger.info('Connecting to ElasticSearch (async)...')
+    connection = AsyncElasticsearch(retry_on_timeout=True, hosts=hosts, http_compress=ExtraConfig().ES_HTTP_COMPRESS)
+    if set_index:
+        extra_config = ExtraConfig()
+        with open(extra_config.ES_INDEX_FILE, 'r') as index_file:
+            mapping = json.load(index_file)
+        if not await connection.indices.exists(index=extra_config.ES_INDEX_NAME):
+            await connection.options(ignore_status=HTTPStatus.BAD_REQUEST).indices.create(
+                index=extra_config.ES_INDEX_NAME,
+                body=mapping,
+            )
+            logger.info('Creating Elastic index...')
+        else:
+            await connection.indices.put_mapping(index=extra_config.ES_INDEX_NAME, **mapping['mappings'])
+            logger.info('Elastic index already exists, mapping updated...')
     return connection
 
 
@@ -68,7 +136,12 @@ def get_state_storage() -> State:
     :return: хранилище состояний
     """
     logger.info('Connecting to state storage...')
-    state = State(JsonFileStorage(ExtraConfig().JSON_STATE_STORAGE_FILE))
+    extra_config = ExtraConfig()
+    state = State(
+        AtomicJsonFileStorage(extra_config.JSON_STATE_STORAGE_FILE),
+        flush_every=extra_config.STATE_FLUSH_EVERY,
+        flush_interval=extra_config.STATE_FLUSH_INTERVAL,
+    )
     return state
 
 
@@ -89,3 +162,104 @@ def prepare_connections() -> Tuple[postgres_connection, Elasticsearch, State]:
     logger.info('Closed PostgreSQL connection...')
     elastic_conn.close()
     logger.info('Closed ElasticSearch connection...')
+
+
+class ConnectionManager:
+    """
+    Долгоживущие соединения для ETL-демона.
+    Соединения создаются при первом обращении и переиспользуются между циклами импорта.
+    Индекс ElasticSearch и хранилище состояний подготавливаются один раз при запуске.
+    """
+
+    def __init__(self):
+        """Инициализация переменных"""
+        self._postgres = None
+        self._elastic = None
+        self._index_ready = False
+        self.state = get_state_storage()
+
+    @property
+    def postgres(self) -> postgres_connection:
+        """
+        :return: соединение с PostgreSql, новое, если прежнее закрыто
+        """
+        if self._postgres is None or self._postgres.closed:
+            self._postgres = get_postgres_conn()
+        return self._postgres
+
+    @property
+    def elastic(self) -> Elasticsearch:
+        """
+        :return: соединение с ElasticSearch, индекс проверяется только при первом подключении
+        """
+        if self._elastic is None:
+            self._elastic = get_elastic_conn(set_index=not self._index_ready)
+            self._index_ready = True
+        return self._elastic
+
+    def check(self) -> None:
+        """
+        Дешевая проверка соединений перед циклом импорта, сломанные соединения пересоздаются.
+        :return:
+        """
+        try:
+            with self.postgres.cursor() as curs:
+                curs.execute('SELECT 1;')
+        except PostgresError as error:
+            logger.error(f'PostgreSQL health check failed: {error}')
+            self.close_postgres()
+        if not self.elastic.ping():
+            logger.error('ElasticSearch health check failed...')
+            self.close_elastic()
+
+    @backoff(CONNECTION_ERRORS + (PartialUpdateError,))
+    def run(self, func: Callable, *args, **kwargs) -> None:
+        """
+        Выполнение цикла импорта на текущих соединениях.
+        При потере соединения оно закрывается, а цикл повторяется после паузы на новом соединении.
+        Незавершенное частичное обновление тоже повторяется после паузы с сохраненной позиции.
+        :param func: функция импорта, принимающая соединения и хранилище состояний
+        :return:
+        """
+        self.check()
+        try:
+            func(self.postgres, self.elastic, self.state, *args, **kwargs)
+        except CONNECTION_ERRORS:
+            self.close()
+            raise
+        self.state.flush()
+
+    def close_postgres(self) -> None:
+        """
+        Закрытие соединения с PostgreSql.
+        :return:
+        """
+        if self._postgres is not None and not self._postgres.closed:
+            self._postgres.close()
+            logger.info('Closed PostgreSQL connection...')
+        self._postgres = None
+
+    def close_elastic(self) -> None:
+        """
+        Закрытие соединения с ElasticSearch.
+        :return:
+        """
+        if self._elastic is not None:
+            self._elastic.close()
+            logger.info('Closed ElasticSearch connection...')
+        self._elastic = None
+
+    def close(self) -> None:
+        """
+        Закрытие всех соединений.
+        :return:
+        """
+        self.state.flush()
+        self.close_postgres()
+        self.close_elastic()
+
+    def __enter__(self) -> 'ConnectionManager':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,115 @@
+"""
+Метрики ETL в формате Prometheus.
+"""
+
+import datetime
+from typing import Iterable
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+
+from .logger import logger
+from state_storage.state import State
+
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+LOADER_ROWS = Counter(
+    'etl_loader_rows',
+    'Changed table rows read by the loader',
+    ['loader'],
+)
+LOADER_MOVIES = Counter(
+    'etl_loader_movies',
+    'Movie ids found by the loader for changed rows',
+    ['loader'],
+)
+STAGE_LATENCY = Histogram(
+    'etl_stage_duration_seconds',
+    'Time to process one block by an ETL stage',
+    ['stage'],
+    buckets=STAGE_BUCKETS,
+)
+INDEXED_DOCUMENTS = Counter(
+    'etl_indexed_documents',
+    'Documents sent to Elasticsearch',
+)
+BULK_FAILURES = Counter(
+    'etl_bulk_failed_documents',
+    'Documents rejected by Elasticsearch and not retried',
+)
+BULK_RETRIES = Counter(
+    'etl_bulk_retried_documents',
+    'Documents resent to Elasticsearch after a temporary error',
+)
+BULK_CHUNK_SIZE = Gauge(
+    'etl_bulk_chunk_size',
+    'Documents per bulk request chosen by the adaptive controller',
+)
+BULK_THREADS = Gauge(
+    'etl_bulk_threads',
+    'Concurrent bulk requests chosen by the adaptive controller',
+)
+BACKOFF_SLEEPS = Counter(
+    'etl_backoff_sleeps',
+    'Sleeps before retrying after an error',
+    ['function'],
+)
+BACKOFF_SLEEP_SECONDS = Counter(
+    'etl_backoff_sleep_seconds',
+    'Total time slept before retrying after an error',
+    ['function'],
+)
+
+
+class LagCollector:
+    """
+    Отставание индекса от PostgreSQL по каждому загрузчику.
+    Считается в момент запроса метрик как разница между текущим временем и датой обновления
+    последнего сохраненного в хранилище состояний объекта.
+    """
+
+    def __init__(self, state: State, state_keys: Iterable[str]):
+        """
+        Инициализация переменных
+        :param state: хранилище состояний
+        :param state_keys: ключи состояний загрузчиков
+        """
+        self.state = state
+        self.state_keys = tuple(state_keys)
+
+    def collect(self):
+        """
+        :return: метрика отставания с меткой загрузчика
+        """
+        # импорт внутри метода: модуль загрузчиков сам использует метрики
+        from postgres.loader import Checkpoint, MIN_DATE_TIME
+
+        lag = GaugeMetricFamily(
+            'etl_replication_lag_seconds',
+            'Time since updated_at of the last checkpointed object of the loader',
+            labels=['loader'],
+        )
+        for state_key in self.state_keys:
+            updated_at = Checkpoint.from_state(self.state.get_state(state_key)).updated_at
+            if updated_at == MIN_DATE_TIME:
+                continue
+            now = datetime.datetime.now(tz=updated_at.tzinfo)
+            lag.add_metric([state_key], max((now - updated_at).total_seconds(), 0.0))
+        yield lag
+
+
+def start_metrics_server(port: int, address: str, state: State, state_keys: Iterable[str]) -> None:
+    """
+    Запуск HTTP-сервера метрик в фоновом потоке.
+    :param port: порт сервера, 0 отключает метрики
+    :param address: адрес, на котором слушает сервер
+    :param state: хранилище состояний для расчета отставания
+    :param state_keys: ключи состояний загрузчиков
+    :return:
+    """
+    if not port:
+        return
+    REGISTRY.register(LagCollector(state, state_keys))
+    start_http_server(port, addr=address)
+    logger.info(f'Serving metrics on http://{address}:{port}/metrics...')
@@ -0,0 +1,33 @@
+"""
+Movies API config for movies-admin project.
+"""
+
+import os
+
+# 'page' — numbered pages, 'cursor' — keyset pagination by (title, id)
+MOVIES_API_PAGINATION = os.environ.get('MOVIES_API_PAGINATION', 'page')
+
+# count in cursor mode: 'exact', 'cached', 'estimated' (planner statistics) or 'none'
+MOVIES_API_COUNT = os.environ.get('MOVIES_API_COUNT', 'estimated')
+MOVIES_API_COUNT_CACHE_TIMEOUT = int(os.environ.get('MOVIES_API_COUNT_CACHE_TIMEOUT', 60))
+
+# seconds to keep a single film response in the cache, changes in the admin drop it earlier
+MOVIES_API_DETAIL_CACHE_TIMEOUT = int(os.environ.get('MOVIES_API_DETAIL_CACHE_TIMEOUT', 300))
+
+# seconds to keep the ETag and Last-Modified versions in the cache, changes the signals do not see
+# (QuerySet.update(), loaddata, raw SQL, other processes) reach the validators at most this late
+MOVIES_API_VALIDATOR_TIMEOUT = int(os.environ.get('MOVIES_API_VALIDATOR_TIMEOUT', 60))
+
+# 'orm' — aggregate films in PostgreSQL, 'elastic' — read the ETL documents and fall back to the ORM
+MOVIES_API_BACKEND = os.environ.get('MOVIES_API_BACKEND', 'orm')
+# seconds the index may lag behind PostgreSQL before the API falls back to the ORM
+MOVIES_API_ES_MAX_LAG = int(os.environ.get('MOVIES_API_ES_MAX_LAG', 60))
+MOVIES_API_ES_CHECK_INTERVAL = int(os.environ.get('MOVIES_API_ES_CHECK_INTERVAL', 10))
+
+# read films from content.film_work_read_model instead of aggregating the link tables, see refresh_read_model
+FILM_WORK_READ_MODEL = os.environ.get('FILM_WORK_READ_MODEL', 'False') == 'True'
+
+# clients may ask for up to MOVIES_API_MAX_PAGE_SIZE films with ?page_size=,
+# pages from MOVIES_API_STREAM_FROM films are streamed row by row
+MOVIES_API_MAX_PAGE_SIZE = int(os.environ.get('MOVIES_API_MAX_PAGE_SIZE', 1000))
+MOVIES_API_STREAM_FROM = int(os.environ.get('MOVIES_API_STREAM_FROM', 200))
@@ -0,0 +1,15 @@
+"""
+Cache config for movies-admin project.
+"""
+
+import os
+
+# The signals invalidate cached responses and validators only in the backend they run against,
+# so the cache must be shared by all uWSGI processes. LocMemCache is per process and is fit only
+# for a single-process development server: other processes keep serving stale responses and 304s.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.memcached.PyMemcacheCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', '127.0.0.1:11211'),
+    }
+}
@@ -0,0 +1,13 @@
+"""
+Elasticsearch config for movies-admin project.
+"""
+
+import os
+
+ELASTICSEARCH = {
+    'HOST': os.environ.get('ES_HOST', '127.0.0.1'),
+    'PORT': int(os.environ.get('ES_PORT', 9200)),
+    'SCHEME': os.environ.get('ES_SCHEME', 'http'),
+    'INDEX': os.environ.get('ES_INDEX_NAME', 'movies'),
+    'TIMEOUT': int(os.environ.get('ES_TIMEOUT', 15)),
+}
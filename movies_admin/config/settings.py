@@ -21,8 +21,11 @@ CORS_ALLOWED_ORIGINS = ['http://127.0.0.1:8080', ]
 LOCALE_PATHS = ['movies/locale']
 
 include(
+    'components/api.py',
+    'components/cache.py',
     'components/logging.py',
     'components/database.py',
+    'components/elastic.py',
     'components/application.py',
     'components/password_validation.py',
     'components/internationalization.py',
@@ -0,0 +1,159 @@
+"""
+Elasticsearch read backend for first API version.
+"""
+
+import logging
+from math import ceil
+from time import monotonic
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import Http404
+from django.db.models import Max
+from django.db.models.functions import Collate
+from elasticsearch import Elasticsearch, ApiError, NotFoundError, TransportError
+
+from movies.models import Filmwork
+
+logger = logging.getLogger(__name__)
+
+ES_ERRORS = (ApiError, TransportError)
+
+
+@lru_cache(maxsize=None)
+def get_client() -> Elasticsearch:
+    config = settings.ELASTICSEARCH
+    return Elasticsearch(
+        f"{config['SCHEME']}://{config['HOST']}:{config['PORT']}",
+        request_timeout=config['TIMEOUT'],
+    )
+
+
+def to_film(source: dict) -> dict:
+    """
+    Film of the API from an index document, in the shape the ORM returns it.
+
+    The ETL writes a missing description as '', and the names in the order of the film's links,
+    while the ORM aggregates them with DISTINCT, which sorts them.
+    """
+    return {
+        'id': source['id'],
+        'title': source['title'],
+        'description': source.get('description') or None,
+        'creation_date': source.get('creation_date'),
+        'type': source.get('type'),
+        'rating': source.get('imdb_rating') or 0.0,
+        'genres': sorted(set(source.get('genre') or [])),
+        'actors': sorted(set(source.get('actors_names') or [])),
+        'directors': sorted(set(source.get('director') or [])),
+        'writers': sorted(set(source.get('writers_names') or [])),
+    }
+
+
+class ElasticBackend:
+    """
+    Films from the documents the ETL keeps in the index.
+
+    Every method returns None when the index can not answer, then the view falls back to the ORM.
+    Whether the index is usable is checked at most once per MOVIES_API_ES_CHECK_INTERVAL:
+    it must respond and its newest film must be at most MOVIES_API_ES_MAX_LAG seconds behind PostgreSQL.
+    """
+
+    sort = [{'title.raw': 'asc'}, {'id': 'asc'}]
+    # the same order in PostgreSQL: title.raw is a keyword and sorts by bytes, as the "C" collation does,
+    # so pages do not shift when the view falls back to the ORM
+    ordering = (Collate('title', 'C'), 'id')
+    # from + size above index.max_result_window is rejected by Elasticsearch
+    max_result_window = 10000
+
+    def __init__(self):
+        self.checked_at = None
+        self.available = False
+
+    @property
+    def index(self) -> str:
+        return settings.ELASTICSEARCH['INDEX']
+
+    def is_available(self) -> bool:
+        now = monotonic()
+        if self.checked_at is not None and now - self.checked_at < settings.MOVIES_API_ES_CHECK_INTERVAL:
+            return self.available
+        self.checked_at = now
+        try:
+            self.available = self.get_lag() <= settings.MOVIES_API_ES_MAX_LAG
+        except ES_ERRORS as error:
+            logger.warning('Elasticsearch is unavailable, serving films from PostgreSQL: %s', error)
+            self.available = False
+        return self.available
+
+    def get_lag(self) -> float:
+        """
+        Seconds between the newest film in PostgreSQL and the newest indexed one.
+
+        Only film_work.updated_at is compared: renamed persons and genres and changed links do not
+        touch it and are not counted as lag, and deleted films stay in the index until the ETL removes them.
+        get_film checks that the film still exists, list pages may show such changes up to an ETL cycle late.
+        The ETL skips re-saves that change nothing but updated_at, so such a save of the newest film
+        reads as lag until the next real change and lists fall back to PostgreSQL meanwhile.
+        """
+        response = get_client().search(
+            index=self.index, size=0, aggs={'updated_at': {'max': {'field': 'updated_at'}}},
+        )
+        indexed = response['aggregations']['updated_at']['value']
+        latest = Filmwork.objects.aggregate(updated_at=Max('updated_at'))['updated_at']
+        if latest is None:
+            return 0.0
+        if indexed is None:
+            return float('inf')
+        return max(latest.timestamp() - indexed / 1000, 0.0)
+
+    def get_page(self, page, per_page: int) -> dict | None:
+        if not self.is_available():
+            return None
+        try:
+            page_number = 1 if page in (None, '') else int(page)
+        except ValueError:
+            return None
+        if page_number < 1 or page_number * per_page > self.max_result_window:
+            return None
+        try:
+            response = get_client().search(
+                index=self.index,
+                sort=self.sort,
+                from_=(page_number - 1) * per_page,
+                size=per_page,
+                track_total_hits=True,
+            )
+        except ES_ERRORS as error:
+            logger.warning('Elasticsearch search failed, serving films from PostgreSQL: %s', error)
+            return None
+        count = response['hits']['total']['value']
+        total_pages = max(ceil(count / per_page), 1)
+        if page_number > total_pages:
+            raise Http404('Invalid page.')
+        return {
+            'count': count,
+            'total_pages': total_pages,
+            'prev': page_number - 1 if page_number > 1 else None,
+            'next': page_number + 1 if page_number < total_pages else None,
+            'results': [to_film(hit['_source']) for hit in response['hits']['hits']],
+        }
+
+    def get_film(self, pk) -> dict | None:
+        if not self.is_available():
+            return None
+        try:
+            source = get_client().get(index=self.index, id=str(pk))['_source']
+        except NotFoundError:
+            # the film may be not indexed yet, PostgreSQL decides whether it exists
+            return None
+        except ES_ERRORS as error:
+            logger.warning('Elasticsearch get failed, serving film from PostgreSQL: %s', error)
+            return None
+        # a deleted film stays in the index until the ETL removes it
+        if not Filmwork.objects.filter(pk=pk).exists():
+            raise Http404('No film found matching the query.')
+        return to_film(source)
+
+
+elastic_backend = ElasticBackend()
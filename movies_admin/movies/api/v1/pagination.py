@@ -0,0 +1,93 @@
+"""
+Cursor pagination for first API version.
+"""
+
+import json
+import uuid
+import base64
+import binascii
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.core.cache import cache
+from django.core.exceptions import BadRequest
+
+
+class CursorPaginator:
+    """
+    Keyset pagination by (title, id).
+
+    Film ids of a page are taken by a range scan of the (title, id) index and only they are
+    aggregated, so any page costs the same as the first one and no COUNT over the aggregate is run.
+    """
+
+    ordering = ('title', 'id')
+    count_cache_key = 'movies_api_count'
+
+    def __init__(self, queryset, per_page: int):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.per_page = per_page
+
+    @staticmethod
+    def encode_cursor(item: dict, direction: str) -> str:
+        payload = json.dumps([direction, item['title'], str(item['id'])])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple:
+        """Direction, title and id of the cursor, a malformed cursor is a bad request."""
+        try:
+            direction, title, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if direction not in ('next', 'prev') or not isinstance(title, str) or not isinstance(pk, str):
+                raise ValueError(cursor)
+            uuid.UUID(pk)
+        except (ValueError, TypeError, binascii.Error):
+            raise BadRequest('Invalid cursor.')
+        return direction, title, pk
+
+    def page(self, cursor: str | None) -> dict:
+        """Page after or before the cursor with the cursors of the neighbouring pages."""
+        ids = self.model.objects.order_by(*self.ordering)
+        direction, key = 'next', None
+        if cursor:
+            direction, *key = self.decode_cursor(cursor)
+            title, pk = key
+            if direction == 'next':
+                ids = ids.filter(Q(title__gt=title) | Q(title=title, id__gt=pk))
+            else:
+                ids = ids.filter(Q(title__lt=title) | Q(title=title, id__lt=pk)).reverse()
+        ids = list(ids.values_list('id', flat=True)[:self.per_page + 1])
+        has_more = len(ids) > self.per_page
+        results = list(self.queryset.filter(id__in=ids[:self.per_page]).order_by(*self.ordering))
+        if direction == 'next':
+            has_prev, has_next = key is not None, has_more
+        else:
+            has_prev, has_next = has_more, True
+        return {
+            'count': self.count(),
+            'prev': self.encode_cursor(results[0], 'prev') if has_prev and results else None,
+            'next': self.encode_cursor(results[-1], 'next') if has_next and results else None,
+            'results': results,
+        }
+
+    def count(self) -> int | None:
+        """Number of films as configured by MOVIES_API_COUNT."""
+        mode = settings.MOVIES_API_COUNT
+        if mode == 'exact':
+            return self.model.objects.count()
+        if mode == 'cached':
+            return cache.get_or_set(
+                self.count_cache_key, self.model.objects.count, settings.MOVIES_API_COUNT_CACHE_TIMEOUT
+            )
+        if mode == 'estimated':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [f'"{self.model._meta.db_table}"'],
+                )
+                row = cursor.fetchone()
+            # reltuples is -1 until the table is vacuumed or analyzed for the first time
+            return row[0] if row and row[0] >= 0 else None
+        return None
@@ -0,0 +1,43 @@
+"""
+JSON rendering for first API version.
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CONTENT_TYPE = 'application/json'
+# rows fetched from the server-side cursor at a time while streaming
+STREAM_CHUNK_SIZE = 100
+
+
+def dumps(value) -> bytes:
+    """JSON of the value, UUIDs and dates are encoded natively by orjson."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, cls=DjangoJSONEncoder).encode()
+
+
+def render_json(context) -> HttpResponse:
+    return HttpResponse(dumps(context), content_type=CONTENT_TYPE)
+
+
+def stream_json(context: dict, rows_key: str, rows) -> StreamingHttpResponse:
+    """
+    Response that sends the context first and then encodes the rows one by one
+    while they are read from the database, so the page is never held in memory as a whole.
+    """
+    def chunks():
+        head = dumps({key: value for key, value in context.items() if key != rows_key})
+        yield head[:-1] + (b',' if len(head) > 2 else b'') + b'"' + rows_key.encode() + b'":['
+        for number, row in enumerate(rows):
+            yield (b',' if number else b'') + dumps(row)
+        yield b']}'
+
+    return StreamingHttpResponse(chunks(), content_type=CONTENT_TYPE)
@@ -2,19 +2,73 @@
 Views for first API version.
 """
 
-from django.http import JsonResponse
-from django.db.models import Q, F
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.db.models import Q, F, QuerySet
 from django.db.models.functions import Coalesce
 from django.views.generic.list import BaseListView
 from django.views.generic.detail import BaseDetailView
 from django.contrib.postgres.aggregates import ArrayAgg
 
-from movies.models import Filmwork, PersonFilmwork
+from movies.cache import film_cache_key, get_content_version, get_film_version
+from movies.models import Filmwork, FilmworkReadModel, PersonFilmwork
+from movies.api.v1.elastic import elastic_backend
+from movies.api.v1.pagination import CursorPaginator
+from movies.api.v1.renderers import STREAM_CHUNK_SIZE, render_json, stream_json
 
 
 MOVIES_PER_PAGE = 50
 
 
+def served_by_elastic() -> bool:
+    """
+    Whether the response may come from the index: its documents lag behind the PostgreSQL version,
+    so such responses are sent without validators instead of with ones that do not describe them.
+    """
+    return settings.MOVIES_API_BACKEND == 'elastic' and elastic_backend.is_available()
+
+
+def list_served_by_elastic(request) -> bool:
+    # cursor pages are always read from PostgreSQL
+    return not MoviesListApi.is_cursor_request(request) and served_by_elastic()
+
+
+def list_last_modified(request, *args, **kwargs):
+    if list_served_by_elastic(request):
+        return None
+    return get_content_version()[0]
+
+
+def list_etag(request, *args, **kwargs):
+    if list_served_by_elastic(request):
+        return None
+    # every page and filter is a separate representation of the same content version
+    modified, tag = get_content_version()
+    return md5(f'{modified.isoformat()}:{tag}:{request.get_full_path()}'.encode()).hexdigest()
+
+
+def detail_last_modified(request, pk, *args, **kwargs):
+    if served_by_elastic():
+        return None
+    version = get_film_version(pk)
+    return version[0] if version else None
+
+
+def detail_etag(request, pk, *args, **kwargs):
+    if served_by_elastic():
+        return None
+    version = get_film_version(pk)
+    if version is None:
+        return None
+    modified, tag = version
+    return md5(f'{modified.isoformat()}:{tag}:{pk}'.encode()).hexdigest()
+
+
 class MoviesApiMixin:
     """Base API model for Filmwork."""
 
@@ -22,20 +76,25 @@ class MoviesApiMixin:
     http_method_names = ['get']
 
     def get_queryset(self):
-        return self.model.objects.prefetch_related(
-            'persons', 'genres'
-        ).values(
+        if settings.FILM_WORK_READ_MODEL:
+            return FilmworkReadModel.objects.values(
+                'id', 'title', 'description', 'creation_date', 'type', 'genres', 'actors', 'directors', 'writers'
+            ).annotate(
+                rating=Coalesce(F('rating'), 0.0),
+            )
+        return self.model.objects.values(
             'id', 'title', 'description', 'creation_date', 'type'
         ).annotate(
             rating=Coalesce(F('rating'), 0.0),
-            genres=ArrayAgg('genres__name', distinct=True),
+            # without the filter a film with no genres gets [None], the read model keeps an empty array
+            genres=ArrayAgg('genres__name', filter=Q(genres__isnull=False), distinct=True),
             actors=self.get_person_aggregation_by_role(PersonFilmwork.RoleType.Actor),
             directors=self.get_person_aggregation_by_role(PersonFilmwork.RoleType.Director),
             writers=self.get_person_aggregation_by_role(PersonFilmwork.RoleType.Writer),
         )
 
     def render_to_response(self, context, **response_kwargs):
-        return JsonResponse(context)
+        return render_json(context)
 
     @staticmethod
     def get_person_aggregation_by_role(role: PersonFilmwork.RoleType):
@@ -46,6 +105,7 @@ class MoviesApiMixin:
         )
 
 
+@method_decorator(condition(etag_func=list_etag, last_modified_func=list_last_modified), name='dispatch')
 class MoviesListApi(MoviesApiMixin, BaseListView):
     """List API model for Filmwork."""
 
@@ -53,9 +113,16 @@ class MoviesListApi(MoviesApiMixin, BaseListView):
 
     def get_context_data(self, *args, **kwargs):
         queryset = self.object_list
+        page_size = self.get_page_size()
+        if self.is_cursor_paginated():
+            return CursorPaginator(queryset, page_size).page(self.request.GET.get('cursor'))
+        if settings.MOVIES_API_BACKEND == 'elastic':
+            context = elastic_backend.get_page(self.request.GET.get(self.page_kwarg), page_size)
+            if context is not None:
+                return context
         paginator, page, queryset, is_paginated = self.paginate_queryset(
-            queryset,
-            self.PAGINATE_BY
+            queryset.order_by(*self.get_page_ordering()),
+            page_size
         )
 
         context = {
@@ -63,15 +130,54 @@ class MoviesListApi(MoviesApiMixin, BaseListView):
             'total_pages': paginator.num_pages,
             'prev': page.previous_page_number() if page.has_previous() else None,
             'next': page.next_page_number() if page.has_next() else None,
-            'results': list(queryset),
+            # large pages stay lazy and are streamed by render_to_response
+            'results': queryset if page_size >= settings.MOVIES_API_STREAM_FROM else list(queryset),
         }
         return context
 
+    def render_to_response(self, context, **response_kwargs):
+        if isinstance(context['results'], QuerySet):
+            return stream_json(context, 'results', context['results'].iterator(chunk_size=STREAM_CHUNK_SIZE))
+        return super().render_to_response(context, **response_kwargs)
+
+    @staticmethod
+    def get_page_ordering():
+        # numbered pages served by the index fall back to the ORM in the index order
+        if settings.MOVIES_API_BACKEND == 'elastic':
+            return elastic_backend.ordering
+        return CursorPaginator.ordering
+
+    def get_page_size(self):
+        try:
+            page_size = int(self.request.GET.get('page_size', self.PAGINATE_BY))
+        except ValueError:
+            return self.PAGINATE_BY
+        return max(1, min(page_size, settings.MOVIES_API_MAX_PAGE_SIZE))
+
+    def is_cursor_paginated(self):
+        return self.is_cursor_request(self.request)
+
+    @staticmethod
+    def is_cursor_request(request):
+        return settings.MOVIES_API_PAGINATION == 'cursor' or 'cursor' in request.GET
+
 
+@method_decorator(condition(etag_func=detail_etag, last_modified_func=detail_last_modified), name='dispatch')
 class MoviesDetailApi(MoviesApiMixin, BaseDetailView):
     """Detailed API model for Filmwork."""
 
+    def get_object(self, queryset=None):
+        pk = self.kwargs.get('pk')
+        key = film_cache_key(pk)
+        film = cache.get(key)
+        if film is None and settings.MOVIES_API_BACKEND == 'elastic':
+            # index documents are not cached, the cache holds only bodies described by the PostgreSQL validators
+            film = elastic_backend.get_film(pk)
+        if film is None:
+            # the film is filtered before grouping, so only its own links are aggregated
+            film = get_object_or_404(self.get_queryset() if queryset is None else queryset, pk=pk)
+            cache.set(key, film, settings.MOVIES_API_DETAIL_CACHE_TIMEOUT)
+        return film
+
     def get_context_data(self, *args, **kwargs):
-        pk = self.kwargs.get('pk', '')
-        context = self.get_queryset().filter(id=pk)[0]
-        return context
+        return self.object
@@ -7,8 +7,5 @@ class MoviesConfig(AppConfig):
     name = 'movies'
     verbose_name = _('movies')
 
-
-class AppsConfig(AppConfig):
-
     def ready(self):
-        import signals
+        from movies import signals  # noqa: F401
@@ -0,0 +1,100 @@
+"""
+Cache of API responses and their validators.
+"""
+
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache
+from django.db.models import Max, Count
+from django.utils import timezone
+
+from movies.models import Filmwork, FilmworkReadModel
+
+CONTENT_VERSION_KEY = 'movies_api_version'
+
+
+def film_cache_key(film_id) -> str:
+    return f'movies_api_film:{film_id}'
+
+
+def film_version_key(film_id) -> str:
+    return f'movies_api_film_version:{film_id}'
+
+
+def invalidate_films(film_ids) -> None:
+    """
+    Drop cached responses and validators of the films and move the list version forward
+    once the transaction commits, so no request can cache the old rows under the new version.
+    """
+    film_ids = list(film_ids)
+    if not film_ids:
+        return
+
+    def invalidate():
+        cache.delete_many(
+            [film_cache_key(film_id) for film_id in film_ids]
+            + [film_version_key(film_id) for film_id in film_ids]
+        )
+        cache.set(CONTENT_VERSION_KEY, new_content_version(), settings.MOVIES_API_VALIDATOR_TIMEOUT)
+
+    transaction.on_commit(invalidate)
+
+
+def get_content_version() -> tuple:
+    """
+    Time of the last change of any film, its persons or genres and a tag that changes with every change.
+
+    The signals set a new version on commit. A missing version (expired, evicted or never set)
+    is minted afresh instead of being read from the database, so changes the signals do not see
+    (QuerySet.update(), loaddata, raw SQL, another process) reach the validators
+    at most MOVIES_API_VALIDATOR_TIMEOUT seconds late.
+    """
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        cache.add(CONTENT_VERSION_KEY, new_content_version(), settings.MOVIES_API_VALIDATOR_TIMEOUT)
+        # another process may have added its version first
+        version = cache.get(CONTENT_VERSION_KEY) or new_content_version()
+    return version
+
+
+def new_content_version() -> tuple:
+    """A version that differs from every earlier one, without a query: the time and a random tag."""
+    return timezone.now(), uuid4().hex
+
+
+def get_film_version(film_id) -> tuple | None:
+    """Time of the last change of the film, its persons or genres and its tag, None for an unknown film."""
+    key = film_version_key(film_id)
+    version = cache.get(key)
+    if version is None:
+        version = load_film_version(film_id)
+        if version is not None:
+            cache.add(key, version, settings.MOVIES_API_VALIDATOR_TIMEOUT)
+    return version
+
+
+def load_film_version(film_id) -> tuple | None:
+    """
+    The read model row is rebuilt by its triggers on any change of the film or its links,
+    without it the newest stamp and the number of links of the film are used.
+    """
+    if settings.FILM_WORK_READ_MODEL:
+        refreshed_at = FilmworkReadModel.objects.filter(pk=film_id).values_list('refreshed_at', flat=True).first()
+        return (refreshed_at, refreshed_at.isoformat()) if refreshed_at is not None else None
+    aggregate = Filmwork.objects.filter(pk=film_id).aggregate(
+        film=Max('updated_at'),
+        persons=Max('persons__updated_at'),
+        genres=Max('genres__updated_at'),
+        person_links=Max('personfilmwork__created_at'),
+        genre_links=Max('genrefilmwork__created_at'),
+        person_count=Count('personfilmwork', distinct=True),
+        genre_count=Count('genrefilmwork', distinct=True),
+    )
+    if aggregate['film'] is None:
+        return None
+    modified = max(filter(None, (aggregate[field] for field in (
+        'film', 'persons', 'genres', 'person_links', 'genre_links',
+    ))))
+    return modified, f'{aggregate["person_count"]}.{aggregate["genre_count"]}'
@@ -0,0 +1,28 @@
+"""
+Install and rebuild the denormalized film read model.
+"""
+
+from pathlib import Path
+
+from django.db import connection, transaction
+from django.core.management.base import BaseCommand
+
+READ_MODEL_SQL_FILE = Path(__file__).resolve().parents[2] / 'sql' / 'film_work_read_model.sql'
+
+
+class Command(BaseCommand):
+    help = 'Create content.film_work_read_model with its triggers and rebuild all of its rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-refresh', action='store_true', help='only install the table, functions and triggers',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(READ_MODEL_SQL_FILE.read_text())
+            self.stdout.write('Installed film_work_read_model triggers.')
+            if not options['skip_refresh']:
+                cursor.execute('SELECT content.refresh_film_work_read_model(NULL);')
+                cursor.execute('SELECT count(*) FROM content.film_work_read_model;')
+                self.stdout.write(self.style.SUCCESS(f'Refreshed {cursor.fetchone()[0]} films.'))
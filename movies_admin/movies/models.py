@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.contrib.postgres.fields import ArrayField
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -33,6 +34,9 @@ class Genre(TimeStampedMixin, UUIDMixin):
         db_table = "content\".\"genre"
         verbose_name = _('Genre')
         verbose_name_plural = _('Genres')
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='genre_updated_at_id_idx'),
+        ]
 
 
 class Person(TimeStampedMixin, UUIDMixin):
@@ -46,6 +50,9 @@ class Person(TimeStampedMixin, UUIDMixin):
         db_table = "content\".\"person"
         verbose_name = _('Person')
         verbose_name_plural = _('Persons')
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='person_updated_at_id_idx'),
+        ]
 
 
 class Filmwork(TimeStampedMixin, UUIDMixin):
@@ -72,7 +79,9 @@ class Filmwork(TimeStampedMixin, UUIDMixin):
         verbose_name_plural = _('Filmworks')
         indexes = [
             models.Index(fields=['creation_date', 'rating'], name='creation_date_rating_idx'),
-            models.Index(fields=['title'], name='title_idx')
+            models.Index(fields=['title'], name='title_idx'),
+            models.Index(fields=['title', 'id'], name='title_id_idx'),
+            models.Index(fields=['updated_at', 'id'], name='film_work_updated_at_id_idx'),
         ]
 
 
@@ -89,6 +98,7 @@ class GenreFilmwork(UUIDMixin):
         db_table = "content\".\"genre_film_work"
         indexes = [
             models.Index(fields=['film_work_id', 'genre_id'], name='film_work_genre_idx'),
+            models.Index(fields=['genre_id', 'film_work_id'], name='genre_film_work_idx'),
         ]
         constraints = [
             models.UniqueConstraint(fields=['film_work_id', 'genre_id'], name='film_work_genre_uniq')
@@ -114,7 +124,31 @@ class PersonFilmwork(UUIDMixin):
         db_table = "content\".\"person_film_work"
         indexes = [
             models.Index(fields=['film_work', 'person', 'role'], name='film_work_person_role_idx'),
+            models.Index(fields=['person', 'film_work'], name='person_film_work_idx'),
         ]
         constraints = [
             models.UniqueConstraint(fields=['film_work', 'person', 'role'], name='film_work_person_role_uniq')
         ]
+
+
+class FilmworkReadModel(models.Model):
+    """Film with its genres and persons, maintained by triggers from movies/sql/film_work_read_model.sql."""
+
+    id = models.UUIDField(primary_key=True)
+    title = models.TextField()
+    description = models.TextField(null=True)
+    creation_date = models.DateField(null=True)
+    rating = models.FloatField(null=True)
+    type = models.TextField()
+    created_at = models.DateTimeField(null=True)
+    updated_at = models.DateTimeField(null=True)
+    genres = ArrayField(models.TextField())
+    actors = ArrayField(models.TextField())
+    directors = ArrayField(models.TextField())
+    writers = ArrayField(models.TextField())
+    persons = models.JSONField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "content\".\"film_work_read_model"
@@ -1,10 +1,39 @@
 import datetime
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
+
+from movies.cache import invalidate_films
+from movies.models import Filmwork, Genre, Person, GenreFilmwork, PersonFilmwork
 
 
 @receiver(post_save, sender='movies.Filmwork')
 def attention(sender, instance, created, **kwargs):
     if created and instance.creation_date == datetime.date.today():
         print(f"Сегодня премьера {instance.title}! 🥳")
-        
\ No newline at end of file
+
+
+@receiver(post_save, sender=Filmwork)
+@receiver(post_delete, sender=Filmwork)
+def invalidate_film(sender, instance, **kwargs):
+    invalidate_films([instance.id])
+
+
+@receiver(post_save, sender=GenreFilmwork)
+@receiver(post_delete, sender=GenreFilmwork)
+@receiver(post_save, sender=PersonFilmwork)
+@receiver(post_delete, sender=PersonFilmwork)
+def invalidate_film_link(sender, instance, **kwargs):
+    invalidate_films([instance.film_work_id])
+
+
+# deleting a genre or a person cascades to the links, which invalidate their films themselves
+@receiver(post_save, sender=Genre)
+def invalidate_genre_films(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_films(GenreFilmwork.objects.filter(genre_id=instance.id).values_list('film_work_id', flat=True))
+
+
+@receiver(post_save, sender=Person)
+def invalidate_person_films(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_films(PersonFilmwork.objects.filter(person_id=instance.id).values_list('film_work_id', flat=True))
@@ -0,0 +1,164 @@
+-- Denormalized films of the content schema: one row per film with its genres and persons.
+-- Read by the movies API and by the ETL enrichment instead of aggregating the link tables.
+-- Kept up to date by statement-level triggers, so a bulk insert refreshes every film once.
+
+CREATE TABLE IF NOT EXISTS content.film_work_read_model (
+    id uuid PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    creation_date DATE,
+    rating FLOAT,
+    type TEXT NOT NULL,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone,
+    genres TEXT[] NOT NULL DEFAULT '{}',
+    actors TEXT[] NOT NULL DEFAULT '{}',
+    directors TEXT[] NOT NULL DEFAULT '{}',
+    writers TEXT[] NOT NULL DEFAULT '{}',
+    persons JSONB NOT NULL DEFAULT '[]',
+    refreshed_at timestamp with time zone NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS film_work_read_model_title_id_idx ON content.film_work_read_model (title, id);
+
+-- Rebuilds the rows of the films, or of all films when film_ids is NULL.
+CREATE OR REPLACE FUNCTION content.refresh_film_work_read_model(film_ids uuid[]) RETURNS void AS $$
+BEGIN
+    DELETE FROM content.film_work_read_model rm
+    WHERE (film_ids IS NULL OR rm.id = ANY(film_ids))
+        AND NOT EXISTS (SELECT 1 FROM content.film_work fw WHERE fw.id = rm.id);
+
+    INSERT INTO content.film_work_read_model AS rm (
+        id, title, description, creation_date, rating, type, created_at, updated_at,
+        genres, actors, directors, writers, persons, refreshed_at
+    )
+    SELECT
+        fw.id
+        , fw.title
+        , fw.description
+        , fw.creation_date
+        , fw.rating
+        , fw.type
+        , fw.created_at
+        , fw.updated_at
+        , COALESCE((
+            SELECT array_agg(DISTINCT g.name ORDER BY g.name)
+            FROM content.genre_film_work gfw
+            JOIN content.genre g ON g.id = gfw.genre_id
+            WHERE gfw.film_work_id = fw.id
+        ), '{}')
+        , COALESCE(people.actors, '{}')
+        , COALESCE(people.directors, '{}')
+        , COALESCE(people.writers, '{}')
+        , COALESCE(people.persons, '[]')
+        , now()
+    FROM content.film_work fw
+    LEFT JOIN LATERAL (
+        SELECT
+            array_agg(DISTINCT p.full_name ORDER BY p.full_name) FILTER (WHERE pfw.role = 'actor') AS actors
+            , array_agg(DISTINCT p.full_name ORDER BY p.full_name) FILTER (WHERE pfw.role = 'director') AS directors
+            , array_agg(DISTINCT p.full_name ORDER BY p.full_name) FILTER (WHERE pfw.role = 'writer') AS writers
+            , jsonb_agg(DISTINCT jsonb_build_object('role', pfw.role, 'id', p.id, 'name', p.full_name)) AS persons
+        FROM content.person_film_work pfw
+        JOIN content.person p ON p.id = pfw.person_id
+        WHERE pfw.film_work_id = fw.id
+    ) people ON TRUE
+    WHERE film_ids IS NULL OR fw.id = ANY(film_ids)
+    ON CONFLICT (id) DO UPDATE SET
+        title = EXCLUDED.title
+        , description = EXCLUDED.description
+        , creation_date = EXCLUDED.creation_date
+        , rating = EXCLUDED.rating
+        , type = EXCLUDED.type
+        , created_at = EXCLUDED.created_at
+        , updated_at = EXCLUDED.updated_at
+        , genres = EXCLUDED.genres
+        , actors = EXCLUDED.actors
+        , directors = EXCLUDED.directors
+        , writers = EXCLUDED.writers
+        , persons = EXCLUDED.persons
+        , refreshed_at = EXCLUDED.refreshed_at;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Collects the films touched by a statement from its transition tables.
+-- For films and links these are the rows themselves, for genres and persons the films linked to them.
+CREATE OR REPLACE FUNCTION content.film_work_read_model_changes() RETURNS trigger AS $$
+DECLARE
+    film_ids uuid[];
+BEGIN
+    IF TG_TABLE_NAME = 'film_work' THEN
+        IF TG_OP = 'DELETE' THEN
+            SELECT array_agg(id) INTO film_ids FROM old_rows;
+        ELSE
+            SELECT array_agg(id) INTO film_ids FROM new_rows;
+        END IF;
+    ELSIF TG_TABLE_NAME IN ('genre_film_work', 'person_film_work') THEN
+        IF TG_OP = 'INSERT' THEN
+            SELECT array_agg(DISTINCT film_work_id) INTO film_ids FROM new_rows;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT array_agg(DISTINCT film_work_id) INTO film_ids FROM old_rows;
+        ELSE
+            SELECT array_agg(film_work_id) INTO film_ids
+            FROM (SELECT film_work_id FROM old_rows UNION SELECT film_work_id FROM new_rows) changed;
+        END IF;
+    ELSIF TG_TABLE_NAME = 'genre' THEN
+        SELECT array_agg(DISTINCT gfw.film_work_id) INTO film_ids
+        FROM content.genre_film_work gfw
+        JOIN new_rows g ON g.id = gfw.genre_id;
+    ELSIF TG_TABLE_NAME = 'person' THEN
+        SELECT array_agg(DISTINCT pfw.film_work_id) INTO film_ids
+        FROM content.person_film_work pfw
+        JOIN new_rows p ON p.id = pfw.person_id;
+    END IF;
+    IF film_ids IS NOT NULL THEN
+        PERFORM content.refresh_film_work_read_model(film_ids);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Transition tables are allowed only for single-event triggers, hence a trigger per event.
+CREATE OR REPLACE TRIGGER film_work_read_model_insert
+    AFTER INSERT ON content.film_work REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER film_work_read_model_update
+    AFTER UPDATE ON content.film_work REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER film_work_read_model_delete
+    AFTER DELETE ON content.film_work REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER genre_read_model_update
+    AFTER UPDATE ON content.genre REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER person_read_model_update
+    AFTER UPDATE ON content.person REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER genre_film_work_read_model_insert
+    AFTER INSERT ON content.genre_film_work REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER genre_film_work_read_model_update
+    AFTER UPDATE ON content.genre_film_work REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER genre_film_work_read_model_delete
+    AFTER DELETE ON content.genre_film_work REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER person_film_work_read_model_insert
+    AFTER INSERT ON content.person_film_work REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER person_film_work_read_model_update
+    AFTER UPDATE ON content.person_film_work REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
+
+CREATE OR REPLACE TRIGGER person_film_work_read_model_delete
+    AFTER DELETE ON content.person_film_work REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION content.film_work_read_model_changes();
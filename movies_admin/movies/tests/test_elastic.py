@@ -0,0 +1,92 @@
+import datetime
+from unittest import mock
+
+from django.http import Http404
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from movies.models import Filmwork
+from movies.api.v1 import elastic
+from movies.api.v1.views import MoviesListApi, list_etag, list_last_modified, detail_etag, detail_last_modified
+
+FILM_ID = '3d825f60-9fff-4dfe-b294-1a45fa1e115d'
+SOURCE = {'id': FILM_ID, 'title': 'Star Wars', 'imdb_rating': 8.6, 'genre': ['Action']}
+
+# films as PostgreSQL stores them, titles whose byte order differs from a linguistic collation
+FILMS = [
+    {'id': f'00000000-0000-0000-0000-00000000000{number}', 'title': title, 'description': description,
+     'creation_date': '1977-05-25', 'type': 'movie', 'rating': 7.5,
+     'genres': ['Sci-Fi', 'Action'], 'actors': ['Mark Hamill', 'Carrie Fisher'], 'directors': ['George Lucas'],
+     'writers': []}
+    for number, (title, description) in enumerate([
+        ('alien', None), ('Zorro', 'A masked hero'), ('Éclair', None), ('Alien', 'In space'),
+        ('Zorro', None), ('Ёлки', 'New Year'),
+    ])
+]
+
+
+def as_document(film: dict) -> dict:
+    """Index document of the film as the ETL writes it."""
+    return {
+        'id': film['id'], 'title': film['title'], 'description': film['description'] or '',
+        'creation_date': film['creation_date'], 'type': film['type'], 'imdb_rating': film['rating'],
+        'genre': film['genres'], 'director': film['directors'],
+        'actors': [{'id': FILM_ID, 'name': name} for name in film['actors']], 'actors_names': film['actors'],
+        'writers': [], 'writers_names': film['writers'],
+    }
+
+
+def as_orm_row(film: dict) -> dict:
+    """Row of the film as the ORM queryset returns it: names are aggregated with DISTINCT."""
+    return dict(film, **{field: sorted(film[field]) for field in ('genres', 'actors', 'directors', 'writers')})
+
+
+@override_settings(MOVIES_API_BACKEND='elastic', MOVIES_API_PAGINATION='page')
+class ElasticBackendTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(elastic.elastic_backend, 'is_available', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_no_validators_when_index_serves(self):
+        request = self.factory.get('/api/v1/movies/')
+        self.assertIsNone(list_etag(request))
+        self.assertIsNone(list_last_modified(request))
+        self.assertIsNone(detail_etag(request, FILM_ID))
+        self.assertIsNone(detail_last_modified(request, FILM_ID))
+
+    def test_cursor_pages_keep_validators(self):
+        request = self.factory.get('/api/v1/movies/?cursor=abc')
+        version = (datetime.datetime(2023, 5, 1, tzinfo=datetime.timezone.utc), '1')
+        with mock.patch('movies.api.v1.views.get_content_version', return_value=version):
+            self.assertIsNotNone(list_etag(request))
+
+    def test_deleted_film_is_not_served_from_index(self):
+        client = mock.Mock()
+        client.get.return_value = {'_source': SOURCE}
+        with mock.patch.object(elastic, 'get_client', return_value=client), \
+                mock.patch.object(elastic, 'Filmwork') as filmwork:
+            filmwork.objects.filter.return_value.exists.return_value = True
+            self.assertEqual(elastic.elastic_backend.get_film(FILM_ID)['title'], 'Star Wars')
+            filmwork.objects.filter.return_value.exists.return_value = False
+            with self.assertRaises(Http404):
+                elastic.elastic_backend.get_film(FILM_ID)
+
+    def test_index_page_matches_orm_page(self):
+        # title.raw and the "C" collation both sort by bytes, then by id
+        byte_order = sorted(FILMS, key=lambda film: (film['title'].encode(), film['id']))
+        client = mock.Mock()
+        hits = [{'_source': as_document(film)} for film in byte_order[:4]]
+        client.search.return_value = {'hits': {'total': {'value': len(FILMS)}, 'hits': hits}}
+        with mock.patch.object(elastic, 'get_client', return_value=client):
+            page = elastic.elastic_backend.get_page(1, 4)
+        self.assertEqual(client.search.call_args.kwargs['sort'], [{'title.raw': 'asc'}, {'id': 'asc'}])
+        self.assertEqual(page['results'], [as_orm_row(film) for film in byte_order[:4]])
+
+    def test_orm_fallback_pages_in_index_order(self):
+        ordering = MoviesListApi.get_page_ordering()
+        self.assertEqual(ordering, elastic.elastic_backend.ordering)
+        self.assertIn('"title" COLLATE "C" ASC, "content"."film_work"."id" ASC', str(
+            Filmwork.objects.values('id').order_by(*ordering).query
+        ))
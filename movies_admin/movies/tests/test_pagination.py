@@ -0,0 +1,37 @@
+import json
+import base64
+
+from django.core.exceptions import BadRequest
+from django.test import SimpleTestCase
+
+from movies.api.v1.pagination import CursorPaginator
+
+FILM_ID = '3d825f60-9fff-4dfe-b294-1a45fa1e115d'
+
+
+def make_cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class CursorTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        for direction in ('next', 'prev'):
+            cursor = CursorPaginator.encode_cursor({'title': 'Сталкер', 'id': FILM_ID}, direction)
+            self.assertEqual(CursorPaginator.decode_cursor(cursor), (direction, 'Сталкер', FILM_ID))
+
+    def test_malformed_cursor_is_bad_request(self):
+        cursors = [
+            'not base64!',
+            base64.urlsafe_b64encode(b'not json').decode(),
+            make_cursor(['next', 'a', 123]),
+            make_cursor(['next', 'a', 'not-a-uuid']),
+            make_cursor(['next', 'a']),
+            make_cursor(['sideways', 'a', FILM_ID]),
+            make_cursor(['next', 5, FILM_ID]),
+            make_cursor({'direction': 'next', 'title': 'a', 'id': FILM_ID}),
+            make_cursor(7),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor), self.assertRaises(BadRequest):
+                CursorPaginator.decode_cursor(cursor)
@@ -0,0 +1,52 @@
+import json
+import uuid
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from movies.api.v1 import renderers
+from movies.api.v1.renderers import render_json, stream_json
+
+ROWS = [
+    {'id': uuid.UUID('3d825f60-9fff-4dfe-b294-1a45fa1e115d'), 'title': 'Star Wars', 'creation_date': None},
+    {
+        'id': uuid.UUID('b16d59f7-a386-460e-a4b9-6f2e5d7e1a11'),
+        'title': 'Сталкер',
+        'creation_date': datetime.date(1979, 5, 25),
+    },
+]
+
+
+def streamed(response) -> bytes:
+    return b''.join(response.streaming_content)
+
+
+class StreamJsonTests(SimpleTestCase):
+
+    def assert_same_as_render(self, context: dict, rows: list):
+        body = streamed(stream_json(context, 'results', iter(rows)))
+        self.assertEqual(json.loads(body), json.loads(render_json({**context, 'results': rows}).content))
+        return body
+
+    def test_page_framing(self):
+        context = {'count': 2, 'total_pages': 1, 'prev': None, 'next': None}
+        for rows in ([], ROWS[:1], ROWS):
+            with self.subTest(rows=len(rows)):
+                self.assert_same_as_render(context, rows)
+
+    def test_empty_context(self):
+        self.assertEqual(streamed(stream_json({}, 'results', iter([]))), b'{"results":[]}')
+        self.assertEqual(json.loads(streamed(stream_json({}, 'results', iter(ROWS))))['results'][1]['title'], 'Сталкер')
+
+    def test_rows_are_encoded_lazily(self):
+        rows = mock.MagicMock()
+        rows.__iter__.return_value = iter(ROWS)
+        response = stream_json({'count': 2}, 'results', rows)
+        rows.__iter__.assert_not_called()
+        self.assertEqual(len(json.loads(streamed(response))['results']), 2)
+
+    def test_json_fallback_without_orjson(self):
+        with mock.patch.object(renderers, 'orjson', None):
+            body = self.assert_same_as_render({'count': 2, 'next': 2}, ROWS)
+        self.assertIn('1979-05-25', body.decode())
@@ -0,0 +1,74 @@
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, RequestFactory, override_settings
+
+from movies import cache as movies_cache
+from movies.api.v1.views import MoviesListApi, MoviesDetailApi, list_etag
+
+FILM_ID = '3d825f60-9fff-4dfe-b294-1a45fa1e115d'
+MODIFIED = datetime.datetime(2023, 5, 1, 12, 30, tzinfo=datetime.timezone.utc)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    MOVIES_API_BACKEND='orm',
+    MOVIES_API_VALIDATOR_TIMEOUT=60,
+)
+class ValidatorTests(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        patcher = mock.patch.object(movies_cache, 'new_content_version', return_value=(MODIFIED, 'first'))
+        self.new_content_version = patcher.start()
+        self.addCleanup(patcher.stop)
+        # outside a transaction the callbacks run at once, without asking the database
+        patcher = mock.patch.object(movies_cache.transaction, 'on_commit', side_effect=lambda func: func())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_list_etag_depends_on_version_and_path(self):
+        request = self.factory.get('/api/v1/movies/?page=2')
+        etag = list_etag(request)
+        self.assertEqual(etag, list_etag(self.factory.get('/api/v1/movies/?page=2')))
+        self.assertNotEqual(etag, list_etag(self.factory.get('/api/v1/movies/?page=3')))
+        # a change within the same second still changes the tag
+        self.new_content_version.return_value = (MODIFIED, 'second')
+        movies_cache.invalidate_films([FILM_ID])
+        self.assertNotEqual(etag, list_etag(request))
+
+    def test_list_not_modified(self):
+        etag = list_etag(self.factory.get('/api/v1/movies/'))
+        response = MoviesListApi.as_view()(self.factory.get('/api/v1/movies/', HTTP_IF_NONE_MATCH=f'"{etag}"'))
+        self.assertEqual(response.status_code, 304)
+
+    def test_version_is_cached_with_finite_timeout(self):
+        with mock.patch.object(movies_cache, 'cache') as fake_cache:
+            fake_cache.get.side_effect = [None, (MODIFIED, 'first')]
+            self.assertEqual(movies_cache.get_content_version(), (MODIFIED, 'first'))
+        fake_cache.add.assert_called_once_with(movies_cache.CONTENT_VERSION_KEY, (MODIFIED, 'first'), 60)
+
+    def test_missing_version_is_minted_without_queries(self):
+        # SimpleTestCase fails on any query
+        self.assertEqual(movies_cache.get_content_version(), (MODIFIED, 'first'))
+        self.assertEqual(movies_cache.get_content_version(), (MODIFIED, 'first'))
+        self.assertEqual(self.new_content_version.call_count, 1)
+
+    def test_invalidation_waits_for_commit(self):
+        movies_cache.get_content_version()
+        self.new_content_version.return_value = (MODIFIED, 'second')
+        with mock.patch.object(movies_cache.transaction, 'on_commit') as on_commit:
+            movies_cache.invalidate_films([FILM_ID])
+            self.assertEqual(movies_cache.get_content_version(), (MODIFIED, 'first'))
+            on_commit.call_args.args[0]()
+        self.assertEqual(movies_cache.get_content_version(), (MODIFIED, 'second'))
+
+    def test_detail_not_modified(self):
+        with mock.patch.object(movies_cache, 'load_film_version', return_value=(MODIFIED, '3.2')):
+            request = self.factory.get(
+                f'/api/v1/movies/{FILM_ID}', HTTP_IF_MODIFIED_SINCE='Mon, 01 May 2023 12:30:00 GMT',
+            )
+            response = MoviesDetailApi.as_view()(request, pk=FILM_ID)
+        self.assertEqual(response.status_code, 304)
@@ -15,6 +15,7 @@ if [ $? -eq 0 ]; then
   echo "Migrations complete, running sqlite_to_postgres.py..."
   python sqlite_to_postgres/load_data.py
   echo "Data successfully added..."
+  python manage.py refresh_read_model
 
 else
   echo "Timeout waiting for database to start"